@@ -3,7 +3,7 @@ from flask import render_template, request, jsonify, redirect, url_for, session,
 from datetime import datetime, timedelta
 import models
 from routes import app
-from bot_manager import bot_state_manager, stop_bot
+from utils.engine import engine
 from utils.proxy import ProxyManager
 user_manager = models.UserManager()
 proxy_manager = ProxyManager()
@@ -21,7 +21,7 @@ def admin_dashboard():
 
         # Get bot status
         bot_status = user_manager.get_user_bot_status(username)
-        bot_state = bot_state_manager.get_state(username)
+        bot_state = engine.status(username)
         users.append({
             "username": username,
             "expire_date": user.expire_date,
@@ -31,7 +31,7 @@ def admin_dashboard():
             "active": user.active,
             "bot_running": bot_status['is_running'],
             "can_disable_bot": bot_status['can_disable'],
-            "current_balance_stars": bot_state.current_balance_stars if bot_state.current_balance_stars is not None else "N/A"
+            "current_balance_stars": bot_state['current_balance_stars'] if bot_state['current_balance_stars'] is not None else "N/A"
         })
 
     users.sort(key=lambda x: x["days_left"])
@@ -127,6 +127,11 @@ def admin_delete_user():
     if not user_manager.can_edit_user(g.username, username):
         return jsonify({"status": "error", "message": "You don't have permission to delete this user"}), 403
 
+    if not user_manager.get_user(username):
+        return jsonify({"status": "error", "message": "User not found"}), 404
+
+    # Stops the bot first, so nothing it still has queued is written after the purge
+    engine.purge_tenant(username)
     if not user_manager.delete_user(username):
         return jsonify({"status": "error", "message": "User not found"}), 404
 
@@ -156,7 +161,7 @@ def admin_toggle_user():
     if not user_manager.toggle_user_active(username, active):
         return jsonify({"status": "error", "message": "User not found"}), 404
 
-    stop_bot(username)
+    engine.stop(username)
 
     return jsonify({
         "status": "success",
@@ -206,7 +211,7 @@ def admin_stop_bot():
     # if user_manager.is_admin(username):
     #     return jsonify({"status": "error", "message": "Cannot modify admin bot"}), 400
 
-    success = stop_bot(username)
+    success = engine.stop(username)
 
     return jsonify({
         "status": "success" if success else "error",
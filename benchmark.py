@@ -0,0 +1,259 @@
+"""
+Offline benchmark of the sniping engine.
+
+Runs N tenant bots in one process against the simulated market in
+``utils.simulator`` (no Telegram connection, proxies or user configs are
+touched) and reports scan rate, filter throughput and detect-to-buy latency.
+
+    python benchmark.py --tenants 5 --duration 60 --flood-wait-rate 0.01
+
+Scans can be recorded with ``--record`` (or MARKET_RECORD_FILE on a live
+server) and fed back through the filter and buy pipeline with
+``--replay``, so engine versions can be compared on identical input:
+
+    python benchmark.py --replay burst.gsml --speed 10
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+import bot_manager
+from bot_manager import BotState, GiftBot
+from utils.market_log import MarketRecorder, listing_departures, replay_market_log
+from utils.metrics import BUY_ATTEMPTS, LISTINGS_QUALIFYING, LISTINGS_SEEN
+from utils.purchase_ledger import PurchaseLedger
+from utils.rate_limit import limiter_stats
+from utils.simulator import FakeMarket, MarketProfile, client_factory
+from utils.storage import Storage
+
+
+class BenchBot(GiftBot):
+    """GiftBot with in-memory settings and throwaway state files"""
+
+    def __init__(self, username: str, settings: Dict, state_dir: str, extra_scanners: int = 0,
+                 recorder: Optional[MarketRecorder] = None, scanning: bool = True):
+        self._settings = settings
+        self._state_dir = state_dir
+        self._extra_scanners = extra_scanners
+        self._scanning = scanning
+        super().__init__(username)
+        self.market_recorder = recorder
+
+    def _make_bot_state(self) -> BotState:
+        # Built before GiftBot.__init__ touches it, so nothing under data/ is opened
+        return BotState(self._username, os.path.join(self._state_dir, f"{self._username}.logs"),
+                        PurchaseLedger(os.path.join(self._state_dir, "purchases.db")),
+                        Storage(os.path.join(self._state_dir, "app.db")).bot_states)
+
+    def _load_config_settings(self) -> SimpleNamespace:
+        return SimpleNamespace(**self._settings)
+
+    def _cache_config_settings(self) -> None:
+        super()._cache_config_settings()
+        self.cached_config['HISTORY_FILE'] = os.path.join(self._state_dir, f"{self._username}_history.log")
+
+    def _acquire_proxy(self) -> Optional[Dict]:
+        return None
+
+    async def _notify_user(self, title, msg) -> None:
+        pass
+
+    async def _initialize_scanners(self, proxy_config: Optional[Dict]) -> None:
+        await super()._initialize_scanners(proxy_config)
+        for i in range(self._extra_scanners):
+            scanner = bot_manager.Client(f"[{self._username}]scanner_{i}", None, None)
+            await scanner.start()
+            self.scanner_apps.append(scanner)
+            self.scanner_pool.add(scanner.name, scanner)
+
+    def _dispatch_due_gifts(self) -> None:
+        # Replays drive the filter workers directly
+        if self._scanning:
+            super()._dispatch_due_gifts()
+
+
+def _settings(args, tenant: int) -> Dict:
+    return {
+        'GIFT_LIMITS': {},
+        'DEFAULT_GIFTS_TO_BUY_MAX_PRICE': args.limit,
+        'GIFTS_NOT_TO_BUY': [],
+        'BACKDROPS_NOT_TO_BUY': args.avoid_backdrops,
+        'ADMIN_RECIPIENT_USER': f"bench_admin_{tenant}",
+        'APP_PHONE_NUMBER': f"+1000{tenant:04d}",
+        'APP_API_ID': 1,
+        'APP_API_HASH': "bench",
+        'BUYER_PHONE_NUMBER': f"+2000{tenant:04d}",
+        'BUYER_API_ID': 1,
+        'BUYER_API_HASH': "bench",
+        'SCANNER_PHONE_NUMBERS': [],
+        'SLEEP_BETWEEN_CYCLES': args.cycle,
+    }
+
+
+def _percentiles(samples: List[float]) -> Dict:
+    samples = sorted(samples)
+
+    def pct(p):
+        return round(samples[min(int(p * len(samples)), len(samples) - 1)] * 1000, 1) if samples else None
+
+    return {'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99), 'samples': len(samples)}
+
+
+def _counter_total(counter, tenants: List[str], label: str = None) -> Dict:
+    """Sum a per-tenant counter, optionally broken down by a second label"""
+    totals: Dict = {}
+    for key, value in counter.values().items():
+        if key[0] not in tenants:
+            continue
+        bucket = key[counter.label_names.index(label)] if label else 'total'
+        totals[bucket] = totals.get(bucket, 0) + value
+    return totals
+
+
+async def run_benchmark(args) -> Dict:
+    replaying = bool(args.replay)
+    profile = MarketProfile(
+        # A replayed market only holds the recorded listings
+        arrival_rate=0 if replaying else args.arrival_rate,
+        initial_listings=0 if replaying else 30,
+        median_price=args.median_price,
+        price_sigma=args.price_sigma,
+        listing_lifetime=args.listing_lifetime,
+        latency=args.latency,
+        flood_wait_rate=args.flood_wait_rate,
+        flood_wait_seconds=args.flood_wait_seconds,
+        timeout_rate=args.timeout_rate,
+        seed=args.seed,
+    )
+    market = FakeMarket(profile)
+    bot_manager.set_client_factory(client_factory(market))
+
+    recorder = MarketRecorder(args.record) if args.record else None
+
+    tenants = [f"bench-{i}" for i in range(args.tenants)]
+    with tempfile.TemporaryDirectory(prefix="giftsniper-bench-") as state_dir:
+        bots = []
+        for i, username in enumerate(tenants):
+            # With a handler already attached, get_logger won't open data/logs/<user>.log
+            logger = logging.getLogger(f"bot.{username}")
+            logger.addHandler(logging.StreamHandler(sys.stdout))
+            logger.propagate = False
+            logger.setLevel(logging.INFO if args.verbose else logging.CRITICAL)
+            bot = BenchBot(username, _settings(args, i), state_dir, args.scanners, recorder, not replaying)
+            bot.bot_state.running = True
+            bots.append(bot)
+
+        started = time.monotonic()
+        runs = [asyncio.create_task(bot.run()) for bot in bots]
+        replayed = None
+        if replaying:
+            replayed = await _replay(args, market, bots)
+            # Let the purchase lanes drain
+            while not all(bot.purchase_lane.idle and not bot.feed.queue.qsize() for bot in bots):
+                await asyncio.sleep(0.1)
+        else:
+            await asyncio.sleep(args.duration)
+        for bot in bots:
+            bot.bot_state.running = False
+        await asyncio.gather(*runs, return_exceptions=True)
+        elapsed = time.monotonic() - started
+        # Write pending state, history and purchases while the temp dir still exists
+        for bot in bots:
+            bot.bot_state.flush()
+            bot.sent_gifts.close()
+            bot.bot_state.ledger.flush()
+    bot_manager.set_client_factory(None)
+    if recorder:
+        recorder.close()
+
+    scans = sum(bot.throughput.total_scans for bot in bots)
+    seen = _counter_total(LISTINGS_SEEN, tenants).get('total', 0)
+    qualifying = _counter_total(LISTINGS_QUALIFYING, tenants).get('total', 0)
+    detect_to_buy = [s for bot in bots for s in bot.purchase_lane.latencies()]
+    return {
+        'tenants': args.tenants,
+        'seconds': round(elapsed, 1),
+        'replayed_scans': replayed,
+        'scans': scans,
+        'scans_per_sec': round(scans / elapsed, 2),
+        'catalog_coverage_seconds': [bot.throughput.coverage_seconds for bot in bots],
+        'listings_filtered': seen,
+        'listings_filtered_per_sec': round(seen / elapsed, 1),
+        'listings_qualifying': qualifying,
+        'buy_attempts': _counter_total(BUY_ATTEMPTS, tenants, 'outcome'),
+        'detect_to_buy_ms': _percentiles(detect_to_buy),
+        'listing_age_at_buy_ms': _percentiles([p['listing_age'] for p in market.purchases]),
+        'flood_waits': sum(
+            limiter['flood_waits']
+            for username in tenants
+            for limiter in limiter_stats(f"[{username}]").values()
+        ),
+        'market': market.stats(),
+    }
+
+
+async def _replay(args, market: FakeMarket, bots: List[BenchBot]) -> int:
+    """Push a recorded log into every tenant's filter workers"""
+    while not all(bot.feed for bot in bots):
+        await asyncio.sleep(0.05)
+
+    # Replayed listings sell when they left the recorded results, not on a random draw
+    departures = listing_departures(args.replay) if args.speed > 0 else {}
+
+    async def deliver(gift_id, listings, recorded_at):
+        market.restock(gift_id, listings, {
+            gift.link: (departures[gift.link] - recorded_at) / args.speed
+            for gift in listings if gift.link in departures
+        })
+        detected_at = time.monotonic()
+        for bot in bots:
+            bot.throughput.record_scan(0.0)
+            await bot.feed.queue.put((gift_id, listings, detected_at, 'replay'))
+
+    return await replay_market_log(args.replay, deliver, args.speed)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark GiftBot against a simulated resale market")
+    parser.add_argument("--tenants", type=int, default=3)
+    parser.add_argument("--duration", type=float, default=60.0, help="seconds to run")
+    parser.add_argument("--scanners", type=int, default=0, help="extra scanner accounts per tenant")
+    parser.add_argument("--cycle", type=float, default=3.0, help="SLEEP_BETWEEN_CYCLES of every tenant")
+    parser.add_argument("--limit", type=int, default=200, help="star limit of every gift")
+    parser.add_argument("--avoid-backdrops", nargs="*", default=[])
+    parser.add_argument("--arrival-rate", type=float, default=0.05, help="listings per gift type per second")
+    parser.add_argument("--median-price", type=int, default=400)
+    parser.add_argument("--price-sigma", type=float, default=0.6)
+    parser.add_argument("--listing-lifetime", type=float, default=120.0)
+    parser.add_argument("--latency", type=float, default=0.15, help="median RPC latency in seconds")
+    parser.add_argument("--flood-wait-rate", type=float, default=0.0)
+    parser.add_argument("--flood-wait-seconds", type=int, default=3)
+    parser.add_argument("--timeout-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=1, help="market RNG seed, so runs are comparable")
+    parser.add_argument("--record", metavar="LOG", help="append every scan to a market log")
+    parser.add_argument("--replay", metavar="LOG", help="feed a market log instead of scanning")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay speed-up (0 = as fast as possible)")
+    parser.add_argument("--json", action="store_true", help="print the report as JSON")
+    parser.add_argument("--verbose", action="store_true", help="keep the bots' INFO logs")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    args = parse_args(argv)
+    report = asyncio.run(run_benchmark(args))
+    if args.json:
+        print(json.dumps(report, indent=2))
+        return
+    for key, value in report.items():
+        print(f"{key:>28}: {value}")
+
+
+if __name__ == "__main__":
+    main()
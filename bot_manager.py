@@ -1,13 +1,12 @@
 # bot_manager.py
-from queue import Queue
 import os
 # import glob
-import json
 import asyncio
+import concurrent.futures
 from random import randint
 import sqlite3
 from typing import Dict, List, Set, Optional, Any
-from datetime import datetime, timedelta
+from datetime import datetime
 from urllib.parse import urlparse
 import time
 from pyrogram import Client as _PyroClient
@@ -15,16 +14,45 @@ from pyrogram.enums import GiftForResaleOrder, GiftAttributeType
 from pyrogram.errors import SessionPasswordNeeded, PhoneCodeInvalid, PhoneCodeExpired
 from pyrogram.errors import RPCError, BadRequest, Unauthorized
 from data.gifts import GIFT_MAPPINGS
-from threading import Lock, Thread
+from threading import Lock
 import config
 from utils.logger import get_logger
 from utils.notifications import send_notification_to_user
 from utils.proxy import ProxyManager
+from utils.scheduler import GiftScheduler, ResultDepth, ScanThroughput
+from utils.filters import get_gift_filter
+from utils.scanner_pool import ScannerPool
+from utils.market_feed import market_feed
+from utils.rate_limit import get_limiter, limiter_stats
+from utils.listing_index import ListingIndex
+from utils.purchase_lane import PurchaseLane
+from utils.balance import BalanceLedger, Reservation
+from utils.market_log import get_market_recorder
+from utils.runtime import bot_runtime
+from utils.jobs import JobManager
+from utils.validation_cache import ValidationCache, session_fingerprint
+from utils.persist import state_writer
+from utils.log_store import open_log_store
+from utils.purchase_ledger import PurchaseLedger
+from utils.sent_history import open_sent_history
+from utils.storage import BotStateRepository, get_storage
+from utils.metrics import (
+    SCAN_LATENCY, LISTINGS_SEEN, LISTINGS_QUALIFYING, BUY_ATTEMPTS, RESTARTS, CYCLE_DURATION
+)
 
 from types import SimpleNamespace
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
+_client_factory = _PyroClient
+
+
+def set_client_factory(factory=None) -> None:
+    """Swap the Telegram client class, e.g. for ``utils.simulator`` (None restores Pyrogram)"""
+    global _client_factory
+    _client_factory = factory or _PyroClient
+
+
 def Client(name, api_id, api_hash, *args, **kwargs):
     defaults = {
         "device_model": "GiftSniper",
@@ -36,7 +64,7 @@ def Client(name, api_id, api_hash, *args, **kwargs):
     # Apply defaults only if they're not explicitly provided
     final_kwargs = defaults.copy()
     final_kwargs.update(kwargs)  # Explicit args override defaults
-    return _PyroClient(
+    return _client_factory(
         name,
         api_id,
         api_hash,
@@ -52,30 +80,83 @@ def get_config_settings(username):
 proxy_manager = ProxyManager()
 
 class GiftBot:
+    # Changing these needs new Telegram clients; everything else is swapped in mid-run
+    CLIENT_SETTINGS = (
+        'APP_PHONE_NUMBER', 'APP_API_ID', 'APP_API_HASH',
+        'BUYER_PHONE_NUMBER', 'BUYER_API_ID', 'BUYER_API_HASH', 'SCANNER_PHONE_NUMBERS',
+    )
+    # Changing these decides differently about offers the listing index already skipped
+    FILTER_SETTINGS = ('GIFT_LIMITS', 'DEFAULT_GIFTS_TO_BUY_MAX_PRICE', 'GIFTS_NOT_TO_BUY', 'BACKDROPS_NOT_TO_BUY')
+    SCAN_WORKERS_PER_ACCOUNT = 10
+    FILTER_WORKERS = 4
+    PURCHASE_WORKERS = 3
+    BUYER_KEEPALIVE_INTERVAL = 30
+    BALANCE_RECONCILE_INTERVAL = 60
+    PEER_REFRESH_INTERVAL = 600
+    STATS_INTERVAL = 30
+    RESALE_PAGE_SIZE = 100  # listings per resale search RPC; the client pages past this itself
+
     def __init__(self, username):
         self.proxy = None
         self.buyer_app: Optional[Client] = None
         self.tried_gift_identifiers: Set[str] = set()
-        self.current_balance_stars: Optional[int] = None
-        self.current_balance_ton: Optional[int] = None
-        self.sent_gifts: Set[str] = set()
+        self.balance = BalanceLedger()
+        self._resync_task: Optional[asyncio.Task] = None
         self.app: Optional[Client] = None
-        self.app_semaphore = asyncio.Semaphore(10) # Value is too high but, what the hell right ?
+        self.scanner_apps: List[Client] = []
+        self.scanner_pool = ScannerPool()
+        self.feed = None
+        self.scan_queue: asyncio.Queue = asyncio.Queue()
+        self.listing_index = ListingIndex()
+        self.purchase_lane = PurchaseLane()
+        self.market_recorder = get_market_recorder()
         self._username = username
         self.cached_peer = None
-        self.bot_state = bot_state_manager.get_state(username)
+        self.bot_state = self._make_bot_state()
         self.logger = get_logger(username)
         self._restart_lock = asyncio.Lock()  # Better than Event for this case
         self._should_wait = False  # Simple flag to indicate waiting period
         # Cache all config settings at initialization
         self._cache_config_settings()
+        self.bot_state.config_version = self.cached_config['CONFIG_VERSION']
         self._load_history()
+        self.scheduler = GiftScheduler(self.cached_config['SLEEP_BETWEEN_CYCLES'])
+        # Excluded gift types are never scheduled at all
+        self.scheduler.set_catalog(self.gift_filter.eligible_gifts())
+        self.throughput = ScanThroughput(len(self.scheduler))
+        self.result_depth = ResultDepth()
+
+    def _make_bot_state(self) -> 'BotState':
+        """The shared state this bot reports into (subclasses may supply their own)"""
+        return bot_state_manager.get_state(self._username)
+
+    @property
+    def current_balance_stars(self) -> Optional[int]:
+        """Stars not held by an in-flight purchase"""
+        return self.balance.available("stars")
+
+    @property
+    def current_balance_ton(self) -> Optional[float]:
+        """TON not held by an in-flight purchase"""
+        return self.balance.available("ton")
+
+    def _load_config_settings(self) -> SimpleNamespace:
+        return get_config_settings(self._username)
 
     def _cache_config_settings(self) -> None:
         """Cache all config settings at initialization"""
-        _config_settings = get_config_settings(self._username)  # load once :D
+        self.cached_config = self._read_config()
+        self.gift_filter = get_gift_filter(
+            self.cached_config['GIFTS_NOT_TO_BUY'],
+            self.cached_config['BACKDROPS_NOT_TO_BUY'],
+            GIFT_MAPPINGS
+        )
+
+    def _read_config(self) -> Dict:
+        _config_settings = self._load_config_settings()  # load once :D
 
-        self.cached_config = {
+        return {
+            'CONFIG_VERSION': getattr(_config_settings, 'CONFIG_VERSION', 0),
             'HISTORY_FILE': config.get_history_file(self._username),
             'HISTORY_RETENTION_DAYS': config.HISTORY_RETENTION_DAYS,
             'GIFT_LIMITS': _config_settings.GIFT_LIMITS or {},
@@ -89,31 +170,46 @@ class GiftBot:
             'BUYER_PHONE_NUMBER': _config_settings.BUYER_PHONE_NUMBER,
             'BUYER_API_ID': _config_settings.BUYER_API_ID,
             'BUYER_API_HASH': _config_settings.BUYER_API_HASH,
+            'SCANNER_PHONE_NUMBERS': _config_settings.SCANNER_PHONE_NUMBERS or [],
             'SLEEP_BETWEEN_CYCLES': _config_settings.SLEEP_BETWEEN_CYCLES
         }
 
-    def _load_history(self) -> None:
-        """Load previously sent gift links with timestamps"""
-        try:
-            if os.path.exists(self.cached_config['HISTORY_FILE']):
-                with open(self.cached_config['HISTORY_FILE'], 'r') as f:
-                    history = json.load(f)
-                    cutoff = datetime.now() - timedelta(days=self.cached_config['HISTORY_RETENTION_DAYS'])
-                    self.sent_gifts = {
-                        k for k, v in history.items()
-                        if datetime.fromisoformat(v) > cutoff
-                    }
-        except Exception as e:
-            self.logger.error(f"Error loading history: {e}", exc_info=True)
+    async def reload_config(self) -> bool:
+        """
+        Apply saved settings to the running bot: limits, avoid lists and
+        cycle time take effect on the next listing. Returns False when
+        account settings changed and the clients must be restarted instead.
+        """
+        old = self.cached_config
+        new = self._read_config()
+        new['HISTORY_FILE'] = old['HISTORY_FILE']
+        if new['CONFIG_VERSION'] and new['CONFIG_VERSION'] <= old['CONFIG_VERSION']:
+            return True     # already applied
+        if any(new[key] != old[key] for key in self.CLIENT_SETTINGS):
+            return False
 
-    def _save_history(self) -> None:
-        """Save current state of sent gifts"""
-        try:
-            history = {gift_id: datetime.now().isoformat() for gift_id in self.sent_gifts}
-            with open(self.cached_config['HISTORY_FILE'], 'w') as f:
-                json.dump(history, f, indent=2)
-        except Exception as e:
-            self.logger.error(f"Error saving history: {e}", exc_info=True)
+        gift_filter = get_gift_filter(new['GIFTS_NOT_TO_BUY'], new['BACKDROPS_NOT_TO_BUY'], GIFT_MAPPINGS)
+        # No await until both are swapped, so workers never see a half-applied config
+        self.cached_config, self.gift_filter = new, gift_filter
+        if any(new[key] != old[key] for key in self.FILTER_SETTINGS):
+            # Offers rejected under the old filter or limits get evaluated again
+            self.listing_index.clear()
+        self.scheduler.set_catalog(gift_filter.eligible_gifts())
+        self.throughput.catalog_size = len(self.scheduler)
+        if self.feed:
+            market_feed.update_interest(self._username, self._feed_interest())
+        if new['ADMIN_RECIPIENT_USER'] != old['ADMIN_RECIPIENT_USER'] and self.buyer_app:
+            await self._cache_peer_id()
+
+        self.bot_state.config_version = new['CONFIG_VERSION']
+        self.logger.info(f"Applied settings version {new['CONFIG_VERSION']}")
+        return True
+
+    def _load_history(self) -> None:
+        """Open the append-only sent-gift history (legacy JSON histories are imported with the storage migration)"""
+        self.sent_gifts = open_sent_history(
+            self.cached_config['HISTORY_FILE'], self.cached_config['HISTORY_RETENTION_DAYS'] * 86400
+        )
 
     @staticmethod
     def _extract_gift_identifier(link: str) -> Optional[str]:
@@ -139,66 +235,240 @@ class GiftBot:
             self.cached_config['DEFAULT_GIFTS_TO_BUY_MAX_PRICE']
         )
 
-    async def _find_cheap_gifts(self, gift_id: int, gift_title: str, client: Client, semaphore: asyncio.Semaphore) -> List:
+    async def _scan_gift(self, gift_id: int, gift_title: str, client: Client, semaphore: asyncio.Semaphore) -> Optional[List]:
         """
-        Return resale offers for this gift that are
-        - under the per‑gift star limit
-        - NOT on any of the avoid lists (title or backdrop)
+        Fetch the raw resale listings of one gift type and share them with
+        other tenants. Returns None when the scan was skipped.
         """
         # 1️⃣  Skip the entire gift type if its *title* matches an avoid keyword
         async with semaphore:
-            if (
-                self.cached_config['GIFTS_NOT_TO_BUY']
-                and any(bad.lower() in gift_title.lower()
-                        for bad in self.cached_config['GIFTS_NOT_TO_BUY'])
-            ):
+            if not self.gift_filter.is_gift_eligible(gift_id):
                 # Nothing to look for – don’t even call search_gifts_for_resale
-                return []
+                return None
             gift_limit = self._get_gift_limit(gift_title)
             
             if gift_limit > self.current_balance_stars:
-                return []
-            found_gifts = []
-            try:
-                async for gift in client.search_gifts_for_resale(
-                    gift_id=gift_id,
-                    order=GiftForResaleOrder.PRICE,
-                    limit=randint(1, 5)
-                ):
-                    # 2️⃣  Price check
-                    if not gift.last_resale_star_count or gift.last_resale_star_count > gift_limit:
-                        continue
-                    found_gifts.append(gift)
-            except asyncio.TimeoutError as e:
-                self.logger.error("Timeout while searching gifts for %s", gift_id)
-                return found_gifts
-            except TimeoutError as e:
-                self.logger.error("Timeout while searching gifts for %s", gift_id)
-                return found_gifts
-            except RuntimeError as e:
-                self.logger.error("Runtime while searching gifts for %s", gift_id)
-                return found_gifts
-            except Exception as e:
-                self.logger.error(f"Error searching gifts for ID {gift_id}: {e}", exc_info=True)
-            return found_gifts
+                return None
+            # Another tenant scanned this gift recently – its listings reach us through the feed
+            if not market_feed.claim(gift_id, self._username, self.scheduler.interval_for(gift_id)):
+                return None
+            # Fetch deep enough for every tenant sharing this scan
+            ceiling = market_feed.price_ceiling(gift_id, gift_limit)
+            listings = await self._search_resale(gift_id, client, ceiling)
+
+        if self.market_recorder:
+            self.market_recorder.record(gift_id, listings)
+        market_feed.publish(gift_id, listings, origin=self._username)
+        return listings
+
+    async def _call(self, client: Client, method: str, *args, **kwargs):
+        """Run one RPC through the account's token bucket"""
+        limiter = get_limiter(client.name)
+        await limiter.acquire()
+        try:
+            return await getattr(client, method)(*args, **kwargs)
+        except Exception as e:
+            limiter.report_error(e)
+            raise
 
-    async def process_gift(self, gift_id: int, gift_title: str, client: Client, semaphore: asyncio.Semaphore) -> None:
-        """Process a single gift type with its specific limit"""
+    async def _fetch_listings(self, gift_id: int, client: Client, depth: int, ceiling: int, listings: List) -> bool:
+        """
+        Extend ``listings`` to the ``depth`` cheapest, stopping at the first one
+        above ``ceiling``. Returns True if that boundary was reached.
+        """
+        # Resale offsets are opaque server cursors, so a deeper pass asks from the
+        # start with the larger limit and skips the listings it already has
+        collected = {gift.link for gift in listings}
+        returned = 0
+        async for gift in self._resale_pages(client, gift_id, depth):
+            returned += 1
+            if gift.link in collected:
+                continue
+            listings.append(gift)
+            # Sorted by price: nothing after this can qualify for anyone
+            if gift.last_resale_star_count and gift.last_resale_star_count > ceiling:
+                return True
+        return returned < depth    # fewer results than asked: end of the market
+
+    async def _resale_pages(self, client: Client, gift_id: int, limit: int):
+        """The ``limit`` cheapest listings, taking a rate-limit token and timing each page's RPC"""
+        limiter = get_limiter(client.name)
+        gift_name = GIFT_MAPPINGS.get(str(gift_id), str(gift_id))
+        results = client.search_gifts_for_resale(gift_id=gift_id, order=GiftForResaleOrder.PRICE, limit=limit)
+        returned = 0
         try:
-            cheap_gifts = await self._find_cheap_gifts(gift_id, gift_title, client, semaphore)
-            if not cheap_gifts:
-                return
+            while returned < limit:
+                new_page = returned % self.RESALE_PAGE_SIZE == 0
+                if new_page:
+                    # The client sends the next page's RPC here; timed after the token
+                    # bucket, so the histogram holds RPC time only
+                    await limiter.acquire()
+                    started = time.monotonic()
+                try:
+                    gift = await results.__anext__()
+                except StopAsyncIteration:
+                    return
+                finally:
+                    if new_page:
+                        SCAN_LATENCY.observe(time.monotonic() - started, tenant=self._username, gift=gift_name)
+                returned += 1
+                yield gift
+        finally:
+            await results.aclose()
 
-            buy_tasks = [
-                self._try_to_buy_gift(gift)
-                for gift in cheap_gifts
-                if gift.last_resale_star_count <= self._get_gift_limit(gift.title)
-            ]
-            results = await asyncio.gather(*buy_tasks, return_exceptions=True)
-            if any(results):
-                self._save_history()
+    async def _search_resale(self, gift_id: int, client: Client, ceiling: int) -> List:
+        """Fetch the sub-ceiling resale listings of a gift type (partial on errors)"""
+        listings = []
+        depth = self.result_depth.depth_for(gift_id)
+        try:
+            reached_boundary = await self._fetch_listings(gift_id, client, depth, ceiling, listings)
+            # Floor crash: the whole page is under the ceiling, keep paging deeper
+            while not reached_boundary and depth < ResultDepth.CRASH_DEPTH:
+                depth = min(depth * 4, ResultDepth.CRASH_DEPTH)
+                reached_boundary = await self._fetch_listings(gift_id, client, depth, ceiling, listings)
+        except asyncio.TimeoutError as e:
+            self.logger.error("Timeout while searching gifts for %s", gift_id)
+            self.scanner_pool.report_error(client, e)
+            return listings
+        except TimeoutError as e:
+            self.logger.error("Timeout while searching gifts for %s", gift_id)
+            self.scanner_pool.report_error(client, e)
+            return listings
+        except RuntimeError as e:
+            self.logger.error("Runtime while searching gifts for %s", gift_id)
+            self.scanner_pool.report_error(client, e)
+            return listings
         except Exception as e:
-            self.logger.error(f"Error processing gift {gift_id}: {e}", exc_info=True)
+            get_limiter(client.name).report_error(e)
+            wait = self.scanner_pool.report_error(client, e)
+            if wait is not None:
+                self.logger.warning(f"Scanner hit FLOOD_WAIT for {wait}s, moving its gifts to other scanners")
+            else:
+                self.logger.error(f"Error searching gifts for ID {gift_id}: {e}", exc_info=True)
+            return listings
+        self.scanner_pool.report_success(client)
+        self.result_depth.record(
+            gift_id,
+            sum(1 for gift in listings if gift.last_resale_star_count and gift.last_resale_star_count <= ceiling)
+        )
+        return listings
+
+    def _observe_listings(self, gift_id: int, gift_limit: int, listings: List, own_scan: bool = True) -> None:
+        """Feed the floor and the listings under the limit to the scheduler"""
+        # Results are sorted by price, so the first priced one is the floor
+        floor = next((gift.last_resale_star_count for gift in listings if gift.last_resale_star_count), None)
+        qualifying_links = [
+            gift.link for gift in listings
+            if gift.last_resale_star_count and gift.last_resale_star_count <= gift_limit
+        ]
+        self.scheduler.observe(gift_id, floor, qualifying_links, gift_limit, own_scan=own_scan)
+
+    def _select_cheap_gifts(self, gift_limit: int, listings: List) -> List:
+        """
+        Keep new or repriced listings under this tenant's limit. Offers
+        already judged at the same price are dropped here, before any of the
+        buy-path checks run again.
+        """
+        found_gifts = []
+        for gift in listings:
+            # 2️⃣  Price check
+            if not gift.last_resale_star_count or gift.last_resale_star_count > gift_limit:
+                continue
+            if self.listing_index.is_new(gift):
+                found_gifts.append(gift)
+        return found_gifts
+
+    def _buy_cheap_gifts(self, cheap_gifts: List, detected_at: float) -> None:
+        """Queue qualifying listings on the purchase lane"""
+        for gift in cheap_gifts:
+            gift_limit = self._get_gift_limit(gift.title)
+            if gift.last_resale_star_count <= gift_limit:
+                self.purchase_lane.submit(gift, gift_limit, detected_at)
+
+    async def _purchase_worker(self) -> None:
+        """Dedicated buyer-client worker, best discount first"""
+        while self.bot_state.running:
+            detected_at, gift = await self.purchase_lane.get()
+            try:
+                await self._try_to_buy_gift(gift)
+            except Exception as e:
+                self.logger.error(f"Error buying gift {getattr(gift, 'link', gift)}: {e}", exc_info=True)
+            finally:
+                self.purchase_lane.done(detected_at)
+
+    async def _keep_buyer_warm(self) -> None:
+        """Keep the buyer connection and cached peer hot while the lane is idle"""
+        last_peer_refresh = time.monotonic()
+        while self.bot_state.running:
+            await asyncio.sleep(self.BUYER_KEEPALIVE_INTERVAL)
+            if not self.purchase_lane.idle or self._should_wait:
+                continue
+            try:
+                await self._call(self.buyer_app, 'get_me')
+                if time.monotonic() - last_peer_refresh >= self.PEER_REFRESH_INTERVAL:
+                    await self._cache_peer_id()
+                    last_peer_refresh = time.monotonic()
+            except Exception as e:
+                self.logger.warning(f"Buyer keep-alive failed: {e}")
+
+    def _feed_interest(self) -> Dict[int, int]:
+        """Star limit per gift we want listings for"""
+        return {
+            gift_id: self._get_gift_limit(gift_title)
+            for gift_id, gift_title in self.gift_filter.eligible_gifts()
+        }
+
+    async def _scan_worker(self) -> None:
+        """Long-lived scan worker: pull due gifts, push listings downstream"""
+        while self.bot_state.running:
+            gift_id, gift_title = await self.scan_queue.get()
+            try:
+                while self._should_wait:
+                    await asyncio.sleep(0.5)
+                # Buys don't pause scanning: the lane's PURCHASE_WORKERS cap buy concurrency,
+                # and a floor crash is exactly when new cheap listings must keep being found
+                scanner = self.scanner_pool.account_for(gift_id)
+                started = time.monotonic()
+                listings = await self._scan_gift(gift_id, gift_title, scanner.client, scanner.semaphore)
+                if listings is not None:
+                    latency = time.monotonic() - started
+                    self.throughput.record_scan(latency)
+                coverage_seconds = self.throughput.record_visit(gift_id)
+                if coverage_seconds is not None:
+                    CYCLE_DURATION.observe(coverage_seconds, tenant=self._username)
+                if listings is not None:
+                    # Reschedule from this scan's result before the listings move on; empty
+                    # results count too
+                    self._observe_listings(gift_id, self._get_gift_limit(gift_title), listings)
+                    await self.feed.queue.put((gift_id, listings, time.monotonic(), self._username))
+            except Exception as e:
+                self.logger.error(f"Error processing gift {gift_id}: {e}", exc_info=True)
+            finally:
+                # Failed or skipped scans keep their previous cadence
+                self.scheduler.ensure_scheduled(gift_id)
+
+    async def _filter_worker(self) -> None:
+        """Run listings (own scans and other tenants') through our limits, filters and buys"""
+        while self.bot_state.running:
+            gift_id, listings, detected_at, origin = await self.feed.queue.get()
+            try:
+                gift_title = GIFT_MAPPINGS.get(str(gift_id))
+                if not gift_title or not self.gift_filter.is_gift_eligible(gift_id):
+                    continue
+                gift_limit = self._get_gift_limit(gift_title)
+                if gift_limit > self.current_balance_stars:
+                    continue
+                if origin != self._username:
+                    # Our own scans were observed by the scan worker already
+                    self._observe_listings(gift_id, gift_limit, listings, own_scan=False)
+                cheap_gifts = self._select_cheap_gifts(gift_limit, listings)
+                LISTINGS_SEEN.inc(len(listings), tenant=self._username)
+                if cheap_gifts:
+                    LISTINGS_QUALIFYING.inc(len(cheap_gifts), tenant=self._username)
+                self._buy_cheap_gifts(cheap_gifts, detected_at)
+            except Exception as e:
+                self.logger.error(f"Error handling listings for {gift_id}: {e}", exc_info=True)
+
     async def _try_to_buy_gift(self, gift) -> bool:
         """
         Attempt to purchase and send a gift using the buyer client.
@@ -214,18 +484,23 @@ class GiftBot:
             return False
 
         gift_identifier = self._extract_gift_identifier(gift.link)
-        if not gift_identifier or gift_identifier in self.sent_gifts:
-            return False
-
-        self.sent_gifts.add(gift_identifier)
-
-        # Balance verification
-        r, currency = await self._verify_balance_for_purchase(gift)
-        if not r:
+        # Held in memory while the buy is in flight; only a bought gift goes into the history
+        if not gift_identifier or not self.sent_gifts.claim(gift_identifier):
             return False
 
-        # Purchase attempt
-        return await self._attempt_gift_purchase(gift, currency)
+        bought = False
+        try:
+            # Balance reservation
+            reservation = await self._reserve_balance_for_purchase(gift)
+            if reservation:
+                # Purchase attempt
+                bought = await self._attempt_gift_purchase(gift, reservation)
+        finally:
+            if bought:
+                self.sent_gifts.confirm(gift_identifier)
+            else:
+                self.sent_gifts.release(gift_identifier)
+        return bought
 
     def _should_process_gift(self, gift) -> bool:
         """Check if gift meets all criteria for purchase"""
@@ -243,99 +518,150 @@ class GiftBot:
     def _contains_banned_keywords(self, gift) -> bool:
         """Check for banned keywords in gift title or attributes"""
         # Check gift title
-        if (self.cached_config['GIFTS_NOT_TO_BUY'] and gift.title and 
-            any(bad.lower() in gift.title.lower() 
-                for bad in self.cached_config['GIFTS_NOT_TO_BUY'])):
+        if self.gift_filter.title_banned(gift.title):
             return True
 
         # Check backdrops
-        if self.cached_config['BACKDROPS_NOT_TO_BUY']:
-            for attr in getattr(gift, 'attributes', []):
+        if self.gift_filter.has_backdrop_rules:
+            for attr in getattr(gift, 'attributes', None) or []:
                 if (attr and attr.type == GiftAttributeType.BACKDROP and
-                    any(bad.lower() in getattr(attr, 'name', '').lower()
-                        for bad in self.cached_config['BACKDROPS_NOT_TO_BUY'])):
+                    self.gift_filter.backdrop_banned(getattr(attr, 'name', None))):
                     return True
 
         return False
 
-    async def _verify_balance_for_purchase(self, gift) -> tuple[bool, str]:
-        """Verify sufficient balance for purchase, prioritize TON over stars"""
+    async def _reserve_balance_for_purchase(self, gift) -> Optional[Reservation]:
+        """Reserve funds for the purchase, prioritize TON over stars"""
         try:
             # Check TON balance first
-            if self.current_balance_ton is not None and self.current_balance_ton >= (gift.last_resale_ton_count / 1e9):
-                return True, "ton"
+            if gift.last_resale_ton_count:
+                reservation = self.balance.reserve("ton", gift.last_resale_ton_count / 1e9)
+                if reservation:
+                    return reservation
 
             # If TON insufficient, check stars
-            if self.current_balance_stars is not None and self.current_balance_stars >= gift.last_resale_star_count:
-                return True, "stars"
+            reservation = self.balance.reserve("stars", gift.last_resale_star_count)
+            if reservation:
+                return reservation
 
             # Neither balance is sufficient
+            BUY_ATTEMPTS.inc(tenant=self._username, outcome="insufficient_balance")
             message = (f"⛔️ Skipping gift {gift.link} – "
                     f"Cost: {gift.last_resale_star_count}⭐️ / "
-                    f"{gift.last_resale_ton_count / 1e9} TON, "
+                    f"{(gift.last_resale_ton_count or 0) / 1e9} TON, "
                     f"Balance: {self.current_balance_stars}⭐️ / "
                     f"{self.current_balance_ton} TON")
             await self._handle_purchase_failure(message, warning=True)
-            return False, ""
+            return None
 
         except Exception as e:
             self.logger.error(f"Failed to verify balance: {e}", exc_info=True)
-            return False, ""
+            return None
 
-    async def _attempt_gift_purchase(self, gift, currency) -> bool:
+    async def _attempt_gift_purchase(self, gift, reservation: Reservation) -> bool:
         """Execute the gift purchase flow"""
+        currency = reservation.currency
         try:
-            await self.buyer_app.send_resold_gift(
+            await self._call(
+                self.buyer_app,
+                'send_resold_gift',
                 gift.link, 
                 self.cached_config['ADMIN_RECIPIENT_USER'],
                 use_ton = bool(currency == 'ton'), # checks if the currency is either ton or not.
                 cached_peer=self.cached_peer
             )
-            
-            await self._handle_purchase_success(gift, currency)
-            return True
 
         except (BadRequest, RPCError) as e:
+            self.balance.release(reservation)
+            BUY_ATTEMPTS.inc(tenant=self._username, outcome=self._classify_api_error(e))
+            if 'BALANCE_TOO_LOW' in str(e):
+                # Our view of the balance is stale - resync before the next buy
+                self._resync_balance_soon()
             await self._handle_api_error(e, gift)
             return False
             
         except Exception as e:
+            self.balance.release(reservation)
+            BUY_ATTEMPTS.inc(tenant=self._username, outcome="unexpected")
             await self._handle_unexpected_error(e, gift)
             return False
 
+        self.balance.commit(reservation)
+        BUY_ATTEMPTS.inc(tenant=self._username, outcome="success")
+        try:
+            await self._handle_purchase_success(gift, currency)
+        except Exception as e:
+            self.logger.error(f"Bought {gift.link} but post-purchase handling failed: {e}", exc_info=True)
+        return True
+
     async def _handle_purchase_success(self, gift, currency: str) -> None:
-        """Handle successful purchase operations with proper currency deduction"""
+        """Report a purchase whose cost the ledger already committed"""
         
         if currency == "ton":
             cost_ton = gift.last_resale_ton_count / 1e9
             message = f"✅ Successfully bought and sent gift {gift.link} to Admin for {cost_ton} TON"
-            self.current_balance_ton -= cost_ton
-            self.bot_state.current_balance_ton = self.current_balance_ton
+            self.bot_state.current_balance_ton = self.balance.balance("ton")
         elif currency == "stars":
             cost_stars = gift.last_resale_star_count
             message = f"✅ Successfully bought and sent gift {gift.link} to Admin for {cost_stars}⭐️"
-            self.current_balance_stars -= cost_stars
-            self.bot_state.current_balance_stars = self.current_balance_stars
+            self.bot_state.current_balance_stars = self.balance.balance("stars")
         else:
             self.logger.warning(f"Unknown currency '{currency}' for gift {gift.link}")
             return
 
-        # Parallelize notifications and logging
-        send_notification_to_user(
-            "🎁 Gift! Check Your Inbox!",
-            message,
-            self._username
-        )
+        await self._notify_user("🎁 Gift! Check Your Inbox!", message)
         await self._notify_admin(message)
         self.bot_state.add_log(message)
         self.bot_state.add_gift(
             self.cached_config['ADMIN_RECIPIENT_USER'],
             gift.link,
-            gift.last_resale_star_count if currency == "stars" else 0
+            gift.last_resale_star_count if currency == "stars" else gift.last_resale_ton_count,
+            currency,
+            gift.title
         )
-        await self.channel_sender._send_gift_to_channel(gift)
+        channel_sender = getattr(self, 'channel_sender', None)
+        if channel_sender:
+            await channel_sender._send_gift_to_channel(gift)
         self.logger.info(message)
 
+    async def _reconcile_balance(self) -> None:
+        """Sync the ledger with the buyer's real stars/TON balance"""
+        # Purchases that land while the balances are in flight make them stale
+        generations = {currency: self.balance.generation(currency) for currency in ("stars", "ton")}
+        stars = await self._call(self.buyer_app, 'get_stars_balance')
+        ton = await self._call(self.buyer_app, 'get_ton_balance') / 1e9
+        if self.balance.reconcile("stars", stars, generations["stars"]):
+            self.bot_state.current_balance_stars = stars
+        if self.balance.reconcile("ton", ton, generations["ton"]):
+            self.bot_state.current_balance_ton = ton
+
+    def _resync_balance_soon(self) -> None:
+        """Reconcile in the background, one resync at a time"""
+        if self._resync_task and not self._resync_task.done():
+            return
+        self._resync_task = asyncio.create_task(self._reconcile_balance())
+        self._resync_task.add_done_callback(self._log_resync_failure)
+
+    def _log_resync_failure(self, task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            self.logger.warning(f"Balance resync failed: {task.exception()}")
+
+    async def _reconcile_balance_loop(self) -> None:
+        while self.bot_state.running:
+            await asyncio.sleep(self.BALANCE_RECONCILE_INTERVAL)
+            try:
+                await self._reconcile_balance()
+            except Exception as e:
+                self.logger.warning(f"Balance reconcile failed: {e}")
+
+    API_ERROR_CATEGORIES = (
+        'STARGIFT_RESELL_NOT_ALLOWED', 'STARS_FORM_AMOUNT_MISMATCH', 'BALANCE_TOO_LOW', 'FLOOD_WAIT'
+    )
+
+    @classmethod
+    def _classify_api_error(cls, error: Exception) -> str:
+        return next((err for err in cls.API_ERROR_CATEGORIES if err in str(error)), "other")
+
     async def _handle_api_error(self, error: Exception, gift) -> None:
         """Handle Telegram API specific errors"""
         error_messages = {
@@ -372,15 +698,17 @@ class GiftBot:
         else:
             self.logger.error(message)
             
-        await asyncio.gather(
-            self.bot_state.add_log(message),
-            self._notify_admin(message)
-        )
+        self.bot_state.add_log(message)
+        await self._notify_admin(message)
+
+    async def _notify_user(self, title, msg):
+        # Web push is blocking I/O - keep it off the shared loop
+        await asyncio.to_thread(send_notification_to_user, title, msg, self._username)
 
     async def _notify_admin(self, msg):
         # Notify admin
         try:
-            await self.buyer_app.send_message(self.cached_config['ADMIN_RECIPIENT_USER'], msg)
+            await self._call(self.buyer_app, 'send_message', self.cached_config['ADMIN_RECIPIENT_USER'], msg)
         except Exception as e:
             self.logger.error(f"Failed to notify admin: {e}", exc_info=True)
 
@@ -395,11 +723,12 @@ class GiftBot:
                 
                 # Quick health check
                 if self.app.is_connected:
-                    await self.app.get_me()
+                    await self._call(self.app, 'get_me')
                 if self.buyer_app.is_connected:
-                    await self.buyer_app.get_me()
+                    await self._call(self.buyer_app, 'get_me')
                     # # Refresh cached peer periodically to ensure it's valid
                     # await self._cache_peer_id()
+                await self._check_scanners()
 
             except TimeoutError:
                 self.logger.warning("Timeout in health-check, backing off...")
@@ -412,6 +741,19 @@ class GiftBot:
                 )
                 await self._handle_client_restart(e)
 
+    async def _check_scanners(self) -> None:
+        """Take broken scanner accounts out of rotation instead of restarting the bot"""
+        for scanner in self.scanner_apps:
+            name = scanner.name
+            try:
+                if not scanner.is_connected:
+                    raise ConnectionError("not connected")
+                await self._call(scanner, 'get_me')
+                self.scanner_pool.report_success(scanner)
+            except Exception as e:
+                self.logger.warning(f"Scanner {os.path.basename(name)} unhealthy: {e}")
+                self.scanner_pool.mark_unavailable(name, ScannerPool.UNHEALTHY_COOLDOWN)
+
     async def _safe_stop(self, client):
         try:
             if client.is_connected:          # only if the handshake ever finished
@@ -426,10 +768,16 @@ class GiftBot:
         async with self._restart_lock:  # Prevent multiple concurrent restarts
             try:
                 self._should_wait = True  # Signal to main loop
+                RESTARTS.inc(tenant=self._username)
                 self.logger.warning(f"Beginning client restart: {reason}")
+                if isinstance(reason, Unauthorized):
+                    # The session was revoked; don't trust the cached pre-flight result
+                    validation_cache.invalidate(self._username)
                 
                 await self._safe_stop(self.app)
                 await self._safe_stop(self.buyer_app)
+                for scanner in self.scanner_apps:
+                    await self._safe_stop(scanner)
                 
                 # Quick cooldown before reinitialization
                 await asyncio.sleep(10)
@@ -463,12 +811,7 @@ class GiftBot:
 
         self.bot_state.running = False
         self._should_wait = False
-        # Parallelize notifications
-        send_notification_to_user(
-                "🛑 Bot Stopped",
-                msg,
-                self._username
-            )
+        await self._notify_user("🛑 Bot Stopped", msg)
         await self._notify_admin(msg)
         self.bot_state.add_log(msg)
 
@@ -507,6 +850,7 @@ class GiftBot:
                 self.app.start(),
                 self.buyer_app.start()
             )
+            await self._initialize_scanners(proxy_config)
             # Cache the peer ID during initialization
             await self._cache_peer_id()
             
@@ -517,10 +861,43 @@ class GiftBot:
                 error_details=str(e)
             )
             return False
+    async def _initialize_scanners(self, proxy_config: Optional[Dict]) -> None:
+        """Start extra scanner accounts and shard the catalog across them"""
+        self.scanner_pool = ScannerPool()
+        self.scanner_pool.add(self.app.name, self.app)
+        self.scanner_apps = []
+
+        for phone in self.cached_config['SCANNER_PHONE_NUMBERS']:
+            session_name = os.path.join(BASE_DIR, "data/sessions", f"[{self._username}]scanner_{phone}")
+            # Never fall into an interactive login from the bot thread
+            if not os.path.exists(f"{session_name}.session"):
+                self.logger.warning(f"Scanner {phone} has no session - log it in again under Settings > Scanner Accounts")
+                continue
+            scanner = Client(
+                name=session_name,
+                api_id=self.cached_config['APP_API_ID'],
+                api_hash=self.cached_config['APP_API_HASH'],
+                phone_number=phone,
+                proxy=proxy_config,
+                ipv6=bool(proxy_config),
+                no_updates=True
+            )
+            try:
+                await scanner.start()
+            except Exception as e:
+                self.logger.error(f"Scanner {phone} failed to start: {e}")
+                continue
+            self.scanner_apps.append(scanner)
+            self.scanner_pool.add(scanner.name, scanner)
+
+        self.logger.info(f"Scanning with {len(self.scanner_pool.accounts)} account(s)")
+
     async def _cache_peer_id(self) -> None:
         """Cache the peer ID for the admin recipient"""
         try:
-            self.cached_peer = await self.buyer_app.resolve_peer(
+            self.cached_peer = await self._call(
+                self.buyer_app,
+                'resolve_peer',
                 self.cached_config['ADMIN_RECIPIENT_USER']
             )
             self.logger.info(f"Cached peer ID for admin: {type(self.cached_peer).__name__}")
@@ -528,6 +905,9 @@ class GiftBot:
             self.logger.error(f"Failed to cache peer ID: {e}", exc_info=True)
             self.cached_peer = None  # Ensure it's None if resolution fails
 
+    def _acquire_proxy(self) -> Optional[Dict]:
+        return proxy_manager.acquire_proxy(self._username)
+
     def _get_proxy_config(self) -> Optional[Dict]:
         """Prepare proxy configuration if available"""
         if not self.proxy:
@@ -549,20 +929,16 @@ class GiftBot:
 
     async def run(self) -> None:
         """Main bot execution loop with proper resource management"""
-        health_task = None
+        background_tasks: List[asyncio.Task] = []
         
         try:
-            self.proxy = proxy_manager.acquire_proxy(self._username)
+            self.proxy = self._acquire_proxy()
             
             if not await self._initialize_clients():
                 return
                 
             # Initial setup
-            self.current_balance_stars = await self.buyer_app.get_stars_balance()
-            self.bot_state.current_balance_stars = self.current_balance_stars
-            
-            self.current_balance_ton = await self.buyer_app.get_ton_balance() / 1e9
-            self.bot_state.current_balance_ton = self.current_balance_ton
+            await self._reconcile_balance()
             
             startup_messages = [
                 f"Main app started as {self.app.me.first_name} (ID: {self.app.me.id})",
@@ -576,11 +952,20 @@ class GiftBot:
                 
             self.bot_state.add_log("🤖 Gift Sniper Bot started\n" + "\n".join(startup_messages))
             
-            # Start monitoring
-            health_task = asyncio.create_task(self.health_check())
+            # Start monitoring and listen for listings scanned by other tenants
+            self.feed = market_feed.subscribe(self._username, self._feed_interest())
+            background_tasks.append(asyncio.create_task(self.health_check()))
+
+            # Continuous pipeline: scheduler -> scan workers -> filter/buy workers
+            scan_workers = self.SCAN_WORKERS_PER_ACCOUNT * len(self.scanner_pool.accounts)
+            background_tasks += [asyncio.create_task(self._scan_worker()) for _ in range(scan_workers)]
+            background_tasks += [asyncio.create_task(self._filter_worker()) for _ in range(self.FILTER_WORKERS)]
+            background_tasks += [asyncio.create_task(self._purchase_worker()) for _ in range(self.PURCHASE_WORKERS)]
+            background_tasks.append(asyncio.create_task(self._reconcile_balance_loop()))
+            background_tasks.append(asyncio.create_task(self._keep_buyer_warm()))
             
-            # Main processing loop
-            cycle_count = 0
+            # Main dispatch loop
+            last_report = time.monotonic()
             while self.bot_state.running:
                 try:
                     # Minimal wait check - non-blocking
@@ -589,111 +974,154 @@ class GiftBot:
                         await asyncio.sleep(0.5)  # Tiny sleep to avoid tight loop
                         continue  # Skip this iteration
 
-                    await self._process_gift_cycle(cycle_count)
-                    cycle_count += 1
-                    self.bot_state.bot_cycle = cycle_count
+                    self._dispatch_due_gifts()
+
+                    if time.monotonic() - last_report >= self.STATS_INTERVAL:
+                        last_report = time.monotonic()
+                        self._publish_engine_stats()
+
+                    # Wake up for the next deadline, but re-check budget changes at least every second
+                    await asyncio.sleep(min(self.scheduler.time_until_next(), 1.0))
                     
                 except Exception as e:
                     self.logger.error(
-                        f"Error in main loop (cycle {cycle_count})",
+                        "Error in main dispatch loop",
                         exc_info=True
                     )
                     await asyncio.sleep(30)
                     
         finally:
-            await self._shutdown(health_task)
-
-    async def _process_gift_cycle(self, cycle_count: int) -> None:
-        """Process one cycle of gift checking with proper concurrency control"""
-        
-        async def process_with_limits(gift_id, gift_title, client, semaphore):
-            return await self.process_gift(int(gift_id), gift_title, client, semaphore)
-
-        gift_items = list(GIFT_MAPPINGS.items())
-        
-        tasks = []
-        # Single client, use all gifts with semaphore
-        for gift_id, gift_title in gift_items:
-            tasks.append(process_with_limits(gift_id, gift_title, self.app, self.app_semaphore))
-
-        # Run all tasks concurrently but limited by semaphores
-        await asyncio.gather(*tasks)
+            await self._shutdown(background_tasks)
 
+    def _dispatch_due_gifts(self) -> None:
+        """Hand every gift whose deadline passed to the scan workers"""
+        # Each available scanner account adds a full sweep's worth of budget
+        self.scheduler.set_base_interval(
+            self.cached_config['SLEEP_BETWEEN_CYCLES'] / max(self.scanner_pool.available_count(), 1)
+        )
+        for item in self.scheduler.pop_due():
+            self.scan_queue.put_nowait(item)
+
+    def _publish_engine_stats(self) -> None:
+        throughput = self.throughput.snapshot()
+        self.bot_state.bot_cycle = throughput['sweeps']
+        self.bot_state.throughput = throughput
+        self.bot_state.scan_rates = self.scheduler.scan_rates()
+        self.bot_state.scanners = self.scanner_pool.stats(self.gift_filter.eligible_ids())
+        self.bot_state.rate_limits = limiter_stats(f"[{self._username}]")
+        self.bot_state.purchase_lane = self.purchase_lane.stats()
+        self.bot_state.balance_ledger = self.balance.snapshot()
+        index = self.listing_index.stats()
         self.logger.info(
-            f"[{cycle_count}] Completed cycle. "
-            f"Waiting {self.cached_config['SLEEP_BETWEEN_CYCLES']} seconds..."
+            f"Scanning {throughput['scans_per_sec']} gifts/s, "
+            f"full catalog every {throughput['coverage_seconds']}s "
+            f"({self.scan_queue.qsize()} queued, {index['hits']} repeat offers skipped)"
         )
-        await asyncio.sleep(self.cached_config['SLEEP_BETWEEN_CYCLES'])
 
-    async def _shutdown(self, health_task: Optional[asyncio.Task]) -> None:
+    async def _shutdown(self, background_tasks: List[asyncio.Task]) -> None:
         """Handle graceful shutdown"""
         self.bot_state.running = False
-        
-        if health_task:
-            health_task.cancel()
+        market_feed.unsubscribe(self._username)
+        if self._resync_task:
+            background_tasks = [*background_tasks, self._resync_task]
+
+        for task in background_tasks:
+            task.cancel()
             try:
-                await health_task
+                await task
             except (asyncio.CancelledError, Exception):
                 pass
         
 
+purchase_ledger = PurchaseLedger(os.path.join(BASE_DIR, 'data', 'purchases.db'))
+
+
 class BotState:
-    def __init__(self, state_file):
+    LOG_RING_SIZE = 500  # newest log lines kept in memory; the rest are paged from disk
+
+    def __init__(self, username, logs_dir, ledger: Optional[PurchaseLedger] = None,
+                 states: Optional[BotStateRepository] = None):
         self._lock = Lock()
-        self._state_file = state_file
+        self._username = username
+        self.ledger = ledger or purchase_ledger
+        self.states = states or get_storage().bot_states
+        self._logs = open_log_store(logs_dir, self.LOG_RING_SIZE)
         self._running = False
         self._current_balance_stars = None
         self._current_balance_ton = None
         self.bot_cycle = None
+        self.scan_rates = {}
+        self.scanners = {}
+        self.rate_limits = {}
+        self.throughput = {}
+        self.purchase_lane = {}
+        self.balance_ledger = {}
+        self.config_version = None
+        self.restore_status = None  # queued / validating / restored / failed: ... during startup restore
         self._last_error = None
-        self._recent_logs = []
-        self._purchased_gifts = []
         self._start_time = None
         self._original_start_time = None
         self.last_error = None
         self.bot_instance = None
-        self.loop = None
-        self.thread = None
+        self.future = None  # the bot's task on the shared loop runtime
+        self._frozen = False  # set at process shutdown: the stored row must survive the stop
         self._load_state()  # Load initial state
 
     def _load_state(self):
-        if os.path.exists(self._state_file):
-            try:
-                with open(self._state_file, 'r') as f:
-                    data = json.load(f)
-                self._running = data.get('running', False)
-                self._current_balance_stars = data.get('current_balance_stars')
-                self._current_balance_ton = data.get('current_balance_ton')
-                self.bot_cycle = data.get('bot_cycle')
-                self._recent_logs = data.get('recent_logs', [])
-                self._purchased_gifts = data.get('purchased_gifts', [])
-                self._original_start_time = data.get('original_start_time')
+        try:
+            data = self.states.get(self._username)
+            if data:
+                self._running = data['running']
+                self._current_balance_stars = data['current_balance_stars']
+                self._current_balance_ton = data['current_balance_ton']
+                self.bot_cycle = data['bot_cycle']
+                self._original_start_time = data['original_start_time']
 
                 # Calculate elapsed time if bot was running
                 if self._running and self._original_start_time:
                     elapsed = time.time() - self._original_start_time
                     self._start_time = time.time() - elapsed
-            except Exception as e:
-                print(f"Failed to load bot state: {e}")
+        except Exception as e:
+            print(f"Failed to load bot state: {e}")
+
+    def _snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                'running': self._running,
+                'current_balance_stars': self._current_balance_stars,
+                'current_balance_ton': self._current_balance_ton,
+                'bot_cycle': self.bot_cycle,
+                'original_start_time': self._original_start_time
+            }
 
     def save_state(self):
-        data = {
-            'running': self._running,
-            'current_balance_stars': self._current_balance_stars,
-            'current_balance_ton': self._current_balance_ton,
-            'bot_cycle': self.bot_cycle,
-            'recent_logs': self._recent_logs,
-            'purchased_gifts': self._purchased_gifts,
-            'original_start_time': self._original_start_time
-        }
-        with open(self._state_file, 'w') as f:
-            json.dump(data, f, indent=2)
+        if self._frozen:
+            return
+        # Write-behind: changes within one flush window become a single row upsert
+        state_writer.mark((self.states, self._username), self._snapshot, self._write)
+
+    def _write(self, snapshot: Dict):
+        self.states.save(self._username, snapshot)
+
+    def flush(self):
+        state_writer.flush((self.states, self._username))
+        self._logs.flush()
+
+    def freeze(self):
+        """Write the current row and stop saving, so a shutdown's stop doesn't clear the running flag"""
+        self.flush()
+        self._frozen = True
 
     @property
     def running(self):
         with self._lock:
             return self._running
 
+    @property
+    def alive(self) -> bool:
+        """True while the bot's task is actually executing"""
+        return self.future is not None and not self.future.done()
+
     @property
     def start_time(self):
         with self._lock:
@@ -717,39 +1145,40 @@ class BotState:
                 self.save_state()
 
     def add_log(self, message):
-        with self._lock:
-            # Add timestamp to the log message
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            log_entry = f"[{timestamp}] {message}"
+        # Add timestamp to the log message
+        timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        log_entry = f"[{timestamp}] {message}"
 
-            self._recent_logs.append(log_entry)
-            self.save_state()
+        # Appended to the log store; the state file isn't touched
+        self._logs.append(log_entry)
 
-    def add_gift(self, user_id, gift_link, price):
+    def add_gift(self, user_id, gift_link, price, currency="stars", gift_title=None):
         """
-        Record a gift purchase.
+        Record a gift purchase in the purchase ledger.
 
         Parameters
         ----------
-        user_id   : int | str     –  who bought it
-        gift_link   : str     –  your internal gift/product
-        price     : float | int   –  price paid (same units as the rest of your app)
+        user_id    : int | str     –  who received it
+        gift_link  : str           –  the gift's t.me/nft link
+        price      : int           –  stars paid, or nanoTON when ``currency`` is "ton"
+        currency   : str           –  "stars" or "ton"
+        gift_title : str | None    –  gift type, for per-gift totals
         """
-        with self._lock:
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            entry = {
-                "timestamp": timestamp,
-                "user_id": user_id,
-                "gift_link": gift_link,
-                "price": price
-            }
-            self._purchased_gifts.append(entry)
-            self.save_state()
+        self.ledger.record(self._username, gift_link, currency, price, gift=gift_title, recipient=user_id)
 
     @property
     def recent_logs(self):
-        with self._lock:
-            return self._recent_logs.copy()
+        """The newest LOG_RING_SIZE log lines, oldest first"""
+        return self._logs.recent()
+
+    @property
+    def log_count(self):
+        """Number of log lines ever written"""
+        return len(self._logs)
+
+    def log_page(self, page, per_page):
+        """One page of logs, newest first, plus the total number of lines"""
+        return self._logs.page(page, per_page)
 
     @property
     def current_balance_stars(self):
@@ -782,16 +1211,22 @@ class BotStateManager:
         """Get or create a BotState instance for the given username"""
         with self._lock:
             if username not in self._states:
-                state_file = os.path.join(BASE_DIR, 'data/bot_states', f'{username}.json')
-                os.makedirs(os.path.dirname(state_file), exist_ok=True)
-                self._states[username] = BotState(state_file)
+                logs_dir = os.path.join(BASE_DIR, 'data/bot_states', f'{username}.logs')
+                self._states[username] = BotState(username, logs_dir)
             return self._states[username]
 
+    def alive_states(self) -> Dict[str, 'BotState']:
+        """States of the bots whose task is executing, by username"""
+        with self._lock:
+            return {username: state for username, state in self._states.items() if state.alive}
+
     def cleanup_state(self, username):
         """Clean up state for a username when no longer needed"""
         with self._lock:
-            if username in self._states:
-                del self._states[username]
+            state = self._states.pop(username, None)
+        if state:
+            # The next get_state reads the row, so it must be current
+            state.flush()
 
 
 # Global state manager
@@ -829,6 +1264,9 @@ class WebEnabledGiftBot(GiftBot):
                     await self.app.stop()
                 if hasattr(self, 'buyer_app') and self.buyer_app and self.buyer_app.is_connected:
                     await self.buyer_app.stop()
+                for scanner in self.scanner_apps:
+                    if scanner.is_connected:
+                        await scanner.stop()
             except Exception as e:
                 get_logger(self.username).warning(f"Error stopping clients: {e}")
             finally:
@@ -837,14 +1275,19 @@ class WebEnabledGiftBot(GiftBot):
 # Start/stop bot functions
 
 
-def run_bot_in_thread(username):
-    asyncio.set_event_loop(bot_state_manager.get_state(username).loop)
+async def run_bot(username):
     bot = WebEnabledGiftBot(username)
     bot_state_manager.get_state(username).bot_instance = bot
-    bot_state_manager.get_state(username).loop.run_until_complete(bot.run())
+    await bot.run()
 
 
-def validate_environment(username):
+validation_cache = ValidationCache(
+    os.path.join(BASE_DIR, 'data', 'validation_cache.json'),
+    ttl=float(os.getenv('VALIDATION_CACHE_TTL', 6 * 3600)),
+)
+
+
+async def check_environment(username):
     """Validate all critical components before starting the bot"""
     try:
         _config_settings = get_config_settings(username)
@@ -876,6 +1319,15 @@ def validate_environment(username):
             logger.error(f"Buyer session file not found at {buyer_session_file}")
             return {'valid': False, 'message': 'Buyer session missing - please log in again'}
 
+        # Same sessions, credentials and recipient as a recent successful check: skip the handshake
+        fingerprint = session_fingerprint(
+            [app_session_file, buyer_session_file],
+            [getattr(_config_settings, setting) for setting in required_settings]
+        )
+        if validation_cache.get(username, fingerprint):
+            logger.info("Sessions validated recently, skipping pre-flight checks")
+            return {'valid': True, 'message': 'Ready to start!'}
+
         # 3. Validate sessions and peer contact status
         async def validate_peer_contact(client, peer_id):
             """
@@ -1002,45 +1454,49 @@ def validate_environment(username):
                     except Exception as e:
                         logger.warning(f"Error disconnecting buyer client: {e}")
 
-        return run_in_telegram_loop(validate_all())
+        result = await validate_all()
+        if result['valid']:
+            validation_cache.put(username, fingerprint)
+        return result
     except Exception as e:
         logger.error(f"Environment validation failed: {str(e)}")
         return {'valid': False, 'message': 'Setup failed - please check configuration'}
 
-def start_bot(username, is_restore=False):
-    """Start the bot for a user
-    Args:
-        username: The user to start bot for
-        is_restore: Whether this is a restoration attempt after server restart
-    """
+
+def validate_environment(username):
+    return run_in_telegram_loop(check_environment(username))
+
+
+def _already_running(username, is_restore) -> bool:
     state = bot_state_manager.get_state(username)
-    logger = get_logger(username)
 
-    # Check if bot is actually running (thread exists and is alive)
-    is_actually_running = state.thread and state.thread.is_alive() if hasattr(state, 'thread') else False
+    # Check if bot is actually running (its task exists and hasn't finished)
+    is_actually_running = state.alive
 
     # If actually running and not a restoration, return already running
     if is_actually_running and not is_restore:
-        return True, 'Bot is already running'
+        return True
 
     # For restoration attempts, we proceed even if state.running is True
-    # because the thread is actually dead after server restart
+    # because the task is actually gone after server restart
     if state.running and not is_restore:
-        # This handles cases where state says running but thread is dead
+        # This handles cases where state says running but task is dead
         if not is_actually_running:
             state.running = False  # Clean up invalid state
         else:
-            return True, 'Bot is already running'
+            return True
+    return False
 
-    validation = validate_environment(username)
+
+def _launch_bot(username, is_restore, validation):
+    state = bot_state_manager.get_state(username)
+    logger = get_logger(username)
     if not validation['valid']:
         logger.error(f"Bot start prevented for {username}: {validation['message']}")
         return False, validation['message']
 
     try:
-        state.loop = asyncio.new_event_loop()
-        state.thread = Thread(target=run_bot_in_thread, args=(username,))
-        state.thread.start()
+        state.future = bot_runtime.submit(username, lambda: run_bot(username))
 
         # Only update running state if this isn't a restoration
         if not is_restore:
@@ -1053,13 +1509,32 @@ def start_bot(username, is_restore=False):
         return False, f'Bot start failed: {str(e)}'
 
 
+def start_bot(username, is_restore=False):
+    """Start the bot for a user
+    Args:
+        username: The user to start bot for
+        is_restore: Whether this is a restoration attempt after server restart
+    """
+    if _already_running(username, is_restore):
+        return True, 'Bot is already running'
+    return _launch_bot(username, is_restore, validate_environment(username))
+
+
+async def start_bot_job(username) -> Dict:
+    """start_bot for the job API: validation awaits on the runtime instead of blocking a thread"""
+    if _already_running(username, False):
+        return {'success': True, 'message': 'Bot is already running'}
+    started, message = _launch_bot(username, False, await check_environment(username))
+    return {'success': started, 'message': message}
+
+
 def stop_bot(username):
     state = bot_state_manager.get_state(username)
     logger = get_logger(username)
     proxy_manager.release_proxy_by_user(username)
 
-    # Check if thread is actually running
-    is_actually_running = state.thread and state.thread.is_alive() if hasattr(state, 'thread') else False
+    # Check if the bot's task is actually running
+    is_actually_running = state.alive
 
     if not is_actually_running:
         if state.running:  # Clean up invalid state
@@ -1068,82 +1543,247 @@ def stop_bot(username):
 
     state.running = False
 
-    if state.thread:
-        state.thread.join(timeout=10)
-        if state.thread.is_alive():
-            logger.warning(f"Bot thread did not stop gracefully for {username}")
+    if state.future:
+        try:
+            state.future.result(timeout=10)
+        except concurrent.futures.TimeoutError:
+            logger.warning(f"Bot task did not stop gracefully for {username}, cancelling it")
+            bot_runtime.cancel(username)
+        except BaseException:
+            pass
 
     bot_state_manager.cleanup_state(username)
     msg = 'Bot Stopped'
-    state.add_log()
+    state.add_log(msg)
     get_logger(username).info(msg)
     return True
 
 
+def shutdown_bots(timeout: float = 20) -> int:
+    """
+    Stop every bot in this process before it exits. Their stored running
+    flag stays set, so the next start restores them. Returns how many
+    bots were stopped.
+    """
+    states = bot_state_manager.alive_states()
+    for state in states.values():
+        state.freeze()
+        state.running = False
+    deadline = time.monotonic() + timeout
+    for username, state in states.items():
+        try:
+            state.future.result(timeout=max(0, deadline - time.monotonic()))
+        except concurrent.futures.TimeoutError:
+            get_logger(username).warning(f"Bot task did not stop gracefully for {username}, cancelling it")
+            bot_runtime.cancel(username)
+        except BaseException:
+            pass
+    state_writer.flush()
+    purchase_ledger.flush()
+    return len(states)
+
+
+def purge_tenant(username) -> int:
+    """
+    Stop the tenant's bot and delete its purchases through the shared
+    ledger, so rows it still had queued can't be written back afterwards
+    """
+    stop_bot(username)
+    return purchase_ledger.delete_tenant(username)
+
+
+def reload_bot_config(username) -> str:
+    """
+    Push saved settings into a running bot. Returns 'applied' when swapped
+    in mid-run, 'pending' when the bot hasn't finished applying them yet,
+    'restarted'/'restart_failed' when account changes forced a client
+    restart, or 'not_running' (the next start reads them anyway).
+    """
+    state = bot_state_manager.get_state(username)
+    bot = state.bot_instance
+    loop = bot_runtime.loop_for(username)
+    if not state.alive or not bot or not loop:
+        return 'not_running'
+
+    try:
+        applied = asyncio.run_coroutine_threadsafe(bot.reload_config(), loop).result(timeout=30)
+    except concurrent.futures.TimeoutError:
+        # Still running on the bot's loop; it applies the settings when it gets there
+        return 'pending'
+    if applied:
+        return 'applied'
+
+    get_logger(username).info("Account settings changed, restarting the bot")
+    stop_bot(username)
+    started, _ = start_bot(username)
+    return 'restarted' if started else 'restart_failed'
+
+
+def usernames_to_restore() -> List[str]:
+    """Users whose bot was running when the server went down"""
+    return get_storage().bot_states.running()
+
+
+# Startup restore: how many tenants validate at once, and the minimum gap between their connects
+RESTORE_CONCURRENCY = int(os.getenv('RESTORE_CONCURRENCY', 10))
+RESTORE_STAGGER = float(os.getenv('RESTORE_STAGGER', 0.1))
+restore_progress = {'total': 0, 'restored': 0, 'failed': 0, 'started_at': None, 'finished_at': None}
+
+
+async def restore_bot_async(username) -> bool:
+    """Restart one bot that was running before a restart (or a crashed engine worker)"""
+    logger = get_logger(username)
+    state = bot_state_manager.get_state(username)
+    try:
+        state.restore_status = 'validating'
+        # Restores bypass the running checks
+        success, message = _launch_bot(username, True, await check_environment(username))
+
+        if success:
+            state.restore_status = 'restored'
+            logger.info(f"Successfully restored bot for {username}")
+        else:
+            state.restore_status = f'failed: {message}'
+            logger.error(f"Failed to restore bot for {username}: {message}")
+            # Clean up invalid state
+            state.running = False
+        return success
+    except Exception as e:
+        state.restore_status = f'failed: {e}'
+        logger.error(f"Error restoring bot for {username}: {str(e)}")
+        return False
+
+
+def restore_bot(username):
+    return run_in_telegram_loop(restore_bot_async(username))
+
+
+async def restore_bots(usernames) -> Dict[str, bool]:
+    """
+    Restore many tenants side by side: at most RESTORE_CONCURRENCY
+    validate at once and connects start RESTORE_STAGGER apart, so a big
+    box comes back quickly without tripping Telegram's flood limits.
+    """
+    usernames = list(usernames)
+    restore_progress.update(
+        total=restore_progress['total'] + len(usernames),
+        started_at=restore_progress['started_at'] or time.time(), finished_at=None,
+    )
+    for username in usernames:
+        bot_state_manager.get_state(username).restore_status = 'queued'
+
+    semaphore = asyncio.Semaphore(RESTORE_CONCURRENCY)
+    next_slot = time.monotonic()
+
+    async def restore(username):
+        nonlocal next_slot
+        async with semaphore:
+            # Claim the next connect slot before waiting for it
+            delay, next_slot = next_slot - time.monotonic(), max(next_slot, time.monotonic()) + RESTORE_STAGGER
+            if delay > 0:
+                await asyncio.sleep(delay)
+            success = await restore_bot_async(username)
+        restore_progress['restored' if success else 'failed'] += 1
+        return success
+
+    results = await asyncio.gather(*(restore(username) for username in usernames))
+    restore_progress['finished_at'] = time.time()
+    return dict(zip(usernames, results))
+
+
+def restore_many(usernames) -> Dict[str, bool]:
+    return run_in_telegram_loop(restore_bots(usernames))
+
+
 def restore_running_bots():
-    """Restore all bots that were running before restart"""
-    bot_states_dir = os.path.join(BASE_DIR, 'data', 'bot_states')
-    if not os.path.exists(bot_states_dir):
-        return
-
-    for state_file in os.listdir(bot_states_dir):
-        if state_file.endswith('.json'):
-            username = state_file[:-5]  # Remove .json extension
-            state_path = os.path.join(bot_states_dir, state_file)
-            logger = get_logger(username)
-            try:
-                with open(state_path, 'r') as f:
-                    state_data = json.load(f)
-                    if state_data.get('running'):
-                        # Use is_restore=True to bypass running checks
-                        success, message = start_bot(username, is_restore=True)
-
-                        if success:
-                            logger.info(f"Successfully restored bot for {username}")
-                        else:
-                            logger.error(f"Failed to restore bot for {username}: {message}")
-                            # Clean up invalid state
-                            state = bot_state_manager.get_state(username)
-                            state.running = False
-            except Exception as e:
-                logger.error(f"Error restoring bot for {username}: {str(e)}")
+    """Restore all bots that were running before restart (in the background)"""
+    return asyncio.run_coroutine_threadsafe(restore_bots(usernames_to_restore()), bot_runtime.default_loop)
 
 
 def is_bot_running(username):
     return bot_state_manager.get_state(username).running
 
 
-# Global event loop management
-telegram_loop = None
-telegram_thread = None
-telegram_queue = Queue()
-telegram_lock = Lock()
-telegram_results = {}
+def bot_status(username) -> Dict:
+    """Plain-dict snapshot of a tenant's state (safe to send between processes)"""
+    state = bot_state_manager.get_state(username)
+    return {
+        'running': state.running,
+        'alive': state.alive,
+        'start_time': state.start_time,
+        'current_balance_stars': state.current_balance_stars,
+        'current_balance_ton': state.current_balance_ton,
+        'last_error': state.last_error,
+        'bot_cycle': state.bot_cycle,
+        'throughput': state.throughput,
+        'scan_rates': state.scan_rates,
+        'scanners': state.scanners,
+        'rate_limits': state.rate_limits,
+        'purchase_lane': state.purchase_lane,
+        'balance_ledger': state.balance_ledger,
+        'config_version': state.config_version,
+        'restore_status': state.restore_status,
+    }
+
+
+def bot_logs(username) -> List[str]:
+    return bot_state_manager.get_state(username).recent_logs
+
+
+def purchase_history(username, limit=50, before=None, before_id=None) -> Dict:
+    """A page of purchases (newest first) and all-time totals per currency"""
+    ledger = bot_state_manager.get_state(username).ledger
+    return {
+        'purchases': ledger.history(username, limit, before, before_id),
+        'totals': ledger.totals(username),
+    }
 
 
-def start_telegram_loop():
-    global telegram_loop, telegram_thread
-    telegram_loop = asyncio.new_event_loop()
+def purchase_summary(username, days=30) -> Dict:
+    """Spend per day, per gift type and per currency over the last ``days`` days"""
+    ledger = bot_state_manager.get_state(username).ledger
+    since = time.time() - days * 86400
+    return {
+        'days': days,
+        'totals': ledger.totals(username, since),
+        'by_day': ledger.spend_by_day(username, since),
+        'by_gift': ledger.spend_by_gift(username, since),
+    }
 
-    def run_loop():
-        asyncio.set_event_loop(telegram_loop)
-        telegram_loop.run_forever()
 
-    telegram_thread = Thread(target=run_loop, daemon=True)
-    telegram_thread.start()
+def bot_log_page(username, page, per_page) -> Dict:
+    """Page ``page`` (1-based, clamped) of a tenant's logs, newest first"""
+    state = bot_state_manager.get_state(username)
+    per_page = max(1, per_page)
+    total_pages = max(1, (state.log_count + per_page - 1) // per_page)
+    page = max(1, min(page, total_pages))
+    logs, total = state.log_page(page, per_page)
+    return {'logs': logs, 'page': page, 'total': total}
+
+
+def engine_stats(username: Optional[str] = None) -> Dict:
+    """Process-wide engine stats (shared feed and loop runtime), as seen by ``username``"""
+    return {
+        'market_feed': market_feed.stats(username),
+        'runtime': bot_runtime.stats(),
+        'jobs': jobs.stats(),
+        'validation_cache': validation_cache.stats(),
+        'restore': dict(restore_progress),
+        'state_writer': state_writer.stats(),
+    }
 
 
-# Start the loop when module loads
-start_telegram_loop()
+# Login/validation clients live on the shared runtime too
+telegram_lock = Lock()
 
 
 def run_in_telegram_loop(coro):
-    """Run a coroutine in the dedicated telegram event loop"""
-    future = asyncio.run_coroutine_threadsafe(coro, telegram_loop)
-    return future.result()  # This will block until done
+    """Run a coroutine on the shared bot runtime"""
+    return bot_runtime.run(coro)  # This will block until done
 
 
 active_clients = {}  # Track active clients by username and type
+login_sessions = {}  # phone -> (client, phone_code_hash, login_type) while a login is pending
 
 
 async def create_client(phone, login_type, username):
@@ -1153,10 +1793,12 @@ async def create_client(phone, login_type, username):
 
     session_path = os.path.join(BASE_DIR, "data/sessions", f"[{username}]{login_type}_{phone}")
     _config_settings = get_config_settings(username)
+    # Scanner accounts search the market with the app credentials
+    uses_app_api = login_type in ('app', 'scanner')
     client = Client(
         name=session_path,
-        api_id=_config_settings.APP_API_ID if login_type == 'app' else _config_settings.BUYER_API_ID,
-        api_hash=_config_settings.APP_API_HASH if login_type == 'app' else _config_settings.BUYER_API_HASH,
+        api_id=_config_settings.APP_API_ID if uses_app_api else _config_settings.BUYER_API_ID,
+        api_hash=_config_settings.APP_API_HASH if uses_app_api else _config_settings.BUYER_API_HASH,
         no_updates=True
     )
 
@@ -1171,20 +1813,19 @@ async def create_client(phone, login_type, username):
 
 async def disconnect_client(username, login_type):
     """Disconnect a client if it exists and clean up session files"""
+    # Never hold the thread lock across an await: it would block the whole loop
     with telegram_lock:
-        if username in active_clients and login_type in active_clients[username]:
-            client = active_clients[username][login_type]
-            try:
-                if client.is_connected:
-                    await client.disconnect()
-                # Force stop the client
-                await client.stop()
-            except Exception as e:
-                get_logger(username).warning(f"Error disconnecting client: {e}")
-            finally:
-                del active_clients[username][login_type]
-                if not active_clients[username]:  # If no more clients for this user
-                    del active_clients[username]
+        client = active_clients.get(username, {}).pop(login_type, None)
+        if username in active_clients and not active_clients[username]:  # If no more clients for this user
+            del active_clients[username]
+    if client:
+        try:
+            if client.is_connected:
+                await client.disconnect()
+            # Force stop the client
+            await client.stop()
+        except Exception as e:
+            get_logger(username).warning(f"Error disconnecting client: {e}")
 
     # # Additional cleanup for session files
     # session_pattern = os.path.join(BASE_DIR, "data/sessions", f"[{username}]{login_type}_*")
@@ -1201,7 +1842,7 @@ async def send_code(client, phone):
     return await client.send_code(phone)
 
 
-async def verify_code(client, phone, code_hash, code, login_type):
+async def verify_code(client, phone, code_hash, code, login_type, username):
     """Verify the code and handle 2FA if needed"""
     try:
         await client.sign_in(
@@ -1209,7 +1850,7 @@ async def verify_code(client, phone, code_hash, code, login_type):
             phone_code_hash=code_hash,
             phone_code=code
         )
-        phone_save_setting(login_type, phone)
+        phone_save_setting(login_type, phone, username)
         return {'success': True, 'requires_2fa': False}
     except SessionPasswordNeeded:
         return {'success': True, 'requires_2fa': True}
@@ -1225,11 +1866,138 @@ async def complete_2fa(client, password):
     return {'success': True}
 
 
+def _keep_login_client(username, login_type, client):
+    with telegram_lock:
+        if username not in active_clients:
+            active_clients[username] = {}
+        active_clients[username][login_type] = client
+
+
+async def send_login_code(username, phone, login_type) -> Dict:
+    """Step 1 of an account login: start a client and send the code"""
+    # Disconnect any existing session first
+    await disconnect_client(username, login_type)
+
+    # Create new client
+    client = await create_client(phone, login_type, username)
+    sent_code = await send_code(client, phone)
+
+    with telegram_lock:
+        login_sessions[phone] = (client, sent_code.phone_code_hash, login_type)
+    return {'success': True}
+
+
+async def verify_login_code(username, phone, code, login_type) -> Dict:
+    """Step 2: check the code (the result says whether a 2FA password is needed)"""
+    with telegram_lock:
+        session_data = login_sessions.get(phone)
+    if not session_data or session_data[2] != login_type:
+        return {'success': False, 'message': 'Invalid session'}
+
+    client, code_hash, _ = session_data
+    try:
+        result = await verify_code(client, phone, code_hash, code, login_type, username)
+
+        # Clean up session reference after successful verification
+        if result.get('success') and not result.get('requires_2fa'):
+            with telegram_lock:
+                login_sessions.pop(phone, None)
+        return result
+    finally:
+        # Ensure client is properly stored in active_clients
+        _keep_login_client(username, login_type, client)
+
+
+async def finish_login_2fa(username, phone, password, login_type) -> Dict:
+    """Step 3 (optional): finish the login with the 2FA password"""
+    with telegram_lock:
+        session_data = login_sessions.get(phone)
+    if not session_data or session_data[2] != login_type:
+        return {'success': False, 'message': 'Invalid session'}
+
+    client, _, _ = session_data
+    try:
+        result = await complete_2fa(client, password)
+
+        # Update settings and clean up
+        if result.get('success'):
+            phone_save_setting(login_type, phone, username)
+            with telegram_lock:
+                login_sessions.pop(phone, None)
+        return result
+    finally:
+        # Ensure client is properly stored
+        _keep_login_client(username, login_type, client)
+
+
+def login_send_code(username, phone, login_type) -> Dict:
+    return run_in_telegram_loop(send_login_code(username, phone, login_type))
+
+
+def login_verify(username, phone, code, login_type) -> Dict:
+    return run_in_telegram_loop(verify_login_code(username, phone, code, login_type))
+
+
+def login_2fa(username, phone, password, login_type) -> Dict:
+    return run_in_telegram_loop(finish_login_2fa(username, phone, password, login_type))
+
+
+# Slow Telegram operations the web tier can run as jobs instead of waiting on them
+JOB_KINDS = {
+    'login_send_code': (send_login_code, 60),
+    'login_verify': (verify_login_code, 60),
+    'login_2fa': (finish_login_2fa, 60),
+    'start': (start_bot_job, 120),
+}
+jobs = JobManager(bot_runtime)
+
+
+def submit_job(username, kind, *args) -> Dict:
+    """Start a JOB_KINDS operation on the runtime and return its job record"""
+    if kind not in JOB_KINDS:
+        raise ValueError(f"Unknown job type: {kind}")
+    factory, timeout = JOB_KINDS[kind]
+    return jobs.submit(username, kind, lambda: factory(username, *args), timeout).to_dict()
+
+
+def job_status(username, job_id) -> Optional[Dict]:
+    job = jobs.get(username, job_id)
+    return job.to_dict() if job else None
+
+
+def cancel_job(username, job_id) -> bool:
+    return jobs.cancel(username, job_id)
+
+
 def phone_save_setting(login_type, phone, username):
     # Update environment
     settings = config.load_settings(username)
     if login_type == 'app':
         settings['APP_PHONE_NUMBER'] = phone
+    elif login_type == 'scanner':
+        scanners = settings.get('SCANNER_PHONE_NUMBERS') or []
+        if phone not in scanners:
+            settings['SCANNER_PHONE_NUMBERS'] = scanners + [phone]
     else:
         settings['BUYER_PHONE_NUMBER'] = phone
     config.save_settings(username, settings)
+    # A fresh login must be validated again before the next start
+    validation_cache.invalidate(username)
+
+
+def remove_scanner(username, phone) -> bool:
+    """Drop a scanner account from the settings and delete its session"""
+    settings = config.load_settings(username)
+    scanners = settings.get('SCANNER_PHONE_NUMBERS') or []
+    if phone not in scanners:
+        return False
+    config.save_settings(username, {'SCANNER_PHONE_NUMBERS': [p for p in scanners if p != phone]})
+    validation_cache.invalidate(username)
+    session_file = os.path.join(BASE_DIR, "data/sessions", f"[{username}]scanner_{phone}.session")
+    try:
+        os.remove(session_file)
+    except FileNotFoundError:
+        pass
+    except OSError as e:
+        get_logger(username).warning(f"Could not remove session file {session_file}: {e}")
+    return True
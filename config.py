@@ -1,11 +1,9 @@
 # config_manager.py
-import json
 import os
 from threading import Lock
-from pathlib import Path
+from utils.storage import get_storage
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 
-SUBSCRIPTIONS_FILE = os.path.join(BASE_DIR, 'data', "subscriptions.json")
 HISTORY_RETENTION_DAYS = 7
 
 SETTINGS_LOCK = Lock()
@@ -14,10 +12,8 @@ os.makedirs(os.path.join(BASE_DIR, 'data', "logs"), exist_ok=True)
 os.makedirs(os.path.join(BASE_DIR, 'data', "sent_gifts"), exist_ok=True)
 
 class UserConfigManager:
-    def __init__(self, config_dir=os.path.join(BASE_DIR, 'data', 'user_configs')):
-        self.config_dir = Path(config_dir)
-        self.config_dir.mkdir(exist_ok=True)
-        self.locks = {}  # Per-user config locks
+    def __init__(self, repo=None):
+        self.repo = repo or get_storage().configs
         self.default_config = {
             "ADMIN_RECIPIENT_USER": "",
             "DEFAULT_GIFTS_TO_BUY_MAX_PRICE": 200,
@@ -30,66 +26,34 @@ class UserConfigManager:
             "BUYER_API_ID": "",
             "BUYER_API_HASH": "",
             "BUYER_PHONE_NUMBER": "",
-            "GIFT_LIMITS": {}
+            "SCANNER_PHONE_NUMBERS": [],
+            "GIFT_LIMITS": {},
+            "CONFIG_VERSION": 0  # bumped on every save so running bots can tell what they applied
         }
 
-    def get_user_lock(self, username):
-        if username not in self.locks:
-            self.locks[username] = Lock()
-        return self.locks[username]
-
-    def get_config_path(self, username):
-        return self.config_dir / f"{username}.json"
-
     def load_config(self, username):
-        config_path = self.get_config_path(username)
-        if not config_path.exists():
+        user_config = self.repo.get(username)
+        if user_config is None:
             return self.default_config.copy()
 
-        with self.get_user_lock(username):
-            with open(config_path, 'r') as f:
-                user_config = json.load(f)
-                # Remove '@' from ADMIN_RECIPIENT_USER if it exists
-                if 'ADMIN_RECIPIENT_USER' in user_config:
-                    user_config['ADMIN_RECIPIENT_USER'] = user_config['ADMIN_RECIPIENT_USER'].lstrip('@')
-                # Merge with defaults to ensure all keys exist
-                return {**self.default_config, **user_config}
+        # Remove '@' from ADMIN_RECIPIENT_USER if it exists
+        if 'ADMIN_RECIPIENT_USER' in user_config:
+            user_config['ADMIN_RECIPIENT_USER'] = user_config['ADMIN_RECIPIENT_USER'].lstrip('@')
+        # Merge with defaults to ensure all keys exist
+        return {**self.default_config, **user_config}
 
     def save_config(self, username, new_data):
-        config_path = self.get_config_path(username)
-        with self.get_user_lock(username):
-            # Load the existing config or default if not exists
-            if config_path.exists():
-                with open(config_path, 'r') as f:
-                    existing_config = json.load(f)
-            else:
-                existing_config = self.default_config.copy()
-
-            # Merge the new data into the existing config
-            updated_config = {**existing_config, **new_data}
-
-            with open(config_path, 'w') as f:
-                json.dump(updated_config, f, indent=2)
+        # Merged into the saved row (or the defaults) and CONFIG_VERSION bumped, in one transaction
+        return self.repo.merge(username, new_data, self.default_config)
 
     def delete_config(self, username):
-        config_path = self.get_config_path(username)
-        if config_path.exists():
-            with self.get_user_lock(username):
-                config_path.unlink()
-
+        self.repo.delete(username)
 
-def load_subscriptions():
-    """Load subscriptions from file with error handling"""
-    if not os.path.exists(SUBSCRIPTIONS_FILE):
-        return []
 
-    try:
-        with open(SUBSCRIPTIONS_FILE, 'r') as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        return []
-    except IOError as e:
-        return []
+def load_subscriptions(username=None):
+    """Push subscriptions, all of them or one user's"""
+    subscriptions = get_storage().subscriptions
+    return subscriptions.all() if username is None else subscriptions.for_user(username)
 
 
 # def load_settings():
@@ -138,4 +102,4 @@ def get_log_file(username):
     return os.path.join(BASE_DIR, 'data', 'logs', f"{username}.log")
 
 def get_history_file(username):
-    return os.path.join(BASE_DIR, 'data', 'sent_gifts', f"{username}.json")
\ No newline at end of file
+    return os.path.join(BASE_DIR, 'data', 'sent_gifts', f"{username}.log")
\ No newline at end of file
@@ -0,0 +1,158 @@
+"""
+Standalone sniping engine.
+
+Owns every tenant bot and answers the web tier over a local Unix control
+socket, so gunicorn can run many workers without each one starting its own
+copy of every bot, and web restarts don't interrupt sniping:
+
+    python engine_daemon.py                     # listens on data/engine.sock
+    ENGINE_SOCKET=data/engine.sock gunicorn -w 4 -b 0.0.0.0:5913 app:app
+
+ENGINE_PROCESSES still applies here (the daemon then supervises that many
+engine worker processes). Connections are authenticated with ENGINE_AUTHKEY,
+or the key file the daemon writes next to the socket on first start.
+"""
+import argparse
+import os
+import signal
+import sys
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client as Connect
+from multiprocessing.connection import Listener
+from threading import Lock, Thread
+
+from dotenv import load_dotenv
+
+from utils.engine import COMMANDS, DEFAULT_SOCKET, control_authkey, create_engine
+from utils.logger import get_logger
+
+logger = get_logger("engine-daemon")
+
+
+class EngineDaemon:
+    """Serves an engine's API on a Unix socket, one thread per web connection"""
+
+    def __init__(self, engine, address: str, authkey: bytes):
+        self.engine = engine
+        self.address = address
+        self.authkey = authkey
+        self.started_at = time.time()
+        self.connections = 0
+        self.requests = 0
+        self._lock = Lock()
+        self._listener = None
+
+    def serve_forever(self) -> None:
+        self._listener = Listener(self.address, family='AF_UNIX', authkey=self.authkey)
+        os.chmod(self.address, 0o600)
+        logger.info(f"Engine daemon listening on {self.address}")
+        while True:
+            try:
+                conn = self._listener.accept()
+            except OSError:
+                if self._listener is None:
+                    return      # closed by shutdown()
+                logger.warning("Rejected a control connection", exc_info=True)
+                continue
+            Thread(target=self._serve, args=(conn,), name="engine-control", daemon=True).start()
+
+    def _serve(self, conn) -> None:
+        with self._lock:
+            self.connections += 1
+        try:
+            while True:
+                try:
+                    command, args = conn.recv()
+                except (EOFError, OSError):
+                    return
+                with self._lock:
+                    self.requests += 1
+                try:
+                    if command not in COMMANDS:
+                        raise ValueError(f"unknown command {command!r}")
+                    reply = (True, self._dispatch(command, args))
+                except Exception as e:
+                    reply = (False, f"{type(e).__name__}: {e}")
+                try:
+                    conn.send(reply)
+                except (OSError, ValueError):
+                    return
+        finally:
+            with self._lock:
+                self.connections -= 1
+            conn.close()
+
+    def _dispatch(self, command: str, args):
+        result = getattr(self.engine, command)(*args)
+        if command == 'engine_stats':
+            result['daemon'] = self.stats()
+        return result
+
+    def stats(self):
+        with self._lock:
+            return {
+                'pid': os.getpid(),
+                'uptime': round(time.time() - self.started_at),
+                'connections': self.connections,
+                'requests': self.requests,
+            }
+
+    def shutdown(self) -> None:
+        listener, self._listener = self._listener, None
+        if listener:
+            listener.close()    # also removes the socket file
+
+
+def _claim_socket(address: str, authkey: bytes) -> None:
+    """Remove a stale socket file, refusing to start next to a live daemon"""
+    if not os.path.exists(address):
+        return
+    try:
+        Connect(address, family='AF_UNIX', authkey=authkey).close()
+    except OSError:
+        os.unlink(address)
+        return
+    except AuthenticationError:
+        pass    # someone is answering, just not with our key
+    sys.exit(f"An engine daemon is already listening on {address}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run the GiftSniper engine behind a local control socket")
+    parser.add_argument("--socket", default=os.getenv("ENGINE_SOCKET") or DEFAULT_SOCKET,
+                        help="control socket path (default: ENGINE_SOCKET or data/engine.sock)")
+    parser.add_argument("--no-restore", action="store_true", help="don't restart the bots that were running")
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> None:
+    load_dotenv()
+    args = parse_args(argv)
+    address = os.path.abspath(args.socket)
+    authkey = control_authkey(address, create=True)
+    _claim_socket(address, authkey)
+
+    # The daemon hosts the bots itself, whatever ENGINE_SOCKET says
+    engine = create_engine(remote=False)
+    daemon = EngineDaemon(engine, address, authkey)
+
+    def stop(signum, frame):
+        # Stop accepting commands; the bots are stopped once serve_forever returns
+        logger.info("Engine daemon shutting down")
+        daemon.shutdown()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    if not args.no_restore:
+        # Serve the web tier while sessions are still being validated
+        Thread(target=engine.restore, name="engine-restore", daemon=True).start()
+    daemon.serve_forever()
+    # Bots keep their persisted running flag and come back on the next start
+    engine.shutdown()
+    logger.info("Engine daemon stopped")
+
+
+if __name__ == "__main__":
+    main()
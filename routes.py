@@ -1,20 +1,17 @@
 # routes.py
 import json
-from flask import Flask, render_template, request, jsonify, redirect, send_from_directory, url_for, flash, session, g
+import sqlite3
+from flask import Flask, Response, render_template, request, jsonify, redirect, send_from_directory, url_for, flash, session, g
 from flask_session import Session
 # from pyotp import TOTP
 import config
 import models
-from bot_manager import (
-    bot_state_manager, is_bot_running, start_bot, stop_bot,
-    run_in_telegram_loop, create_client, send_code,
-    verify_code, complete_2fa, phone_save_setting, 
-    telegram_lock, disconnect_client
-)
-import bot_manager
 from data.gifts import GIFT_MAPPINGS, BACKDROP_CENTER_COLORS
 from utils.logger import get_logger
+from utils.engine import engine
+from utils.storage import get_storage
 import time
+from types import SimpleNamespace
 from datetime import datetime, timedelta
 from flask_minify import Minify  # type: ignore
 # from flask_wtf import CSRFProtect
@@ -44,8 +41,10 @@ Minify(app=app, html=True, js=True, cssless=True)
 
 
 def bot_state():
-    return bot_state_manager.get_state(g.username)
-sessions = {}
+    # One engine round trip per request (bots may live in another process)
+    if 'bot_state' not in g:
+        g.bot_state = SimpleNamespace(**engine.status(g.username))
+    return g.bot_state
 
 @app.route('/')
 def index():
@@ -66,10 +65,10 @@ def index():
     return render_template(
         'index.html.j2',
         settings=settings,
-        bot_status=is_bot_running(g.username),
+        bot_status=engine.is_running(g.username),
         current_balance_stars=bot_state().current_balance_stars if bot_state().current_balance_stars is not None else "N/A",
         current_balance_ton=bot_state().current_balance_ton if bot_state().current_balance_ton is not None else "N/A",
-        recent_logs=bot_state().recent_logs,
+        recent_logs=engine.logs(g.username),
         account_expired=is_expired,
         days_left=days_left,
         expiry_date=expiry_date_str,
@@ -81,6 +80,16 @@ def index():
     )
 
 
+def settings_saved_message(outcome, what='Settings'):
+    if outcome == 'restart_failed':
+        return f'{what} saved, but the bot could not restart with the new accounts - check the logs', 'error'
+    return {
+        'applied': f'{what} saved and applied to the running bot!',
+        'pending': f'{what} saved, the running bot is still applying them.',
+        'restarted': f'{what} saved, bot restarted with the new accounts!',
+    }.get(outcome, f'{what} saved successfully!'), 'success'
+
+
 @app.route('/settings', methods=['GET', 'POST'])
 def settings():
     if request.method == 'POST':
@@ -90,9 +99,8 @@ def settings():
         new_settings['BACKDROPS_NOT_TO_BUY'] = request.form.getlist('BACKDROPS_NOT_TO_BUY')
         print(new_settings)
         config.save_settings(g.username, new_settings)
-        # Stop the bot if it's running to apply new settings
-        stop_bot(g.username)
-        flash('Settings saved successfully!', 'success')
+        # Running bots pick up the new settings (and restart only if the accounts changed)
+        flash(*settings_saved_message(engine.reload_config(g.username)))
 
         return redirect(url_for('settings'))
 
@@ -104,6 +112,17 @@ def settings():
                            BACKDROP_CENTER_COLORS=BACKDROP_CENTER_COLORS.items())
 
 
+@app.route('/settings/scanners/remove', methods=['POST'])
+def remove_scanner():
+    phone = request.form.get('phone', '')
+    if not engine.remove_scanner(g.username, phone):
+        flash('Scanner account not found', 'error')
+        return redirect(url_for('settings'))
+    # The running bot restarts without the removed account
+    flash(*settings_saved_message(engine.reload_config(g.username), 'Scanner accounts'))
+    return redirect(url_for('settings'))
+
+
 @app.route('/settings/gift-limits', methods=['GET', 'POST'])
 def gift_limits():
     settings = config.load_settings(g.username)
@@ -124,8 +143,7 @@ def gift_limits():
 
         # Save the new limits
         config.save_settings(g.username, {'GIFT_LIMITS': gift_limits})
-        stop_bot(g.username)
-        flash('Gift limits updated successfully!', 'success')
+        flash(*settings_saved_message(engine.reload_config(g.username), 'Gift limits'))
         return redirect(url_for('gift_limits'))
 
     # For GET requests, show the form
@@ -141,22 +159,17 @@ def quick_logs():
     page = request.args.get('page', default=1, type=int)
     per_page = request.args.get('per_page', default=10, type=int)
 
-    # Get the logs in reverse order (newest first)
-    all_logs = bot_state().recent_logs[::-1]
+    per_page = max(1, per_page)
 
-    # Calculate pagination
-    total_logs = len(all_logs)
+    # Only the requested page is read (newest first); the page is clamped to the valid range
+    result = engine.log_page(g.username, page, per_page)
+    total_logs = result['total']
     total_pages = max(1, (total_logs + per_page - 1) // per_page)
-    page = max(1, min(page, total_pages))  # Clamp page between 1 and total_pages
-
-    start_idx = (page - 1) * per_page
-    end_idx = start_idx + per_page
-    paginated_logs = all_logs[start_idx:end_idx]
 
     return jsonify({
-        'logs': paginated_logs,
+        'logs': result['logs'],
         'pagination': {
-            'current_page': page,
+            'current_page': result['page'],
             'per_page': per_page,
             'total_pages': total_pages,
             'total_logs': total_logs
@@ -179,17 +192,29 @@ def serve_gift_image(filename):
 def find_key(d, value):
     return next((k for k, v in d.items() if v == value), None)
 
+def wants_job():
+    # {"async": true} (or ?async=1) returns a job id to poll instead of waiting on Telegram
+    data = request.get_json(silent=True) or {}
+    return bool(data.get('async')) or request.args.get('async') == '1'
+
+
+def submit_job(kind, *args):
+    return jsonify(engine.submit_job(g.username, kind, *args)), 202
+
+
 @app.route('/api/bot/start', methods=['POST'])
 def api_start_bot():
     if bot_state().running:
         return jsonify({'status': 'error', 'message': 'Bot is already running'})
-    started, message = start_bot(g.username)
+    if wants_job():
+        return submit_job('start')
+    started, message = engine.start(g.username)
     return jsonify({'status': 'success' if started else 'error', 'message': message})
 
 
 @app.route('/api/bot/stop', methods=['POST'])
 def api_stop_bot():
-    success = stop_bot(g.username)
+    success = engine.stop(g.username)
     return jsonify({'status': 'success' if success else 'error', 'message': 'Bot stopped' if success else 'Bot is not running'})
 
 
@@ -200,11 +225,51 @@ def api_bot_status():
         'balance_stars': bot_state().current_balance_stars if bot_state().current_balance_stars is not None else "N/A",
         'balance_ton': bot_state().current_balance_ton if bot_state().current_balance_ton is not None else "N/A",
         'last_error': bot_state().last_error,
-        'thread_alive': bot_state().thread.is_alive() if bot_state().thread else False,
+        'thread_alive': bot_state().alive,
         'bot_cycles': bot_state().bot_cycle if bot_state().bot_cycle is not None else "N/A",
+        'throughput': bot_state().throughput,
+        'restore_status': bot_state().restore_status,
     })
 
 
+@app.route('/api/purchases', methods=['GET'])
+def api_purchases():
+    # Newest first; pass the last purchase's ts and id as ?before=&before_id= for the next page
+    limit = max(1, min(request.args.get('limit', default=50, type=int), 500))
+    before = request.args.get('before', type=float)
+    before_id = request.args.get('before_id', type=int)
+    return jsonify(engine.purchases(g.username, limit, before, before_id))
+
+
+@app.route('/api/purchases/summary', methods=['GET'])
+def api_purchase_summary():
+    days = max(1, min(request.args.get('days', default=30, type=int), 3650))
+    return jsonify(engine.purchase_summary(g.username, days))
+
+
+@app.route('/api/bot/engine', methods=['GET'])
+def api_bot_engine():
+    return jsonify({
+        'running': bot_state().running,
+        'scan_rates': bot_state().scan_rates,
+        'scanners': bot_state().scanners,
+        'rate_limits': bot_state().rate_limits,
+        'purchase_lane': bot_state().purchase_lane,
+        'balance_ledger': bot_state().balance_ledger,
+        **engine.engine_stats(g.username),
+    })
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    # Scrapers authenticate with METRICS_TOKEN; logged-in admins can look too
+    token = os.getenv('METRICS_TOKEN')
+    authorized = bool(token) and request.headers.get('Authorization') == f"Bearer {token}"
+    if not authorized and not models.UserManager().is_admin(session.get('username')):
+        return Response("Forbidden\n", status=403, mimetype='text/plain')
+    return Response(engine.metrics(), mimetype='text/plain; version=0.0.4')
+
+
 @app.route('/api/bot/runtime', methods=['GET'])
 def api_bot_runtime():
     if not bot_state().running or not bot_state().start_time:
@@ -220,13 +285,13 @@ def handle_login():
     login_type = data.get('type')
     username = g.username
     
-    if not phone or login_type not in ['app', 'buyer']:
+    if not phone or login_type not in ['app', 'buyer', 'scanner']:
         return jsonify({'success': False, 'message': 'Invalid parameters'})
 
     # Validate required settings
     missing = []
     user_settings = config.load_settings(username)
-    if login_type == 'app':
+    if login_type in ('app', 'scanner'):
         if not user_settings['APP_API_ID']:
             missing.append('App ID')
         if not user_settings['APP_API_HASH']:
@@ -240,17 +305,9 @@ def handle_login():
         return jsonify({'success': False, 'message': f"Missing: {', '.join(missing)}"})
 
     try:
-        # Disconnect any existing session first
-        run_in_telegram_loop(disconnect_client(username, login_type))
-        
-        # Create new client
-        client = run_in_telegram_loop(create_client(phone, login_type, username))
-        sent_code = run_in_telegram_loop(send_code(client, phone))
-        
-        with telegram_lock:
-            sessions[phone] = (client, sent_code.phone_code_hash, login_type)
-            
-        return jsonify({'success': True})
+        if wants_job():
+            return submit_job('login_send_code', phone, login_type)
+        return jsonify(engine.login_send_code(username, phone, login_type))
     except Exception as e:
         get_logger(username).error(f"Login error: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)})
@@ -263,32 +320,14 @@ def handle_verify():
     code = data.get('code')
     login_type = data.get('type')
     username = g.username
-    
-    with telegram_lock:
-        session_data = sessions.get(phone)
-        if not session_data or session_data[2] != login_type:
-            return jsonify({'success': False, 'message': 'Invalid session'})
-    
-    client, code_hash, _ = session_data
+
     try:
-        result = run_in_telegram_loop(verify_code(client, phone, code_hash, code, login_type))
-        
-        # Clean up session reference after successful verification
-        if result.get('success') and not result.get('requires_2fa'):
-            with telegram_lock:
-                if phone in sessions:
-                    del sessions[phone]
-                    
-        return jsonify(result)
+        if wants_job():
+            return submit_job('login_verify', phone, code, login_type)
+        return jsonify(engine.login_verify(username, phone, code, login_type))
     except Exception as e:
         get_logger(username).error(f"Verify error: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        # Ensure client is properly stored in bot_manager.active_clients
-        with telegram_lock:
-            if username not in bot_manager.active_clients:
-                bot_manager.active_clients[username] = {}
-            bot_manager.active_clients[username][login_type] = client
 
 @app.route('/api/telegram/2fa', methods=['POST'])
 def handle_2fa():
@@ -297,40 +336,35 @@ def handle_2fa():
     password = data.get('password')
     login_type = data.get('type')
     username = g.username
-    
-    with telegram_lock:
-        session_data = sessions.get(phone)
-        if not session_data or session_data[2] != login_type:
-            return jsonify({'success': False, 'message': 'Invalid session'})
-    
-    client, _, _ = session_data
+
     try:
-        result = run_in_telegram_loop(complete_2fa(client, password))
-        
-        # Update settings and clean up
-        if result.get('success'):
-            phone_save_setting(login_type, phone, username)
-            with telegram_lock:
-                if phone in sessions:
-                    del sessions[phone]
-                    
-        return jsonify(result)
+        if wants_job():
+            return submit_job('login_2fa', phone, password, login_type)
+        return jsonify(engine.login_2fa(username, phone, password, login_type))
     except Exception as e:
         get_logger(username).error(f"2FA error: {str(e)}", exc_info=True)
         return jsonify({'success': False, 'message': str(e)})
-    finally:
-        # Ensure client is properly stored
-        with telegram_lock:
-            if username not in bot_manager.active_clients:
-                bot_manager.active_clients[username] = {}
-            bot_manager.active_clients[username][login_type] = client
+
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def api_job(job_id):
+    job = engine.job(g.username, job_id)
+    if not job:
+        return jsonify({'success': False, 'message': 'Job not found'}), 404
+    return jsonify(job)
+
+
+@app.route('/api/jobs/<job_id>/cancel', methods=['POST'])
+def api_cancel_job(job_id):
+    cancelled = engine.cancel_job(g.username, job_id)
+    return jsonify({'success': cancelled, 'message': 'Job cancelled' if cancelled else 'Job not found or already finished'})
 
 
 # <!-- Global Login Check Middleware -->
 @app.before_request
 def check_login_and_expiry():
     # Skip for these endpoints
-    if request.endpoint in ['login', 'login_page', 'static']:
+    if request.endpoint in ['login', 'login_page', 'static', 'metrics']:
         return
         
     # Existing user check
@@ -394,25 +428,12 @@ def save_subscription():
         if not new_sub or 'endpoint' not in new_sub:
             return jsonify({"error": "Invalid subscription data"}), 400
 
-        subs = config.load_subscriptions()
-        new_sub['username'] = g.username  # Add username from Flask's g context
-
-        # Check for existing subscription (by endpoint and username)
-        exists = any(
-            sub['endpoint'] == new_sub['endpoint'] and 
-            sub.get('username') == g.username
-            for sub in subs
-        )
-
-        if not exists:
-            subs.append(new_sub)
-            try:
-                with open(config.SUBSCRIPTIONS_FILE, 'w') as f:
-                    json.dump(subs, f, indent=2)  # Indent for better readability
-                return jsonify({"status": "added"})
-            except IOError as e:
-                return jsonify({"error": "Failed to save subscription"}), 500
-        return jsonify({"status": "already_exists"})
+        # One row per (username, endpoint); an existing subscription is left as is
+        try:
+            added = get_storage().subscriptions.add(g.username, new_sub)
+        except sqlite3.Error:
+            return jsonify({"error": "Failed to save subscription"}), 500
+        return jsonify({"status": "added" if added else "already_exists"})
     
     except Exception as e:
         return jsonify({"error": str(e)}), 500
@@ -420,7 +441,7 @@ def save_subscription():
 def initialize_app():
     # This will be called when the app starts
     with app.app_context():
-        bot_manager.restore_running_bots()
+        engine.restore()
 
 # Manually call initialize_app when the module loads
 initialize_app()
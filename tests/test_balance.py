@@ -0,0 +1,54 @@
+from utils.balance import BalanceLedger
+
+
+def ledger(stars=100, ton=1.0):
+    balance = BalanceLedger()
+    balance.reconcile("stars", stars)
+    balance.reconcile("ton", ton)
+    return balance
+
+
+def test_reserve_holds_funds_until_released():
+    balance = ledger(stars=100)
+    first = balance.reserve("stars", 60)
+    assert first is not None
+    assert balance.reserve("stars", 60) is None
+    balance.release(first)
+    assert balance.available("stars") == 100
+    assert balance.reserve("stars", 60) is not None
+
+
+def test_commit_spends_and_ignores_repeats():
+    balance = ledger(stars=100)
+    reservation = balance.reserve("stars", 30)
+    assert balance.commit(reservation) == 70
+    assert balance.commit(reservation) == 70
+    balance.release(reservation)
+    assert balance.available("stars") == 70
+
+
+def test_float_residue_does_not_block_reconcile():
+    balance = ledger(ton=1.0)
+    first, second = balance.reserve("ton", 0.1), balance.reserve("ton", 0.2)
+    balance.release(first)
+    balance.release(second)
+    assert balance.snapshot()["ton"]["reserved"] == 0
+    assert balance.reconcile("ton", 0.5)
+    assert balance.balance("ton") == 0.5
+
+
+def test_reconcile_waits_for_open_reservations():
+    balance = ledger(stars=100)
+    reservation = balance.reserve("stars", 10)
+    assert not balance.reconcile("stars", 500)
+    assert balance.reconcile("stars", 500, force=True)
+    balance.release(reservation)
+
+
+def test_reconcile_refuses_a_balance_fetched_before_a_purchase():
+    balance = ledger(stars=100)
+    generation = balance.generation("stars")
+    balance.commit(balance.reserve("stars", 40))
+    assert not balance.reconcile("stars", 100, generation)
+    assert balance.balance("stars") == 60
+    assert balance.reconcile("stars", 60, balance.generation("stars"))
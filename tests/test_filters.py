@@ -0,0 +1,52 @@
+from data.gifts import BACKDROP_CENTER_COLORS, GIFT_MAPPINGS
+from utils.filters import GiftFilter, get_gift_filter
+from utils.simulator import FakeMarket, MarketProfile
+
+AVOID_GIFTS = ["cap", "PEPE", " ring "]
+AVOID_BACKDROPS = ["black", "Gold"]
+
+
+def naive_banned(keywords, text):
+    return any(k.strip().lower() in text.lower() for k in keywords if k.strip())
+
+
+def test_eligibility_bitmap_matches_a_plain_substring_check():
+    gift_filter = get_gift_filter(AVOID_GIFTS, AVOID_BACKDROPS, GIFT_MAPPINGS)
+    expected = [int(gift_id) for gift_id, title in GIFT_MAPPINGS.items() if not naive_banned(AVOID_GIFTS, title)]
+    assert gift_filter.eligible_ids() == expected
+    assert 0 < len(expected) < len(GIFT_MAPPINGS)
+    for gift_id in GIFT_MAPPINGS:
+        assert gift_filter.is_gift_eligible(int(gift_id)) == (int(gift_id) in expected)
+    assert not gift_filter.is_gift_eligible(-1)
+
+
+def test_filters_are_shared_per_config_version():
+    first = get_gift_filter(AVOID_GIFTS, AVOID_BACKDROPS, GIFT_MAPPINGS)
+    assert get_gift_filter(list(reversed(AVOID_GIFTS)), AVOID_BACKDROPS, GIFT_MAPPINGS) is first
+    assert get_gift_filter(AVOID_GIFTS, [], GIFT_MAPPINGS) is not first
+    assert not get_gift_filter(AVOID_GIFTS, [], GIFT_MAPPINGS).has_backdrop_rules
+
+
+def test_simulated_listings_agree_with_a_plain_backdrop_check():
+    market = FakeMarket(MarketProfile(seed=7, initial_listings=40))
+    gift_filter = get_gift_filter(AVOID_GIFTS, AVOID_BACKDROPS, GIFT_MAPPINGS)
+    checked = banned = 0
+    for gift_id in list(GIFT_MAPPINGS)[:20]:
+        for gift in market.search(int(gift_id), limit=40):
+            backdrop = gift.attributes[1].name
+            verdict = gift_filter.backdrop_banned(backdrop)
+            assert verdict == naive_banned(AVOID_BACKDROPS, backdrop)
+            # A second look is served from the memo and must not change
+            assert gift_filter.backdrop_banned(backdrop) == verdict
+            checked += 1
+            banned += verdict
+    assert checked == 800
+    assert 0 < banned < checked
+
+
+def test_memo_is_bounded(monkeypatch):
+    monkeypatch.setattr(GiftFilter, "MAX_MEMO", 3)
+    gift_filter = GiftFilter(("x",), tuple(BACKDROP_CENTER_COLORS)[:1], ())
+    for i in range(10):
+        assert gift_filter.title_banned(f"title {i} x")
+    assert len(gift_filter._title_memo) == 3
@@ -0,0 +1,77 @@
+import os
+import struct
+
+import pytest
+
+from utils.log_store import LogStore
+
+
+def store(tmp_path, entries=0, ring_size=5, segment_bytes=64):
+    # Tiny segments and ring, so pages cross both the ring edge and segment files
+    logs = LogStore(str(tmp_path / "logs"), ring_size=ring_size, segment_bytes=segment_bytes)
+    logs.extend(f"entry {i}" for i in range(entries))
+    return logs
+
+
+def expected(total, page, per_page):
+    hi = max(total - (page - 1) * per_page, 0)
+    return [f"entry {i}" for i in reversed(range(max(hi - per_page, 0), hi))]
+
+
+@pytest.mark.parametrize("per_page", [1, 3, 5, 7])
+def test_pages_cover_every_entry_once(tmp_path, per_page):
+    logs = store(tmp_path, entries=23)
+    seen = []
+    page = 1
+    while True:
+        entries, total = logs.page(page, per_page)
+        assert total == 23
+        assert entries == expected(23, page, per_page)
+        if not entries:
+            break
+        seen.extend(entries)
+        page += 1
+    assert seen == [f"entry {i}" for i in reversed(range(23))]
+    assert len(os.listdir(tmp_path / "logs")) > 2
+
+
+def test_page_straddling_the_ring_edge(tmp_path):
+    logs = store(tmp_path, entries=12)
+    # Entries 7-11 are in the ring, 3-6 only on disk
+    assert logs.page(1, 9)[0] == expected(12, 1, 9)
+    assert logs.page(2, 9)[0] == ["entry 2", "entry 1", "entry 0"]
+
+
+def test_reopened_store_reads_the_same_pages(tmp_path):
+    logs = store(tmp_path, entries=17)
+    logs.close()
+    reopened = LogStore(str(tmp_path / "logs"), ring_size=5, segment_bytes=64)
+    assert len(reopened) == 17
+    assert reopened.recent() == [f"entry {i}" for i in range(12, 17)]
+    for page in range(1, 5):
+        assert reopened.page(page, 4)[0] == expected(17, page, 4)
+    reopened.append("entry 17")
+    assert reopened.page(1, 2)[0] == ["entry 17", "entry 16"]
+
+
+def test_repair_drops_a_torn_tail(tmp_path):
+    logs = store(tmp_path, entries=6)
+    logs.close()
+    directory = tmp_path / "logs"
+    last = sorted(name for name in os.listdir(directory) if name.endswith(".idx"))[-1][:-4]
+    log_path, idx_path = directory / f"{last}.log", directory / f"{last}.idx"
+    # A crash mid-append: the index slot made it, the line did not finish
+    size = os.path.getsize(log_path)
+    with open(log_path, "ab") as log:
+        log.write(b'"entry 6')
+    with open(idx_path, "ab") as idx:
+        idx.write(struct.pack("<Q", size))
+
+    reopened = LogStore(str(directory), ring_size=5, segment_bytes=64)
+    assert len(reopened) == 6
+    assert os.path.getsize(log_path) == size
+    reopened.append("entry 6")
+    reopened.flush()
+    assert reopened.page(1, 3)[0] == ["entry 6", "entry 5", "entry 4"]
+    reopened.close()
+    assert LogStore(str(directory), ring_size=5, segment_bytes=64).page(1, 7)[0] == expected(7, 1, 7)
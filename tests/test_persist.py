@@ -0,0 +1,54 @@
+import json
+import threading
+from types import SimpleNamespace
+
+from utils import persist
+from utils.persist import StateWriter
+
+
+def test_marks_in_one_window_become_one_write_of_the_latest_snapshot(tmp_path):
+    writer = StateWriter(interval=60)
+    path = str(tmp_path / "state.json")
+    state = {"n": 0}
+    for i in range(100):
+        state["n"] = i
+        writer.mark(path, lambda: dict(state))
+    writer.flush()
+    assert writer.writes == 1 and writer.marks == 100
+    with open(path) as f:
+        assert json.load(f) == {"n": 99}
+
+
+def test_flush_of_one_key_leaves_the_others_pending(tmp_path):
+    writer = StateWriter(interval=60)
+    written = []
+    writer.mark("a", lambda: "a", written.append)
+    writer.mark("b", lambda: "b", written.append)
+    writer.flush("a")
+    assert written == ["a"]
+    assert writer.stats()["pending"] == 1
+    writer.flush()
+    assert written == ["a", "b"]
+
+
+def test_failed_write_does_not_stop_the_others(monkeypatch):
+    errors = []
+    monkeypatch.setattr(persist, "get_logger", lambda name: SimpleNamespace(error=errors.append))
+    writer = StateWriter(interval=60)
+    written = []
+
+    def broken(_):
+        raise OSError("disk full")
+
+    writer.mark("bad", lambda: None, broken)
+    writer.mark("good", lambda: "ok", written.append)
+    writer.flush()
+    assert written == ["ok"]
+    assert errors == ["Failed to persist bad: disk full"]
+
+
+def test_background_thread_writes_without_a_flush():
+    writer = StateWriter(interval=0.01)
+    done = threading.Event()
+    writer.mark("key", lambda: "data", lambda data: done.set())
+    assert done.wait(2)
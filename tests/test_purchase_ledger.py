@@ -0,0 +1,47 @@
+from utils.purchase_ledger import PurchaseLedger
+
+
+def ledger(tmp_path):
+    # A long batch interval keeps recorded rows queued until something flushes
+    return PurchaseLedger(str(tmp_path / "purchases.db"), batch_interval=60)
+
+
+def test_history_pages_through_ties_without_gaps_or_repeats(tmp_path):
+    purchases = ledger(tmp_path)
+    for i in range(7):
+        # Three purchases share each timestamp, so only the id tells them apart
+        purchases.record("alice", f"link-{i}", "stars", 10 + i, ts=1000.0 + i // 3)
+    purchases.record("bob", "other", "stars", 5, ts=1001.0)
+
+    seen, before, before_id = [], None, None
+    while True:
+        page = purchases.history("alice", limit=2, before=before, before_id=before_id)
+        if not page:
+            break
+        assert len(page) <= 2
+        seen.extend(row["gift_link"] for row in page)
+        before, before_id = page[-1]["ts"], page[-1]["id"]
+
+    assert seen == [f"link-{i}" for i in reversed(range(7))]
+
+
+def test_history_page_boundary_on_last_row(tmp_path):
+    purchases = ledger(tmp_path)
+    for i in range(4):
+        purchases.record("alice", f"link-{i}", "stars", 1, ts=1000.0)
+    first = purchases.history("alice", limit=4)
+    assert len(first) == 4
+    assert purchases.history("alice", limit=4, before=first[-1]["ts"], before_id=first[-1]["id"]) == []
+
+
+def test_delete_tenant_drops_queued_rows(tmp_path):
+    purchases = ledger(tmp_path)
+    purchases.record("alice", "saved", "stars", 1)
+    purchases.flush()
+    purchases.record("alice", "queued", "stars", 1)
+    purchases.record("bob", "kept", "stars", 1)
+
+    assert purchases.delete_tenant("alice") == 2
+    purchases.flush()
+    assert purchases.count("alice") == 0
+    assert [row["gift_link"] for row in purchases.history("bob")] == ["kept"]
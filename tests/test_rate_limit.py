@@ -0,0 +1,45 @@
+import asyncio
+import threading
+import time
+
+from utils.rate_limit import TokenBucket
+
+
+def test_ceiling_never_passes_max_rate():
+    bucket = TokenBucket("test", rate=10.0, max_rate=12.0)
+    now = time.monotonic()
+    # A day of probing would push an unclamped ceiling far above the maximum
+    bucket.wait_time(now=now + 86400)
+    assert bucket.ceiling == 12.0
+    assert bucket.rate <= 12.0
+
+
+def test_flood_wait_blocks_and_cuts_the_rate():
+    bucket = TokenBucket("test", rate=10.0)
+    bucket.on_flood_wait(5)
+    assert bucket.rate < 10.0
+    assert abs(bucket.ceiling - 9.0) < 0.01
+    assert bucket.wait_time() >= 4.9
+
+
+def test_concurrent_loops_never_overdraw():
+    bucket = TokenBucket("test", rate=0.001, capacity=50.0)
+    taken = []
+
+    def spend():
+        async def run():
+            for _ in range(10):
+                await asyncio.wait_for(bucket.acquire(), timeout=0.05)
+                taken.append(1)
+        try:
+            asyncio.run(run())
+        except asyncio.TimeoutError:
+            pass
+
+    threads = [threading.Thread(target=spend) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(taken) == 50
+    assert bucket.tokens > -1e-6
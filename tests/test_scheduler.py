@@ -0,0 +1,61 @@
+from utils.scheduler import GiftScheduler
+
+
+def scheduler(gifts=3, base_interval=30.0):
+    schedule = GiftScheduler(base_interval)
+    schedule.set_catalog((gift_id, f"gift-{gift_id}") for gift_id in range(1, gifts + 1))
+    return schedule
+
+
+def test_first_sweep_pops_every_gift_once():
+    schedule = scheduler()
+    due = schedule.pop_due(now=float("inf"))
+    assert sorted(gift_id for gift_id, _ in due) == [1, 2, 3]
+    assert schedule.pop_due(now=float("inf")) == []
+
+
+def test_hot_gift_gets_a_shorter_interval():
+    schedule = scheduler()
+    schedule.pop_due(now=float("inf"))
+    for gift_id in (1, 2, 3):
+        schedule.observe(gift_id, 500, [], 100, now=0.0)
+    # Gift 1 keeps getting new listings under the limit, the others stay empty
+    for step in range(1, 6):
+        now = step * 10.0
+        schedule.observe(1, 90, [f"new-{step}-{i}" for i in range(3)], 100, now=now)
+        schedule.observe(2, 500, [], 100, now=now)
+        schedule.observe(3, 500, [], 100, now=now)
+    assert schedule.interval_for(1) < schedule.interval_for(2)
+    assert schedule.interval_for(1) >= schedule.min_interval
+    assert schedule.interval_for(2) <= schedule.max_interval
+
+
+def test_arrival_rate_is_an_ewma_of_new_links():
+    schedule = scheduler(gifts=1)
+    schedule.observe(1, 50, ["a"], 100, now=0.0)
+    schedule.observe(1, 50, ["a", "b"], 100, now=10.0)
+    # One new link in 10s, blended in at EWMA_ALPHA
+    assert schedule.scan_rates()["gift-1"]["arrival_rate"] == round(GiftScheduler.EWMA_ALPHA * 0.1, 4)
+
+
+def test_foreign_observation_leaves_an_in_flight_scan_alone():
+    schedule = scheduler(gifts=1)
+    assert schedule.pop_due(now=float("inf")) == [(1, "gift-1")]
+    schedule.observe(1, 50, ["a"], 100, now=0.0, own_scan=False)
+    # Still in flight: the foreign result must not queue a second scan
+    assert schedule.pop_due(now=float("inf")) == []
+    schedule.observe(1, 50, ["a"], 100, now=1.0)
+    assert schedule.pop_due(now=float("inf")) == [(1, "gift-1")]
+
+
+def test_ensure_scheduled_only_requeues_unobserved_scans():
+    schedule = scheduler(gifts=1)
+    schedule.pop_due(now=float("inf"))
+    schedule.observe(1, 50, [], 100, now=0.0)
+    due = schedule.time_until_next(now=0.0)
+    schedule.ensure_scheduled(1, now=0.0)
+    assert schedule.time_until_next(now=0.0) == due
+
+    schedule.pop_due(now=float("inf"))
+    schedule.ensure_scheduled(1, now=100.0)
+    assert schedule.pop_due(now=100.0 + schedule.interval_for(1)) == [(1, "gift-1")]
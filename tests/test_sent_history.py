@@ -0,0 +1,69 @@
+import json
+import threading
+import time
+
+from utils.persist import state_writer
+from utils.sent_history import SentHistory
+
+
+def history(tmp_path, retention=3600.0):
+    return SentHistory(str(tmp_path / "sent.log"), retention)
+
+
+def lines(tmp_path):
+    with open(tmp_path / "sent.log") as f:
+        return [json.loads(line)[0] for line in f]
+
+
+def test_claim_confirm_release(tmp_path):
+    sent = history(tmp_path)
+    assert sent.claim("a")
+    assert not sent.claim("a")          # held by the buy in flight
+    sent.release("a")
+    assert "a" not in sent
+    assert sent.claim("a")
+    sent.confirm("a")
+    assert "a" in sent
+    assert not sent.claim("a")
+    sent.close()
+    assert lines(tmp_path) == ["a"]
+
+
+def test_expired_entries_are_forgotten_on_reload(tmp_path):
+    old = time.time() - 7200
+    (tmp_path / "sent.log").write_text(json.dumps(["old", old]) + "\n" + '["torn", 1')
+    sent = history(tmp_path)
+    assert len(sent) == 0
+    assert sent.claim("old")
+
+
+def test_compaction_keeps_concurrent_confirms(tmp_path, monkeypatch):
+    monkeypatch.setattr(SentHistory, "MIN_COMPACT", 10)
+    old = time.time() - 7200
+    with open(tmp_path / "sent.log", "w") as f:
+        for i in range(50):
+            f.write(json.dumps([f"expired-{i}", old]) + "\n")
+    sent = history(tmp_path)
+    assert sent.stats()["live"] == 0
+
+    def buy(worker):
+        for i in range(50):
+            identifier = f"gift-{worker}-{i}"
+            assert sent.claim(identifier)
+            sent.confirm(identifier)
+            if i % 7 == 0:
+                # Interleave writes (and the pending compaction) with the other threads' confirms
+                state_writer.flush(sent.path)
+
+    threads = [threading.Thread(target=buy, args=(worker,)) for worker in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    sent.close()
+
+    written = lines(tmp_path)
+    # The expired lines were compacted away and no confirm was lost in the rewrite
+    assert sorted(written) == sorted(f"gift-{w}-{i}" for w in range(8) for i in range(50))
+    reopened = SentHistory(str(tmp_path / "sent.log"), 3600.0)
+    assert len(reopened) == 400
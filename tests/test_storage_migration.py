@@ -0,0 +1,99 @@
+import json
+from datetime import datetime
+
+import pytest
+
+import utils.storage as storage_module
+from utils.log_store import open_log_store
+from utils.purchase_ledger import PurchaseLedger
+from utils.sent_history import SentHistory
+from utils.storage import Storage, migrate_legacy_files
+
+
+def legacy_tree(data_dir):
+    """The JSON files the app kept before the database, one tenant's worth"""
+    (data_dir / "user_configs").mkdir(parents=True)
+    (data_dir / "bot_states").mkdir()
+    (data_dir / "sent_gifts").mkdir()
+    (data_dir / "users.json").write_text(json.dumps({
+        "alice": {"username": "alice", "password_hash": "pw", "expire_date": "2030-01-01"},
+        "broken": {"username": "broken"},
+    }))
+    (data_dir / "user_configs" / "alice.json").write_text(
+        json.dumps({"CONFIG_VERSION": 3, "SLEEP_BETWEEN_CYCLES": 7})
+    )
+    (data_dir / "bot_states" / "alice.json").write_text(json.dumps({
+        "running": True,
+        "recent_logs": ["one", "two"],
+        "purchased_gifts": [{"timestamp": "2024-05-01 12:00:00", "gift_link": "t.me/nft/a-1", "price": 90}],
+    }))
+    (data_dir / "proxies.json").write_text(json.dumps([{"host": "10.0.0.1", "port": 1080}]))
+    (data_dir / "subscriptions.json").write_text(json.dumps([{"username": "alice", "endpoint": "https://push"}]))
+    (data_dir / "sent_gifts" / "alice.json").write_text(json.dumps({"a-1": datetime.now().isoformat()}))
+
+
+def snapshot(storage, data_dir):
+    ledger = PurchaseLedger(str(data_dir / "purchases.db"))
+    return {
+        "users": [row["username"] for row in storage.query("SELECT username FROM users")],
+        "configs": storage.query("SELECT COUNT(*) FROM user_configs")[0][0],
+        "proxies": storage.query("SELECT COUNT(*) FROM proxies")[0][0],
+        "subscriptions": storage.query("SELECT COUNT(*) FROM subscriptions")[0][0],
+        "migrated": bool(storage.query("SELECT 1 FROM meta WHERE key = 'legacy_files_migrated'")),
+        "purchases": ledger.count("alice"),
+    }
+
+
+def test_failed_migration_rolls_back_and_reruns_cleanly(tmp_path, monkeypatch):
+    data_dir = tmp_path / "data"
+    legacy_tree(data_dir)
+    storage = Storage(str(data_dir / "app.db"))
+
+    def fail(self, legacy_file):
+        raise OSError("disk full")
+
+    # Fails after the logs and purchases were copied outside the transaction
+    monkeypatch.setattr(SentHistory, "import_legacy", fail)
+    with pytest.raises(OSError):
+        migrate_legacy_files(storage, str(data_dir))
+    state = snapshot(storage, data_dir)
+    assert state["users"] == [] and state["proxies"] == 0 and not state["migrated"]
+    monkeypatch.undo()
+
+    counts = migrate_legacy_files(storage, str(data_dir))
+    assert counts == {"users": 1, "user_configs": 1, "bot_states": 1, "proxies": 1,
+                      "subscriptions": 1, "sent_gifts": 1}
+    # Nothing copied by the failed run is copied a second time
+    assert snapshot(storage, data_dir) == {
+        "users": ["alice"], "configs": 1, "proxies": 1, "subscriptions": 1, "migrated": True, "purchases": 1,
+    }
+    assert open_log_store(str(data_dir / "bot_states" / "alice.logs")).recent() == ["one", "two"]
+
+    # The meta row makes every later start a no-op
+    assert migrate_legacy_files(storage, str(data_dir)) == {}
+    assert snapshot(storage, data_dir)["proxies"] == 1
+
+
+def test_get_storage_retries_after_a_failed_migration(tmp_path, monkeypatch):
+    import config
+
+    legacy_tree(tmp_path / "data")
+    monkeypatch.setattr(config, "BASE_DIR", str(tmp_path))
+    monkeypatch.setattr(storage_module, "_storage", None)
+    calls = []
+
+    def flaky(storage, data_dir):
+        calls.append(data_dir)
+        if len(calls) == 1:
+            raise RuntimeError("interrupted")
+        return migrate_legacy_files(storage, data_dir)
+
+    monkeypatch.setattr(storage_module, "migrate_legacy_files", flaky)
+    with pytest.raises(RuntimeError):
+        storage_module.get_storage()
+    assert storage_module._storage is None
+
+    storage = storage_module.get_storage()
+    assert storage.users.get("alice")["password_hash"] == "pw"
+    assert storage_module.get_storage() is storage
+    assert len(calls) == 2
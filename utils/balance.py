@@ -0,0 +1,108 @@
+import itertools
+from threading import Lock
+from typing import Dict, Optional
+
+CURRENCIES = ("stars", "ton")
+
+
+class Reservation:
+    __slots__ = ('id', 'currency', 'amount')
+
+    def __init__(self, reservation_id: int, currency: str, amount: float):
+        self.id = reservation_id
+        self.currency = currency
+        self.amount = amount
+
+
+class BalanceLedger:
+    """
+    Per-currency balance with reservations, so several purchases can run at
+    once without promising the same stars/TON twice.
+
+    reserve() holds funds, commit() spends them after a successful buy and
+    release() returns them after a failed one. reconcile() adopts the
+    server-side balance whenever nothing is in flight for that currency
+    and nothing was reserved or spent since ``generation()`` was read
+    before fetching it.
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._ids = itertools.count(1)
+        self._balance: Dict[str, Optional[float]] = {c: None for c in CURRENCIES}
+        self._reserved: Dict[str, float] = {c: 0 for c in CURRENCIES}
+        self._open: Dict[int, Reservation] = {}
+        self._open_count: Dict[str, int] = {c: 0 for c in CURRENCIES}   # what "in flight" means, not the float sum
+        self._generation: Dict[str, int] = {c: 0 for c in CURRENCIES}   # bumped by reserve/commit
+
+    def balance(self, currency: str) -> Optional[float]:
+        with self._lock:
+            return self._balance[currency]
+
+    def generation(self, currency: str) -> int:
+        with self._lock:
+            return self._generation[currency]
+
+    def available(self, currency: str) -> Optional[float]:
+        with self._lock:
+            balance = self._balance[currency]
+            return None if balance is None else balance - self._reserved[currency]
+
+    def reserve(self, currency: str, amount: float) -> Optional[Reservation]:
+        with self._lock:
+            balance = self._balance[currency]
+            if balance is None or balance - self._reserved[currency] < amount:
+                return None
+            reservation = Reservation(next(self._ids), currency, amount)
+            self._generation[currency] += 1
+            self._reserved[currency] += amount
+            self._open_count[currency] += 1
+            self._open[reservation.id] = reservation
+            return reservation
+
+    def _close(self, reservation: Reservation) -> None:
+        """Drop an open reservation's hold (caller holds the lock)"""
+        currency = reservation.currency
+        self._open_count[currency] -= 1
+        # Float TON amounts leave residue like 2.8e-17 behind; nothing open means nothing reserved
+        self._reserved[currency] = self._reserved[currency] - reservation.amount if self._open_count[currency] else 0
+
+    def commit(self, reservation: Reservation) -> Optional[float]:
+        """Spend a reservation; returns the new balance"""
+        with self._lock:
+            if self._open.pop(reservation.id, None) is None:
+                return self._balance[reservation.currency]
+            self._generation[reservation.currency] += 1
+            self._close(reservation)
+            self._balance[reservation.currency] -= reservation.amount
+            return self._balance[reservation.currency]
+
+    def release(self, reservation: Reservation) -> None:
+        with self._lock:
+            if self._open.pop(reservation.id, None) is not None:
+                self._close(reservation)
+
+    def reconcile(self, currency: str, actual: float, generation: Optional[int] = None,
+                  force: bool = False) -> bool:
+        """
+        Adopt the server balance; skipped while reservations are in flight,
+        or if a purchase reserved or spent funds since ``generation`` (read
+        before the balance was fetched), as ``actual`` may predate it.
+        """
+        with self._lock:
+            if not force and (self._open_count[currency] or
+                              (generation is not None and generation != self._generation[currency])):
+                return False
+            self._balance[currency] = actual
+            return True
+
+    def snapshot(self) -> Dict:
+        with self._lock:
+            return {
+                currency: {
+                    'balance': self._balance[currency],
+                    'reserved': self._reserved[currency],
+                    'open': self._open_count[currency],
+                }
+                for currency in CURRENCIES
+            }
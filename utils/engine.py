@@ -0,0 +1,263 @@
+import os
+import secrets
+import threading
+from multiprocessing.connection import Client as Connect
+from typing import Dict, List, Optional, Tuple
+
+from dotenv import load_dotenv
+
+import bot_manager
+from config import BASE_DIR
+from utils.metrics import registry
+from utils.supervisor import EngineUnavailable
+
+DEFAULT_SOCKET = os.path.join(BASE_DIR, 'data', 'engine.sock')
+
+# Commands the engine daemon answers (the public API shared by every engine)
+COMMANDS = (
+    'start', 'stop', 'is_running', 'status', 'logs', 'log_page', 'purchases', 'purchase_summary',
+    'engine_stats', 'metrics',
+    'login_send_code', 'login_verify', 'login_2fa', 'submit_job', 'job', 'cancel_job', 'reload_config',
+    'remove_scanner', 'purge_tenant',
+)
+
+
+class LocalEngine:
+    """Bots run inside this process, on the shared loop runtime"""
+
+    def start(self, username: str, is_restore: bool = False) -> Tuple[bool, str]:
+        return bot_manager.start_bot(username, is_restore)
+
+    def stop(self, username: str) -> bool:
+        return bot_manager.stop_bot(username)
+
+    def reload_config(self, username: str) -> str:
+        return bot_manager.reload_bot_config(username)
+
+    def is_running(self, username: str) -> bool:
+        return bot_manager.is_bot_running(username)
+
+    def status(self, username: str) -> Dict:
+        return bot_manager.bot_status(username)
+
+    def logs(self, username: str) -> List[str]:
+        return bot_manager.bot_logs(username)
+
+    def log_page(self, username: str, page: int, per_page: int) -> Dict:
+        return bot_manager.bot_log_page(username, page, per_page)
+
+    def purchases(self, username: str, limit: int = 50, before: Optional[float] = None,
+                  before_id: Optional[int] = None) -> Dict:
+        return bot_manager.purchase_history(username, limit, before, before_id)
+
+    def purchase_summary(self, username: str, days: int = 30) -> Dict:
+        return bot_manager.purchase_summary(username, days)
+
+    def engine_stats(self, username: str) -> Dict:
+        return bot_manager.engine_stats(username)
+
+    def restore(self) -> None:
+        bot_manager.restore_running_bots()
+
+    def shutdown(self) -> None:
+        bot_manager.shutdown_bots()
+
+    def metrics(self) -> str:
+        return registry.expose()
+
+    def login_send_code(self, username: str, phone: str, login_type: str) -> Dict:
+        return bot_manager.login_send_code(username, phone, login_type)
+
+    def login_verify(self, username: str, phone: str, code: str, login_type: str) -> Dict:
+        return bot_manager.login_verify(username, phone, code, login_type)
+
+    def login_2fa(self, username: str, phone: str, password: str, login_type: str) -> Dict:
+        return bot_manager.login_2fa(username, phone, password, login_type)
+
+    def submit_job(self, username: str, kind: str, *args) -> Dict:
+        return bot_manager.submit_job(username, kind, *args)
+
+    def job(self, username: str, job_id: str) -> Optional[Dict]:
+        return bot_manager.job_status(username, job_id)
+
+    def cancel_job(self, username: str, job_id: str) -> bool:
+        return bot_manager.cancel_job(username, job_id)
+
+    def remove_scanner(self, username: str, phone: str) -> bool:
+        return bot_manager.remove_scanner(username, phone)
+
+    def purge_tenant(self, username: str) -> int:
+        return bot_manager.purge_tenant(username)
+
+
+def control_authkey(address: str, create: bool = False) -> bytes:
+    """
+    Shared secret of the control socket: ENGINE_AUTHKEY, or a key file
+    next to the socket that the daemon writes on first start.
+    """
+    key = os.getenv("ENGINE_AUTHKEY")
+    if key:
+        return key.encode()
+    path = f"{address}.key"
+    if create and not os.path.exists(path):
+        fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600)
+        with os.fdopen(fd, "w") as f:
+            f.write(secrets.token_hex(32))
+    with open(path) as f:
+        return f.read().strip().encode()
+
+
+class RemoteEngine:
+    """
+    Client of a standalone engine daemon (``engine_daemon.py``) on a Unix
+    control socket. Web workers hold no bots, so any number of them can
+    run and restarting them leaves sniping alone.
+    """
+
+    REQUEST_TIMEOUT = 30
+    START_TIMEOUT = 180
+    _SLOW = ('start', 'reload_config', 'login_send_code', 'login_verify', 'login_2fa')
+    # Safe to send twice: the daemon may have run the first one before the connection broke
+    _READ_ONLY = ('is_running', 'status', 'logs', 'log_page', 'purchases', 'purchase_summary',
+                  'engine_stats', 'metrics', 'job')
+
+    def __init__(self, address: str):
+        self.address = address
+        self._local = threading.local()   # one connection per web thread
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = Connect(self.address, family='AF_UNIX',
+                                              authkey=control_authkey(self.address))
+        return conn
+
+    def _drop(self) -> None:
+        conn = getattr(self._local, 'conn', None)
+        self._local.conn = None
+        if conn is not None:
+            conn.close()
+
+    def _call(self, command: str, *args):
+        timeout = self.START_TIMEOUT if command in self._SLOW else self.REQUEST_TIMEOUT
+        for attempt in range(2):
+            sent = False
+            try:
+                conn = self._connection()
+                conn.send((command, args))
+                sent = True
+                if not conn.poll(timeout):
+                    # A late reply would desync this connection
+                    self._drop()
+                    raise EngineUnavailable(f"engine daemon did not answer {command}")
+                ok, result = conn.recv()
+                break
+            except (OSError, EOFError) as e:
+                # The daemon restarted since this connection was opened; retry once on a fresh
+                # one unless the command went out and may already have run
+                self._drop()
+                if attempt or (sent and command not in self._READ_ONLY):
+                    raise EngineUnavailable(f"engine daemon unreachable at {self.address}: {e}")
+        if not ok:
+            raise RuntimeError(result)
+        return result
+
+    def start(self, username: str, is_restore: bool = False) -> Tuple[bool, str]:
+        return tuple(self._call('start', username, is_restore))
+
+    def stop(self, username: str) -> bool:
+        return self._call('stop', username)
+
+    def reload_config(self, username: str) -> str:
+        return self._call('reload_config', username)
+
+    def is_running(self, username: str) -> bool:
+        return self._call('is_running', username)
+
+    def status(self, username: str) -> Dict:
+        return self._call('status', username)
+
+    def logs(self, username: str) -> List[str]:
+        return self._call('logs', username)
+
+    def log_page(self, username: str, page: int, per_page: int) -> Dict:
+        return self._call('log_page', username, page, per_page)
+
+    def purchases(self, username: str, limit: int = 50, before: Optional[float] = None,
+                  before_id: Optional[int] = None) -> Dict:
+        return self._call('purchases', username, limit, before, before_id)
+
+    def purchase_summary(self, username: str, days: int = 30) -> Dict:
+        return self._call('purchase_summary', username, days)
+
+    def engine_stats(self, username: str) -> Dict:
+        return self._call('engine_stats', username)
+
+    def restore(self) -> None:
+        # The daemon restores bots when it starts, not the web tier
+        pass
+
+    def metrics(self) -> str:
+        return self._call('metrics')
+
+    def login_send_code(self, username: str, phone: str, login_type: str) -> Dict:
+        return self._call('login_send_code', username, phone, login_type)
+
+    def login_verify(self, username: str, phone: str, code: str, login_type: str) -> Dict:
+        return self._call('login_verify', username, phone, code, login_type)
+
+    def login_2fa(self, username: str, phone: str, password: str, login_type: str) -> Dict:
+        return self._call('login_2fa', username, phone, password, login_type)
+
+    def submit_job(self, username: str, kind: str, *args) -> Dict:
+        return self._call('submit_job', username, kind, *args)
+
+    def job(self, username: str, job_id: str) -> Optional[Dict]:
+        return self._call('job', username, job_id)
+
+    def cancel_job(self, username: str, job_id: str) -> bool:
+        return self._call('cancel_job', username, job_id)
+
+    def remove_scanner(self, username: str, phone: str) -> bool:
+        return self._call('remove_scanner', username, phone)
+
+    def purge_tenant(self, username: str) -> int:
+        return self._call('purge_tenant', username)
+
+
+def create_engine(remote: Optional[bool] = None):
+    """
+    ENGINE_SOCKET points the web tier at a running engine daemon. Otherwise
+    the bots run here: in ENGINE_PROCESSES worker processes when that is
+    > 0, else on this process's loop runtime.
+    """
+    load_dotenv()
+    address = os.getenv("ENGINE_SOCKET")
+    if address and remote is not False:
+        return RemoteEngine(address)
+    processes = int(os.getenv("ENGINE_PROCESSES", 0) or 0)
+    if processes > 0:
+        from utils.supervisor import EngineSupervisor
+        return EngineSupervisor(processes)
+    return LocalEngine()
+
+
+_engine = None
+_engine_lock = threading.Lock()
+
+
+def get_engine():
+    """The process-wide engine, created on first use"""
+    global _engine
+    with _engine_lock:
+        if _engine is None:
+            _engine = create_engine()
+        return _engine
+
+
+def __getattr__(name: str):
+    # ``from utils.engine import engine`` builds the engine on first import,
+    # so the daemon can import this module without spawning one of its own
+    if name == 'engine':
+        return get_engine()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
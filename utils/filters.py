@@ -0,0 +1,83 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Pattern, Tuple
+
+
+def _compile_keywords(keywords: Iterable[str]) -> Optional[Pattern]:
+    """Compile an avoid list into one case-insensitive substring matcher"""
+    words = sorted({k.strip().lower() for k in keywords if k and k.strip()}, key=len, reverse=True)
+    if not words:
+        return None
+    return re.compile('|'.join(re.escape(w) for w in words), re.IGNORECASE)
+
+
+class GiftFilter:
+    """
+    Avoid lists compiled once per config version.
+
+    Gift titles and backdrop names come from small, fixed sets, so every
+    verdict is memoized and a listing costs a couple of dict lookups.
+    """
+
+    MAX_MEMO = 4096
+
+    def __init__(self, gifts_not_to_buy: Tuple[str, ...], backdrops_not_to_buy: Tuple[str, ...],
+                 catalog: Tuple[Tuple[int, str], ...]):
+        self._title_re = _compile_keywords(gifts_not_to_buy)
+        self._backdrop_re = _compile_keywords(backdrops_not_to_buy)
+        self._title_memo: Dict[str, bool] = {}
+        self._backdrop_memo: Dict[str, bool] = {}
+
+        # Per-gift eligibility bitmap, indexed by catalog position
+        self._catalog = catalog
+        self._index = {gift_id: i for i, (gift_id, _) in enumerate(catalog)}
+        self.eligible_mask = 0
+        for i, (_, title) in enumerate(catalog):
+            if not self.title_banned(title):
+                self.eligible_mask |= 1 << i
+
+    @property
+    def has_backdrop_rules(self) -> bool:
+        return self._backdrop_re is not None
+
+    @staticmethod
+    def _check(pattern: Optional[Pattern], memo: Dict[str, bool], text: Optional[str]) -> bool:
+        if pattern is None or not text:
+            return False
+        hit = memo.get(text)
+        if hit is None:
+            hit = pattern.search(text) is not None
+            if len(memo) < GiftFilter.MAX_MEMO:
+                memo[text] = hit
+        return hit
+
+    def title_banned(self, title: Optional[str]) -> bool:
+        return self._check(self._title_re, self._title_memo, title)
+
+    def backdrop_banned(self, name: Optional[str]) -> bool:
+        return self._check(self._backdrop_re, self._backdrop_memo, name)
+
+    def is_gift_eligible(self, gift_id: int) -> bool:
+        idx = self._index.get(int(gift_id))
+        return idx is not None and bool(self.eligible_mask >> idx & 1)
+
+    def eligible_ids(self) -> List[int]:
+        return [gift_id for gift_id, _ in self.eligible_gifts()]
+
+    def eligible_gifts(self) -> List[Tuple[int, str]]:
+        return [item for i, item in enumerate(self._catalog) if self.eligible_mask >> i & 1]
+
+
+@lru_cache(maxsize=256)
+def _cached_filter(gifts_not_to_buy, backdrops_not_to_buy, catalog) -> GiftFilter:
+    return GiftFilter(gifts_not_to_buy, backdrops_not_to_buy, catalog)
+
+
+def get_gift_filter(gifts_not_to_buy: Iterable[str], backdrops_not_to_buy: Iterable[str],
+                    catalog: Dict) -> GiftFilter:
+    """Return the compiled filter for this config version (shared between tenants)"""
+    return _cached_filter(
+        tuple(sorted(gifts_not_to_buy or ())),
+        tuple(sorted(backdrops_not_to_buy or ())),
+        tuple((int(gift_id), title) for gift_id, title in catalog.items()),
+    )
@@ -0,0 +1,18 @@
+import re
+from typing import Optional
+
+_WAIT_RE = re.compile(r'(?:FLOOD_WAIT_|wait of )(\d+)', re.IGNORECASE)
+
+
+def flood_wait_seconds(error: Exception) -> Optional[int]:
+    """Return the FLOOD_WAIT duration carried by an RPC error, if any"""
+    if error is None:
+        return None
+    text = str(error)
+    if type(error).__name__ not in ('FloodWait', 'FloodPremiumWait') and 'FLOOD_WAIT' not in text:
+        return None
+    value = getattr(error, 'value', None)
+    if isinstance(value, int):
+        return value
+    match = _WAIT_RE.search(text)
+    return int(match.group(1)) if match else 0
@@ -0,0 +1,108 @@
+import asyncio
+import secrets
+import time
+from threading import Lock
+from typing import Any, Callable, Coroutine, Dict, Optional
+
+
+class Job:
+    """One background operation a web request handed off instead of waiting on"""
+
+    def __init__(self, username: str, kind: str, timeout: float):
+        self.id = secrets.token_hex(8)
+        self.username = username
+        self.kind = kind
+        self.timeout = timeout
+        self.status = 'pending'     # pending -> running -> done | failed | timeout | cancelled
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.future = None
+        self._lock = Lock()
+
+    @property
+    def finished(self) -> bool:
+        return self.finished_at is not None
+
+    def finish(self, status: str, result: Any = None, error: Optional[str] = None) -> None:
+        # The loop and a cancelling web thread may race to finish it
+        with self._lock:
+            if self.finished:
+                return
+            self.status, self.result, self.error = status, result, error
+            self.finished_at = time.time()
+
+    def to_dict(self) -> Dict:
+        return {
+            'job_id': self.id,
+            'type': self.kind,
+            'status': self.status,
+            'result': self.result,
+            'error': self.error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+
+class JobManager:
+    """
+    Runs coroutines as jobs on the loop runtime. Callers get a job id
+    right away and poll for the outcome, so a slow Telegram round trip
+    holds no web thread. Finished jobs are kept for ``keep`` seconds.
+    """
+
+    def __init__(self, runtime, keep: float = 600):
+        self.runtime = runtime
+        self.keep = keep
+        self._jobs: Dict[str, Job] = {}
+        self._lock = Lock()
+
+    def submit(self, username: str, kind: str, factory: Callable[[], Coroutine], timeout: float) -> Job:
+        job = Job(username, kind, timeout)
+        with self._lock:
+            self._prune()
+            self._jobs[job.id] = job
+        job.future = asyncio.run_coroutine_threadsafe(self._run(job, factory), self.runtime.default_loop)
+        return job
+
+    async def _run(self, job: Job, factory: Callable[[], Coroutine]) -> None:
+        job.status = 'running'
+        try:
+            result = await asyncio.wait_for(factory(), job.timeout)
+        except asyncio.TimeoutError:
+            job.finish('timeout', error=f"Timed out after {job.timeout:g}s")
+        except asyncio.CancelledError:
+            job.finish('cancelled')
+            raise
+        except Exception as e:
+            job.finish('failed', error=str(e))
+        else:
+            job.finish('done', result)
+
+    def get(self, username: str, job_id: str) -> Optional[Job]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+        # Job ids are only visible to the tenant that submitted them
+        return job if job and job.username == username else None
+
+    def cancel(self, username: str, job_id: str) -> bool:
+        job = self.get(username, job_id)
+        if not job or job.finished:
+            return False
+        job.future.cancel()
+        job.finish('cancelled')
+        return True
+
+    def _prune(self) -> None:
+        cutoff = time.time() - self.keep
+        for job_id in [i for i, job in self._jobs.items() if job.finished and job.finished_at < cutoff]:
+            del self._jobs[job_id]
+
+    def stats(self) -> Dict:
+        with self._lock:
+            jobs = list(self._jobs.values())
+        return {
+            'active': sum(1 for job in jobs if not job.finished),
+            'kept': len(jobs),
+        }
@@ -0,0 +1,62 @@
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+
+class ListingIndex:
+    """
+    Bounded index of already-evaluated resale offers keyed by (slug, price).
+
+    A repriced listing gets a new key, so only new or repriced offers are
+    reported as fresh. Entries expire after ``ttl`` seconds so a listing is
+    re-evaluated eventually (e.g. after a balance top-up), and the oldest
+    entries are evicted once ``max_size`` is reached.
+    """
+
+    def __init__(self, max_size: int = 20000, ttl: float = 600.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries: "OrderedDict[Tuple[str, int], float]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def fingerprint(gift) -> Optional[Tuple[str, int]]:
+        slug = getattr(gift, 'name', None) or getattr(gift, 'link', None)
+        if not slug:
+            return None
+        return slug, gift.last_resale_star_count or 0
+
+    def is_new(self, gift, now: Optional[float] = None) -> bool:
+        """True the first time an offer is seen (within the TTL); records it"""
+        key = self.fingerprint(gift)
+        if key is None:
+            return True
+        now = time.monotonic() if now is None else now
+        self._expire(now)
+
+        expires = self._entries.get(key)
+        if expires is not None and expires > now:
+            self.hits += 1
+            return False
+
+        self.misses += 1
+        self._entries[key] = now + self.ttl
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return True
+
+    def _expire(self, now: float) -> None:
+        # Insertion order == expiry order, so stop at the first live entry
+        while self._entries:
+            key, expires = next(iter(self._entries.items()))
+            if expires > now:
+                break
+            self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> dict:
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,193 @@
+import bisect
+import json
+import os
+import struct
+from collections import deque
+from threading import Lock
+from typing import Iterable, List, Tuple
+
+from utils.persist import state_writer
+
+# Each segment is a pair of files named after the sequence number of its first entry:
+#   <first>.log   one JSON-encoded entry per line, append-only
+#   <first>.idx   little-endian u64 byte offset of every entry in the .log
+_OFFSET = struct.Struct("<Q")
+
+
+class LogStore:
+    """
+    A tenant's activity log: the newest ``ring_size`` entries in memory,
+    and every entry in append-only segment files with an offset index.
+
+    A page read seeks straight to its entries, so it costs the same for a
+    tenant with a year of history as for a new one. Appends never rewrite
+    old entries; they only touch memory, and the ``state_writer`` thread
+    writes them to the segment files.
+    """
+
+    def __init__(self, directory: str, ring_size: int = 500, segment_bytes: int = 1 << 20):
+        self.directory = directory
+        self.segment_bytes = segment_bytes
+        self._lock = Lock()     # ring, count and pending lines
+        self._io = Lock()       # segment files and the written count
+        self._pending: List[bytes] = []
+        self._ring: deque = deque(maxlen=ring_size)
+        os.makedirs(directory, exist_ok=True)
+        self._segments: List[int] = sorted(
+            int(name[:-4]) for name in os.listdir(directory) if name.endswith(".idx")
+        )
+        self._log = self._idx = None
+        self._count = 0
+        if self._segments:
+            first = self._segments[-1]
+            self._count = first + self._repair(first)
+            self._open(first)
+        self._written = self._count
+        self._ring.extend(self._read_range(max(0, self._count - ring_size), self._count))
+
+    # ----------------------------------------------------------- segments
+    def _paths(self, first: int) -> Tuple[str, str]:
+        base = os.path.join(self.directory, f"{first:012d}")
+        return f"{base}.log", f"{base}.idx"
+
+    def _repair(self, first: int) -> int:
+        """Drop a tail entry torn by a crash; returns the segment's entry count"""
+        log_path, idx_path = self._paths(first)
+        log_size = os.path.getsize(log_path) if os.path.exists(log_path) else 0
+        with open(idx_path, "rb") as idx:
+            data = idx.read()
+        count = len(data) // _OFFSET.size
+        end = 0
+        with open(log_path, "ab+") as log:
+            # Entries are written before their index slot; keep the indexed, complete ones
+            while count:
+                start = _OFFSET.unpack_from(data, (count - 1) * _OFFSET.size)[0]
+                if start < log_size:
+                    log.seek(start)
+                    line = log.readline()
+                    if line.endswith(b"\n"):
+                        end = start + len(line)
+                        break
+                count -= 1
+            log.truncate(end)
+        with open(idx_path, "r+b") as idx:
+            idx.truncate(count * _OFFSET.size)
+        return count
+
+    def _open(self, first: int) -> None:
+        if self._log:
+            self._log.close()
+            self._idx.close()
+        log_path, idx_path = self._paths(first)
+        self._log = open(log_path, "ab")
+        self._idx = open(idx_path, "ab")
+
+    # -------------------------------------------------------------- write
+    def append(self, entry: str) -> None:
+        line = json.dumps(entry, ensure_ascii=False).encode("utf-8") + b"\n"
+        with self._lock:
+            self._pending.append(line)
+            self._ring.append(entry)
+            self._count += 1
+        state_writer.mark(self.directory, self._drain, self._write)
+
+    def _drain(self) -> List[bytes]:
+        with self._lock:
+            lines, self._pending = self._pending, []
+            return lines
+
+    def _write(self, lines: List[bytes]) -> None:
+        """Append drained lines to the segment files (state_writer thread)"""
+        with self._io:
+            if self._log is None and self._segments:
+                self._open(self._segments[-1])
+            offsets = []
+            for line in lines:
+                if not self._segments or self._log.tell() >= self.segment_bytes:
+                    if offsets:
+                        self._log.flush()
+                        self._idx.write(b"".join(offsets))
+                        offsets = []
+                    self._segments.append(self._written)
+                    self._open(self._written)
+                offsets.append(_OFFSET.pack(self._log.tell()))
+                self._log.write(line)
+                self._written += 1
+            # Entries are written before their index slots, so a crash leaves no slot past the log
+            self._log.flush()
+            self._idx.write(b"".join(offsets))
+            self._idx.flush()
+
+    def extend(self, entries: Iterable[str]) -> None:
+        for entry in entries:
+            self.append(entry)
+
+    def flush(self) -> None:
+        state_writer.flush(self.directory)
+
+    # --------------------------------------------------------------- read
+    def __len__(self) -> int:
+        with self._lock:
+            return self._count
+
+    def recent(self) -> List[str]:
+        """The in-memory tail, oldest first"""
+        with self._lock:
+            return list(self._ring)
+
+    def page(self, page: int, per_page: int) -> Tuple[List[str], int]:
+        """Entries of ``page`` (1-based, newest first) and the total entry count"""
+        with self._lock:
+            total = self._count
+            hi = max(total - (page - 1) * per_page, 0)
+            lo = max(hi - per_page, 0)
+            ring_start = total - len(self._ring)
+            if lo >= ring_start:
+                return [self._ring[i - ring_start] for i in range(lo, hi)][::-1], total
+        # Older than the ring: make sure everything up to ``hi`` is on disk first
+        state_writer.flush(self.directory)
+        with self._io:
+            entries = self._read_range(lo, hi)
+        return entries[::-1], total
+
+    def _read_range(self, lo: int, hi: int) -> List[str]:
+        """Entries with sequence numbers in [lo, hi), oldest first (caller holds ``_io`` or owns the store)"""
+        entries: List[str] = []
+        seq = lo
+        while seq < hi:
+            position = bisect.bisect_right(self._segments, seq) - 1
+            first = self._segments[position]
+            end = self._segments[position + 1] if position + 1 < len(self._segments) else self._written
+            stop = min(hi, end)
+            log_path, idx_path = self._paths(first)
+            with open(idx_path, "rb") as idx:
+                idx.seek((seq - first) * _OFFSET.size)
+                start = _OFFSET.unpack(idx.read(_OFFSET.size))[0]
+            with open(log_path, "rb") as log:
+                log.seek(start)
+                for _ in range(stop - seq):
+                    entries.append(json.loads(log.readline()))
+            seq = stop
+        return entries
+
+    def close(self) -> None:
+        self.flush()
+        with self._io:
+            if self._log:
+                self._log.close()
+                self._idx.close()
+                self._log = self._idx = None
+
+
+_stores = {}
+_stores_lock = Lock()
+
+
+def open_log_store(directory: str, ring_size: int = 500) -> LogStore:
+    """One store per directory in the process, so appends from any BotState share a sequence"""
+    directory = os.path.abspath(directory)
+    with _stores_lock:
+        store = _stores.get(directory)
+        if store is None:
+            store = _stores[directory] = LogStore(directory, ring_size)
+        return store
@@ -0,0 +1,137 @@
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Dict, List, Optional
+
+
+class FeedSubscription:
+    """A tenant's inbox for listings scanned by any tenant"""
+
+    def __init__(self, username: str, loop: asyncio.AbstractEventLoop, limits: Dict[int, int], maxsize: int):
+        self.username = username
+        self.loop = loop
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.limits = dict(limits)
+        self.delivered = 0
+        self.dropped = 0
+
+    def _deliver(self, item) -> None:
+        # Runs on the subscriber's own loop
+        try:
+            self.queue.put_nowait(item)
+            self.delivered += 1
+        except asyncio.QueueFull:
+            self.dropped += 1
+
+
+class MarketFeed:
+    """
+    Process-wide de-duplication of resale scans.
+
+    Before scanning a gift a tenant claims it. A claim is only granted once
+    per the shortest interval any subscriber asked for, so each gift type is
+    scanned once no matter how many tenants watch it. The scanner publishes
+    the raw listings and every other subscriber runs them through its own
+    limits and filters.
+
+    The feed only reaches tenants in the same process. Engine workers
+    (ENGINE_PROCESSES > 1) run with ``shared=False``: every claim is granted,
+    nothing is fanned out and each tenant scans for itself.
+    """
+
+    def __init__(self, queue_size: int = 1000, shared: bool = True):
+        self.shared = shared
+        self._lock = Lock()
+        self._queue_size = queue_size
+        self._subscribers: Dict[str, FeedSubscription] = {}
+        self._last_scan: Dict[int, float] = {}
+        self._next_allowed: Dict[int, float] = {}
+        self.scans = 0
+        self.claims_denied = 0
+
+    def subscribe(self, username: str, limits: Dict[int, int]) -> FeedSubscription:
+        """
+        Register the calling event loop's tenant; must run inside that loop.
+        ``limits`` maps every gift id the tenant watches to its star limit.
+        """
+        sub = FeedSubscription(username, asyncio.get_running_loop(), limits, self._queue_size)
+        with self._lock:
+            self._subscribers[username] = sub
+        return sub
+
+    def unsubscribe(self, username: str) -> None:
+        with self._lock:
+            self._subscribers.pop(username, None)
+
+    def update_interest(self, username: str, limits: Dict[int, int]) -> None:
+        with self._lock:
+            sub = self._subscribers.get(username)
+            if sub:
+                sub.limits = dict(limits)
+
+    def price_ceiling(self, gift_id: int, default: int) -> int:
+        """Highest star limit any subscriber has for ``gift_id``"""
+        if not self.shared:
+            return default
+        with self._lock:
+            return max(
+                [default] + [sub.limits[gift_id] for sub in self._subscribers.values() if gift_id in sub.limits]
+            )
+
+    def claim(self, gift_id: int, username: str, interval: float, now: Optional[float] = None) -> bool:
+        """Return True if ``username`` should scan ``gift_id`` now"""
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            if not self.shared:
+                self.scans += 1
+                return True
+            last = self._last_scan.get(gift_id)
+            if last is not None:
+                # The most eager subscriber decides the shared cadence
+                allowed = min(self._next_allowed.get(gift_id, now), last + interval)
+                self._next_allowed[gift_id] = allowed
+                if now < allowed:
+                    self.claims_denied += 1
+                    return False
+            self._last_scan[gift_id] = now
+            self._next_allowed[gift_id] = now + interval
+            self.scans += 1
+            return True
+
+    def publish(self, gift_id: int, listings: List, origin: str) -> int:
+        """Fan listings out to every other tenant watching ``gift_id``"""
+        if not self.shared:
+            return 0
+        scanned_at = time.monotonic()
+        with self._lock:
+            targets = [
+                sub for name, sub in self._subscribers.items()
+                if name != origin and gift_id in sub.limits
+            ]
+        for sub in targets:
+            try:
+                sub.loop.call_soon_threadsafe(sub._deliver, (gift_id, listings, scanned_at, origin))
+            except RuntimeError:
+                # Subscriber's loop already closed; it will unsubscribe on shutdown
+                pass
+        return len(targets)
+
+    def stats(self, username: Optional[str] = None) -> Dict:
+        """Feed-wide counts, plus ``username``'s own queue (other tenants stay anonymous)"""
+        with self._lock:
+            stats = {
+                'shared': self.shared,
+                'subscribers': len(self._subscribers),
+                'scans': self.scans,
+                'claims_denied': self.claims_denied,
+                'pending': sum(sub.queue.qsize() for sub in self._subscribers.values()),
+            }
+            sub = self._subscribers.get(username)
+            if sub:
+                stats['queue'] = {'pending': sub.queue.qsize(), 'delivered': sub.delivered, 'dropped': sub.dropped}
+            return stats
+
+
+# Shared by every tenant bot in this process; MARKET_FEED=0 turns the sharing off
+market_feed = MarketFeed(shared=os.getenv("MARKET_FEED", "1") != "0")
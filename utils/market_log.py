@@ -0,0 +1,223 @@
+import asyncio
+import os
+import re
+import struct
+import time
+from threading import Lock
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Dict, Iterator, List, Optional, Tuple
+
+from pyrogram.enums import GiftAttributeType
+
+from data.gifts import GIFT_MAPPINGS
+from utils.persist import state_writer
+
+# File layout: MAGIC, then tagged records
+#   b'S' <id:u32> <len:u16> <utf-8>                     string table entry
+#   b'R' <ts:f64> <gift_id:u64> <count:u16> listing*    one resale search result
+# listing: <slug:u32> <number:u32> <stars:u32> <ton_nano:u64> <backdrop:u32> <model:u32> <symbol:u32>
+# Strings (slug bases and attribute names) are written once and referenced by id; 0 means "none".
+MAGIC = b"GSML\x01"
+_STRING = struct.Struct("<IH")
+_SCAN = struct.Struct("<dQH")
+_LISTING = struct.Struct("<IIIQIII")
+_SLUG_RE = re.compile(r"^(.*?)-(\d+)$")
+
+_ATTRIBUTES = (GiftAttributeType.BACKDROP, GiftAttributeType.MODEL, GiftAttributeType.SYMBOL)
+
+
+class MarketRecorder:
+    """
+    Append-only binary log of resale search results.
+
+    Shared by every tenant in the process; one record costs 19 bytes plus
+    32 per listing, since slugs and attribute names are interned. Records
+    are encoded into a buffer that the ``state_writer`` thread appends, so
+    scanners never wait on the disk.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = Lock()
+        self._strings: Dict[str, int] = {}
+        self._pending: List[bytes] = []
+        self.records = 0
+        exists = os.path.exists(path) and os.path.getsize(path) > 0
+        if exists:
+            # Keep appending with the ids already defined in the file, after
+            # dropping a record torn by a crash
+            end = len(MAGIC)
+            for tag, header, payload, end in _records(path):
+                if tag == b"S":
+                    self._strings[payload] = header[0]
+            with open(path, "r+b") as f:
+                f.truncate(end)
+        self._file = open(path, "ab")
+        if not exists:
+            self._file.write(MAGIC)
+            self._file.flush()
+
+    def _intern(self, text: Optional[str], out: List[bytes]) -> int:
+        if not text:
+            return 0
+        string_id = self._strings.get(text)
+        if string_id is None:
+            string_id = self._strings[text] = len(self._strings) + 1
+            data = text.encode("utf-8")[:0xFFFF]
+            out.append(b"S" + _STRING.pack(string_id, len(data)) + data)
+        return string_id
+
+    def record(self, gift_id: int, listings: List, timestamp: Optional[float] = None) -> None:
+        timestamp = time.time() if timestamp is None else timestamp
+        listings = listings[:0xFFFF]
+        with self._lock:
+            out: List[bytes] = []
+            body = [_SCAN.pack(timestamp, int(gift_id), len(listings))]
+            for gift in listings:
+                slug = getattr(gift, 'name', None) or (gift.link or "").rsplit("/", 1)[-1]
+                match = _SLUG_RE.match(slug)
+                base, number = (match.group(1), int(match.group(2))) if match else (slug, 0)
+                names = {
+                    attr.type: getattr(attr, 'name', None)
+                    for attr in getattr(gift, 'attributes', None) or [] if attr
+                }
+                body.append(_LISTING.pack(
+                    self._intern(base, out),
+                    number & 0xFFFFFFFF,
+                    gift.last_resale_star_count or 0,
+                    gift.last_resale_ton_count or 0,
+                    *(self._intern(names.get(kind), out) for kind in _ATTRIBUTES)
+                ))
+            out.append(b"R" + b"".join(body))
+            self._pending.append(b"".join(out))
+            self.records += 1
+        state_writer.mark(self.path, self._drain, self._write)
+
+    def _drain(self) -> List[bytes]:
+        with self._lock:
+            chunks, self._pending = self._pending, []
+            return chunks
+
+    def _write(self, chunks: List[bytes]) -> None:
+        self._file.writelines(chunks)
+        self._file.flush()
+
+    def close(self) -> None:
+        state_writer.flush(self.path)
+        self._file.close()
+
+
+def _records(path: str) -> Iterator[Tuple[bytes, tuple, object, int]]:
+    """Raw (tag, header, payload, end offset) tuples; a torn tail record ends the log"""
+    with open(path, "rb") as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError(f"{path} is not a market log")
+        while True:
+            tag = f.read(1)
+            if tag == b"S":
+                head = f.read(_STRING.size)
+                if len(head) < _STRING.size:
+                    return
+                string_id, size = _STRING.unpack(head)
+                data = f.read(size)
+                if len(data) < size:
+                    return
+                yield tag, (string_id,), data.decode("utf-8"), f.tell()
+            elif tag == b"R":
+                head = f.read(_SCAN.size)
+                if len(head) < _SCAN.size:
+                    return
+                timestamp, gift_id, count = _SCAN.unpack(head)
+                data = f.read(count * _LISTING.size)
+                if len(data) < count * _LISTING.size:
+                    return
+                yield tag, (timestamp, gift_id), list(_LISTING.iter_unpack(data)), f.tell()
+            else:
+                return
+
+
+def read_market_log(path: str) -> Iterator[Tuple[float, int, List]]:
+    """Yield ``(timestamp, gift_id, listings)`` with listings shaped like Pyrogram gifts"""
+    strings: Dict[int, str] = {0: None}
+    for tag, header, payload, _ in _records(path):
+        if tag == b"S":
+            strings[header[0]] = payload
+            continue
+        timestamp, gift_id = header
+        title = GIFT_MAPPINGS.get(str(gift_id), str(gift_id))
+        listings = []
+        for slug_id, number, stars, ton, *attr_ids in payload:
+            base = strings.get(slug_id) or ""
+            slug = f"{base}-{number}" if number else base
+            listings.append(SimpleNamespace(
+                id=number,
+                name=slug,
+                title=title,
+                link=f"https://t.me/nft/{slug}",
+                last_resale_star_count=stars or None,
+                last_resale_ton_count=ton or None,
+                attributes=[
+                    SimpleNamespace(type=kind, name=strings.get(attr_id))
+                    for kind, attr_id in zip(_ATTRIBUTES, attr_ids) if attr_id
+                ],
+            ))
+        yield timestamp, gift_id, listings
+
+
+def listing_departures(path: str) -> Dict[str, float]:
+    """
+    Recorded time each listing last dropped out of its gift type's results,
+    by link. Listings still present in the final scan of their gift type
+    have no entry.
+    """
+    departures: Dict[str, float] = {}
+    current: Dict[int, set] = {}
+    for timestamp, gift_id, listings in read_market_log(path):
+        links = {gift.link for gift in listings}
+        for link in current.get(gift_id, set()) - links:
+            departures[link] = timestamp
+        for link in links:
+            departures.pop(link, None)     # back on the page, so not gone yet
+        current[gift_id] = links
+    return departures
+
+
+async def replay_market_log(path: str, deliver: Callable[[int, List, float], Optional[Awaitable]],
+                            speed: float = 1.0) -> int:
+    """
+    Feed a recorded log to ``deliver(gift_id, listings, timestamp)`` keeping
+    the recorded spacing divided by ``speed`` (0 replays as fast as
+    possible). Returns the number of scans replayed.
+    """
+    started = time.monotonic()
+    first = None
+    count = 0
+    for timestamp, gift_id, listings in read_market_log(path):
+        first = timestamp if first is None else first
+        if speed > 0:
+            delay = started + (timestamp - first) / speed - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        else:
+            await asyncio.sleep(0)
+        result = deliver(gift_id, listings, timestamp)
+        if asyncio.iscoroutine(result):
+            await result
+        count += 1
+    return count
+
+
+_recorder: Optional[MarketRecorder] = None
+_recorder_lock = Lock()
+
+
+def get_market_recorder() -> Optional[MarketRecorder]:
+    """Process-wide recorder, enabled by pointing MARKET_RECORD_FILE at a log file"""
+    global _recorder
+    path = os.getenv("MARKET_RECORD_FILE")
+    if not path:
+        return None
+    with _recorder_lock:
+        if _recorder is None or _recorder.path != path:
+            _recorder = MarketRecorder(path)
+        return _recorder
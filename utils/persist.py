@@ -0,0 +1,86 @@
+import atexit
+import json
+import os
+import time
+from threading import Condition, Lock, Thread
+from typing import Any, Callable, Dict, Hashable, Optional, Tuple
+
+from utils.logger import get_logger
+
+
+def write_json_atomic(path: str, data: Any) -> None:
+    """Write to a temp file and rename over ``path`` (readers never see a torn file)"""
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, 'w') as f:
+        json.dump(data, f, separators=(',', ':'))
+    os.replace(tmp, path)
+
+
+class StateWriter:
+    """
+    Write-behind persistence for state records.
+
+    Owners call ``mark(key, snapshot, write)`` instead of writing. A
+    background thread writes each dirty key at most once per ``interval``.
+    However many marks land in that window, they become one
+    ``write(snapshot())`` of the latest snapshot. Without ``write`` the key
+    is a path and the snapshot goes to a JSON file there. Snapshots are
+    taken without the writer's lock held, and the I/O happens outside the
+    owner's lock. ``flush`` writes synchronously, and pending writes are
+    flushed at exit.
+    """
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.writes = 0
+        self.marks = 0
+        self._dirty: Dict[Hashable, Tuple[Callable[[], Any], Callable[[Any], None]]] = {}
+        self._cond = Condition()
+        self._io = Lock()   # one writer at a time (JSON writes share temp file names)
+        self._thread: Optional[Thread] = None
+        atexit.register(self.flush)
+
+    def mark(self, key: Hashable, snapshot: Callable[[], Any],
+             write: Optional[Callable[[Any], None]] = None) -> None:
+        if write is None:
+            write = lambda data: write_json_atomic(key, data)
+        with self._cond:
+            self.marks += 1
+            self._dirty[key] = (snapshot, write)
+            if self._thread is None:
+                self._thread = Thread(target=self._run, name="state-writer", daemon=True)
+                self._thread.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._dirty:
+                    self._cond.wait()
+            # Let the window fill up before writing
+            time.sleep(self.interval)
+            self.flush()
+
+    def flush(self, key: Optional[Hashable] = None) -> None:
+        # Taking _io first also waits out a write of ``key`` that is already in flight
+        with self._io:
+            with self._cond:
+                if key is None:
+                    batch, self._dirty = self._dirty, {}
+                else:
+                    pending = self._dirty.pop(key, None)
+                    batch = {key: pending} if pending else {}
+            for target, (snapshot, write) in batch.items():
+                try:
+                    write(snapshot())
+                    self.writes += 1
+                except Exception as e:
+                    get_logger("state-writer").error(f"Failed to persist {target}: {e}")
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {'pending': len(self._dirty), 'marks': self.marks, 'writes': self.writes}
+
+
+# Shared by every BotState in the process
+state_writer = StateWriter(float(os.getenv('STATE_FLUSH_INTERVAL_MS', 500)) / 1000)
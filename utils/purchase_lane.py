@@ -0,0 +1,67 @@
+import asyncio
+import itertools
+import time
+from collections import deque
+from typing import Dict, List, Optional, Tuple
+
+
+class PurchaseLane:
+    """
+    Priority queue of pending buys, served by a fixed number of dedicated
+    workers on the buyer client. The deepest discount relative to the limit
+    goes first. Scanning runs on its own clients and never waits for the
+    lane, so new cheap listings are still detected while buys pile up.
+    """
+
+    LATENCY_SAMPLES = 500
+
+    def __init__(self):
+        self._queue: asyncio.PriorityQueue = asyncio.PriorityQueue()
+        self._seq = itertools.count()
+        self._in_flight = 0
+        self._latencies: deque = deque(maxlen=self.LATENCY_SAMPLES)
+        self.submitted = 0
+        self.completed = 0
+
+    @staticmethod
+    def discount(gift, limit: int) -> float:
+        price = gift.last_resale_star_count or 0
+        return 1 - price / limit if limit else 0.0
+
+    def submit(self, gift, limit: int, detected_at: Optional[float] = None) -> None:
+        detected_at = time.monotonic() if detected_at is None else detected_at
+        self._queue.put_nowait((-self.discount(gift, limit), next(self._seq), detected_at, gift))
+        self.submitted += 1
+
+    async def get(self) -> Tuple[float, object]:
+        """Next buy as (detected_at, gift); caller must call ``done`` afterwards"""
+        _, _, detected_at, gift = await self._queue.get()
+        self._in_flight += 1
+        return detected_at, gift
+
+    def done(self, detected_at: float) -> None:
+        self._in_flight -= 1
+        self.completed += 1
+        self._latencies.append(time.monotonic() - detected_at)
+
+    @property
+    def idle(self) -> bool:
+        return not self._in_flight and self._queue.empty()
+
+    def latencies(self) -> List[float]:
+        """Recent detect-to-buy latencies in seconds"""
+        return list(self._latencies)
+
+    def stats(self) -> Dict:
+        samples = sorted(self._latencies)
+
+        def pct(p):
+            return round(samples[min(int(p * len(samples)), len(samples) - 1)] * 1000, 1) if samples else None
+
+        return {
+            'pending': self._queue.qsize(),
+            'in_flight': self._in_flight,
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'detect_to_buy_ms': {'p50': pct(0.50), 'p95': pct(0.95), 'p99': pct(0.99)},
+        }
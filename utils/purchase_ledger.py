@@ -0,0 +1,156 @@
+import atexit
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS purchases (
+    id INTEGER PRIMARY KEY,
+    tenant TEXT NOT NULL,
+    ts REAL NOT NULL,
+    recipient TEXT,
+    gift_link TEXT NOT NULL,
+    gift TEXT,
+    currency TEXT NOT NULL,
+    amount INTEGER NOT NULL         -- stars, or nanoTON for TON purchases
+);
+CREATE INDEX IF NOT EXISTS purchases_tenant_ts ON purchases (tenant, ts);
+CREATE INDEX IF NOT EXISTS purchases_tenant_gift ON purchases (tenant, gift);
+"""
+
+_COLUMNS = ('tenant', 'ts', 'recipient', 'gift_link', 'gift', 'currency', 'amount')
+_INSERT = f"INSERT INTO purchases ({', '.join(_COLUMNS)}) VALUES ({', '.join('?' * len(_COLUMNS))})"
+
+
+class PurchaseLedger:
+    """
+    Every gift purchase, in a WAL-mode SQLite database.
+
+    ``record`` only queues the row. A writer thread inserts queued rows in
+    batches, one transaction per ``batch_interval``, so the bot never waits
+    on disk. Queries flush pending rows first and run on per-thread
+    connections. WAL lets them read while the writer appends.
+    """
+
+    def __init__(self, path: str, batch_interval: float = 0.2):
+        self.path = path
+        self.batch_interval = batch_interval
+        self._pending: List[Tuple] = []
+        self._cond = threading.Condition()
+        self._write_lock = threading.Lock()
+        self._local = threading.local()
+        self._writer: Optional[threading.Thread] = None
+        self._schema_ready = False
+        atexit.register(self.flush)
+
+    # -------------------------------------------------------- connections
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._local.conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            if not self._schema_ready:
+                conn.executescript(_SCHEMA)
+                self._schema_ready = True
+        return conn
+
+    # -------------------------------------------------------------- write
+    def record(self, tenant: str, gift_link: str, currency: str, amount: int,
+               gift: Optional[str] = None, recipient=None, ts: Optional[float] = None) -> None:
+        row = (tenant, time.time() if ts is None else ts, None if recipient is None else str(recipient),
+               gift_link, gift, currency, int(amount or 0))
+        with self._cond:
+            self._pending.append(row)
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._run, name="purchase-ledger", daemon=True)
+                self._writer.start()
+            self._cond.notify()
+
+    def _run(self) -> None:
+        while True:
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+            time.sleep(self.batch_interval)
+            self.flush()
+
+    def flush(self) -> None:
+        with self._write_lock:
+            with self._cond:
+                rows, self._pending = self._pending, []
+            if not rows:
+                return
+            conn = self._connection()
+            with conn:
+                conn.executemany(_INSERT, rows)
+
+    def import_rows(self, rows: Iterable[Dict]) -> int:
+        """Bulk-load legacy purchase dicts (keys as in ``_COLUMNS``)"""
+        rows = [tuple(row.get(column) for column in _COLUMNS) for row in rows]
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                conn.executemany(_INSERT, rows)
+        return len(rows)
+
+    # --------------------------------------------------------------- read
+    def _query(self, sql: str, args: Tuple) -> List[sqlite3.Row]:
+        self.flush()
+        conn = self._connection()
+        conn.row_factory = sqlite3.Row
+        return conn.execute(sql, args).fetchall()
+
+    def count(self, tenant: str) -> int:
+        return self._query("SELECT COUNT(*) AS n FROM purchases WHERE tenant = ?", (tenant,))[0]['n']
+
+    def history(self, tenant: str, limit: int = 50, before: Optional[float] = None,
+                before_id: Optional[int] = None) -> List[Dict]:
+        """
+        Newest purchases first. Pass the last row's ``ts`` and ``id`` as
+        ``before`` and ``before_id`` for the next page; the id breaks ties
+        between purchases recorded in the same instant.
+        """
+        before = float('inf') if before is None else before
+        before_id = -1 if before_id is None else before_id
+        rows = self._query(
+            "SELECT id, ts, recipient, gift_link, gift, currency, amount FROM purchases "
+            "WHERE tenant = ? AND (ts < ? OR (ts = ? AND id < ?)) ORDER BY ts DESC, id DESC LIMIT ?",
+            (tenant, before, before, before_id, limit)
+        )
+        return [dict(row) for row in rows]
+
+    def delete_tenant(self, tenant: str) -> int:
+        """Remove every purchase of ``tenant``, including ones still queued"""
+        self.flush()
+        with self._write_lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute("DELETE FROM purchases WHERE tenant = ?", (tenant,)).rowcount
+
+    def totals(self, tenant: str, since: float = 0) -> Dict[str, Dict]:
+        """Purchase count and spend per currency"""
+        rows = self._query(
+            "SELECT currency, COUNT(*) AS purchases, SUM(amount) AS spent FROM purchases "
+            "WHERE tenant = ? AND ts >= ? GROUP BY currency",
+            (tenant, since)
+        )
+        return {row['currency']: {'purchases': row['purchases'], 'spent': row['spent']} for row in rows}
+
+    def spend_by_day(self, tenant: str, since: float = 0) -> List[Dict]:
+        rows = self._query(
+            "SELECT date(ts, 'unixepoch', 'localtime') AS day, currency, COUNT(*) AS purchases, "
+            "SUM(amount) AS spent FROM purchases WHERE tenant = ? AND ts >= ? "
+            "GROUP BY day, currency ORDER BY day",
+            (tenant, since)
+        )
+        return [dict(row) for row in rows]
+
+    def spend_by_gift(self, tenant: str, since: float = 0) -> List[Dict]:
+        rows = self._query(
+            "SELECT gift, currency, COUNT(*) AS purchases, SUM(amount) AS spent FROM purchases "
+            "WHERE tenant = ? AND ts >= ? GROUP BY gift, currency ORDER BY currency, spent DESC",
+            (tenant, since)
+        )
+        return [dict(row) for row in rows]
@@ -0,0 +1,129 @@
+import asyncio
+import os
+import time
+from threading import Lock
+from typing import Dict, Optional
+
+from utils.flood import flood_wait_seconds
+from utils.metrics import FLOOD_WAIT_SECONDS
+
+
+class TokenBucket:
+    """
+    Async token bucket for one Telegram account.
+
+    FLOOD_WAIT blocks the bucket for the requested time and cuts the refill
+    rate (harder for longer waits). The rate then recovers towards a ceiling
+    just under the rate that tripped the limit, and the ceiling itself creeps
+    up slowly (never past ``max_rate``), so the account runs close to its
+    limit without tripping it.
+
+    Buckets are shared by every tenant's loop worker using the account, so
+    the state is guarded by a thread lock; only the sleep happens outside it.
+    """
+
+    def __init__(self, name: str, rate: float = 10.0, capacity: float = 10.0,
+                 min_rate: float = 0.2, recovery: float = 0.05, probe: float = 0.01,
+                 max_rate: Optional[float] = None):
+        self.name = name
+        self.rate = rate
+        self.capacity = capacity
+        self.min_rate = min_rate
+        self.max_rate = rate * 2 if max_rate is None else max_rate
+        self.ceiling = self.max_rate
+        self.recovery = recovery    # rate units regained per second
+        self.probe = probe          # relative ceiling growth per minute
+        self.tokens = capacity
+        self.blocked_until = 0.0
+        self.flood_waits = 0
+        self.flood_wait_seconds = 0
+        self._updated = time.monotonic()
+        self._lock = Lock()
+
+    def _refill(self, now: float) -> None:
+        dt = max(now - self._updated, 0.0)
+        self._updated = now
+        if now < self.blocked_until:
+            return
+        self.tokens = min(self.capacity, self.tokens + dt * self.rate)
+        self.ceiling = min(self.max_rate, self.ceiling * (1 + self.probe * dt / 60))
+        self.rate = min(self.ceiling, self.rate + self.recovery * dt)
+
+    def _wait_time(self, tokens: float, now: float) -> float:
+        self._refill(now)
+        if now < self.blocked_until:
+            return self.blocked_until - now + tokens / self.rate
+        missing = tokens - self.tokens
+        return max(0.0, missing / self.rate)
+
+    def wait_time(self, tokens: float = 1.0, now: Optional[float] = None) -> float:
+        """Seconds until ``tokens`` can be taken"""
+        with self._lock:
+            return self._wait_time(tokens, time.monotonic() if now is None else now)
+
+    async def acquire(self, tokens: float = 1.0) -> None:
+        while True:
+            # Check and take in one step, so two loops can't both spend the last token
+            with self._lock:
+                wait = self._wait_time(tokens, time.monotonic())
+                if wait <= 0:
+                    self.tokens -= tokens
+                    return
+            await asyncio.sleep(wait)
+
+    def on_flood_wait(self, seconds: int) -> None:
+        FLOOD_WAIT_SECONDS.inc(seconds, account=self.name)
+        with self._lock:
+            now = time.monotonic()
+            self._refill(now)
+            self.flood_waits += 1
+            self.flood_wait_seconds += seconds
+            self.blocked_until = max(self.blocked_until, now + seconds)
+            self.tokens = 0.0
+            # Stay just under the rate that tripped the limit
+            self.ceiling = max(self.min_rate, self.rate * 0.9)
+            factor = min(0.8, max(0.1, 1 / (1 + seconds / 10)))
+            self.rate = max(self.min_rate, self.rate * factor)
+
+    def report_error(self, error: Exception) -> Optional[int]:
+        """Feed an RPC error back; returns the FLOOD_WAIT seconds if it was one"""
+        wait = flood_wait_seconds(error)
+        if wait is not None:
+            self.on_flood_wait(max(wait, 1))
+        return wait
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        with self._lock:
+            wait = self._wait_time(1.0, now)
+            return {
+                'tokens': round(self.tokens, 2),
+                'capacity': self.capacity,
+                'rate': round(self.rate, 3),
+                'ceiling': round(self.ceiling, 3),
+                'max_rate': self.max_rate,
+                'wait': round(wait, 3),
+                'blocked_for': round(max(0.0, self.blocked_until - now), 1),
+                'flood_waits': self.flood_waits,
+                'flood_wait_seconds': self.flood_wait_seconds,
+            }
+
+
+_limiters: Dict[str, TokenBucket] = {}
+_limiters_lock = Lock()
+
+
+def get_limiter(name: str) -> TokenBucket:
+    """Process-wide bucket per account, so learned rates survive bot restarts"""
+    key = os.path.basename(name)
+    with _limiters_lock:
+        limiter = _limiters.get(key)
+        if limiter is None:
+            limiter = _limiters[key] = TokenBucket(key)
+        return limiter
+
+
+def limiter_stats(prefix: str = "") -> Dict[str, Dict]:
+    with _limiters_lock:
+        limiters = [l for key, l in _limiters.items() if key.startswith(prefix)]
+    return {l.name: l.snapshot() for l in limiters}
@@ -0,0 +1,113 @@
+import asyncio
+import concurrent.futures
+import os
+from threading import Lock, Thread
+from typing import Callable, Coroutine, Dict, List, Optional
+
+
+class LoopWorker:
+    """One OS thread running one event loop that hosts many tenants"""
+
+    def __init__(self, index: int):
+        self.index = index
+        self.loop = asyncio.new_event_loop()
+        self.tenants: Dict[str, asyncio.Task] = {}
+        self.load = 0   # tenants assigned, including ones whose task hasn't started yet
+        self.thread = Thread(target=self._run, name=f"bot-loop-{index}", daemon=True)
+        self.thread.start()
+
+    def _run(self) -> None:
+        asyncio.set_event_loop(self.loop)
+        self.loop.run_forever()
+
+
+class LoopRuntime:
+    """
+    Fixed pool of event-loop threads shared by every tenant bot.
+
+    Each tenant's ``run()`` coroutine becomes one task on the least loaded
+    loop. Its background tasks are created from there, so they live on the
+    same loop. Cancelling the tenant cancels that task, and the bot's own
+    shutdown path tears the rest down. Threads and loops scale with
+    ``workers`` (CPU count by default), not with the number of users.
+    """
+
+    def __init__(self, workers: Optional[int] = None):
+        self.size = max(1, workers or int(os.getenv("BOT_LOOP_WORKERS", 0)) or os.cpu_count() or 1)
+        self._workers: List[LoopWorker] = []
+        self._assigned: Dict[str, LoopWorker] = {}
+        self._lock = Lock()
+
+    def _ensure_started(self) -> List[LoopWorker]:
+        with self._lock:
+            if not self._workers:
+                self._workers = [LoopWorker(i) for i in range(self.size)]
+            return self._workers
+
+    @property
+    def default_loop(self) -> asyncio.AbstractEventLoop:
+        """Loop for short one-off jobs (logins, validation)"""
+        return self._ensure_started()[0].loop
+
+    def run(self, coro: Coroutine, timeout: Optional[float] = None):
+        """Run a one-off coroutine on the runtime and block for its result"""
+        return asyncio.run_coroutine_threadsafe(coro, self.default_loop).result(timeout)
+
+    def submit(self, username: str, factory: Callable[[], Coroutine]) -> concurrent.futures.Future:
+        """
+        Start ``factory()`` as the tenant's task on the least loaded loop.
+        The coroutine is created on that loop, so everything the bot builds
+        (queues, locks, clients) binds to it.
+        """
+        workers = self._ensure_started()
+        with self._lock:
+            worker = min(workers, key=lambda w: (w.load, w.index))
+            worker.load += 1
+            self._assigned[username] = worker
+
+        async def tenant():
+            worker.tenants[username] = asyncio.current_task()
+            try:
+                return await factory()
+            finally:
+                if worker.tenants.get(username) is asyncio.current_task():
+                    del worker.tenants[username]
+                with self._lock:
+                    worker.load -= 1
+                    if self._assigned.get(username) is worker and username not in worker.tenants:
+                        del self._assigned[username]
+
+        return asyncio.run_coroutine_threadsafe(tenant(), worker.loop)
+
+    def cancel(self, username: str) -> bool:
+        """Cancel the tenant's task (its ``finally`` blocks still run)"""
+        with self._lock:
+            worker = self._assigned.get(username)
+        if not worker:
+            return False
+
+        def _cancel():
+            task = worker.tenants.get(username)
+            if task:
+                task.cancel()
+
+        worker.loop.call_soon_threadsafe(_cancel)
+        return True
+
+    def loop_for(self, username: str) -> Optional[asyncio.AbstractEventLoop]:
+        with self._lock:
+            worker = self._assigned.get(username)
+        return worker.loop if worker else None
+
+    def stats(self) -> Dict:
+        with self._lock:
+            workers = list(self._workers)
+        return {
+            'workers': self.size,
+            'started': bool(workers),
+            'tenants': {f"loop-{w.index}": w.load for w in workers},
+        }
+
+
+# Shared by every tenant bot in this process
+bot_runtime = LoopRuntime()
@@ -0,0 +1,150 @@
+import asyncio
+import bisect
+import hashlib
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.flood import flood_wait_seconds
+
+
+def _hash(key: str) -> int:
+    return int.from_bytes(hashlib.md5(key.encode()).digest()[:8], 'big')
+
+
+class ScannerAccount:
+    """One Telegram account used for resale searches"""
+
+    def __init__(self, name: str, client, concurrency: int = 10):
+        self.name = name
+        self.client = client
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.unavailable_until = 0.0
+        self.consecutive_failures = 0
+        self.scans = 0
+
+    def available(self, now: float) -> bool:
+        return now >= self.unavailable_until
+
+
+class ScannerPool:
+    """
+    Consistent-hash ring of scanner accounts over the gift catalog.
+
+    Every gift maps to one account. When that account is flood-waited or
+    unhealthy, lookups walk the ring to the next available account, so only
+    its share of the catalog moves and it returns once the account recovers.
+    """
+
+    VNODES = 64
+    MAX_FAILURES = 3
+    UNHEALTHY_COOLDOWN = 60
+
+    def __init__(self):
+        self._accounts: Dict[str, ScannerAccount] = {}
+        self._by_client: Dict[int, ScannerAccount] = {}
+        self._ring: List[Tuple[int, str]] = []
+        self._keys: List[int] = []
+
+    def add(self, name: str, client, concurrency: int = 10) -> ScannerAccount:
+        account = ScannerAccount(name, client, concurrency)
+        self._accounts[name] = account
+        self._by_client[id(client)] = account
+        self._rebuild()
+        return account
+
+    def remove(self, name: str) -> None:
+        account = self._accounts.pop(name, None)
+        if account:
+            self._by_client.pop(id(account.client), None)
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        self._ring = sorted(
+            (_hash(f"{name}#{i}"), name)
+            for name in self._accounts
+            for i in range(self.VNODES)
+        )
+        self._keys = [key for key, _ in self._ring]
+
+    @property
+    def accounts(self) -> List[ScannerAccount]:
+        return list(self._accounts.values())
+
+    def available_count(self, now: Optional[float] = None) -> int:
+        now = time.monotonic() if now is None else now
+        return sum(1 for a in self._accounts.values() if a.available(now))
+
+    def account_for(self, gift_id: int, now: Optional[float] = None) -> Optional[ScannerAccount]:
+        """Owner of ``gift_id``, skipping accounts that are currently unavailable"""
+        if not self._ring:
+            return None
+        now = time.monotonic() if now is None else now
+        start = bisect.bisect(self._keys, _hash(str(gift_id))) % len(self._ring)
+        seen = set()
+        for offset in range(len(self._ring)):
+            name = self._ring[(start + offset) % len(self._ring)][1]
+            if name in seen:
+                continue
+            account = self._accounts[name]
+            if account.available(now):
+                return account
+            seen.add(name)
+            if len(seen) == len(self._accounts):
+                break
+        # Everyone is down: use whoever recovers first
+        return min(self._accounts.values(), key=lambda a: a.unavailable_until)
+
+    # ------------------------------------------------------------ health
+    def _lookup(self, client_or_name) -> Optional[ScannerAccount]:
+        if isinstance(client_or_name, str):
+            return self._accounts.get(client_or_name)
+        return self._by_client.get(id(client_or_name))
+
+    def report_success(self, client_or_name) -> None:
+        account = self._lookup(client_or_name)
+        if account:
+            account.consecutive_failures = 0
+            account.scans += 1
+
+    def report_error(self, client_or_name, error: Exception) -> Optional[int]:
+        """Record a failed RPC; returns the FLOOD_WAIT seconds if it was one"""
+        account = self._lookup(client_or_name)
+        if not account:
+            return None
+        wait = flood_wait_seconds(error)
+        if wait is not None:
+            self.mark_unavailable(account.name, max(wait, 1))
+            return wait
+        account.consecutive_failures += 1
+        if account.consecutive_failures >= self.MAX_FAILURES:
+            self.mark_unavailable(account.name, self.UNHEALTHY_COOLDOWN)
+        return None
+
+    def mark_unavailable(self, name: str, seconds: float) -> None:
+        account = self._accounts.get(name)
+        if account:
+            account.unavailable_until = max(account.unavailable_until, time.monotonic() + seconds)
+            account.consecutive_failures = 0
+
+    def mark_healthy(self, name: str) -> None:
+        account = self._accounts.get(name)
+        if account:
+            account.unavailable_until = 0.0
+            account.consecutive_failures = 0
+
+    def stats(self, catalog=()) -> Dict[str, Dict]:
+        now = time.monotonic()
+        owned = {name: 0 for name in self._accounts}
+        for gift_id in catalog:
+            account = self.account_for(gift_id, now)
+            if account:
+                owned[account.name] += 1
+        return {
+            a.name: {
+                'available': a.available(now),
+                'retry_in': round(max(0.0, a.unavailable_until - now), 1),
+                'gifts': owned[a.name],
+                'scans': a.scans,
+            }
+            for a in self._accounts.values()
+        }
@@ -0,0 +1,282 @@
+import heapq
+import itertools
+import math
+import time
+from collections import deque
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+class GiftScanStats:
+    """Rolling market statistics for a single gift type"""
+
+    __slots__ = (
+        'gift_id', 'title', 'weight', 'interval', 'next_due', 'in_flight',
+        'last_scan', 'floor', 'arrival_rate', 'floor_velocity', 'proximity',
+        'seen_links', 'scans'
+    )
+
+    def __init__(self, gift_id: int, title: str, interval: float):
+        self.gift_id = gift_id
+        self.title = title
+        self.weight = GiftScheduler.BASE_WEIGHT + GiftScheduler.UNKNOWN_PROXIMITY * GiftScheduler.PROXIMITY_WEIGHT
+        self.interval = interval
+        self.next_due = 0.0
+        self.in_flight = False
+        self.last_scan: Optional[float] = None
+        self.floor: Optional[int] = None
+        self.arrival_rate = 0.0     # new sub-limit listings per second (EWMA)
+        self.floor_velocity = 0.0   # relative floor change per second (EWMA)
+        self.proximity = GiftScheduler.UNKNOWN_PROXIMITY
+        self.seen_links: frozenset = frozenset()
+        self.scans = 0
+
+
+class GiftScheduler:
+    """
+    Priority-queue scheduler that gives every gift its own next-scan deadline.
+
+    The total scan budget matches one full sweep every ``base_interval``
+    seconds, but it is split between gifts by "heat": how often new listings
+    under the limit appear, how fast the floor moves and how close the floor
+    is to the configured limit.
+    """
+
+    BASE_WEIGHT = 0.05
+    ARRIVAL_WEIGHT = 0.45
+    VELOCITY_WEIGHT = 0.20
+    PROXIMITY_WEIGHT = 0.35
+    UNKNOWN_PROXIMITY = 0.5
+    EWMA_ALPHA = 0.3
+
+    def __init__(self, base_interval: float, min_factor: float = 0.25, max_factor: float = 10.0):
+        self.min_factor = min_factor
+        self.max_factor = max_factor
+        self.set_base_interval(base_interval)
+        self._stats: Dict[int, GiftScanStats] = {}
+        self._heap: List[Tuple[float, int, int]] = []
+        self._seq = itertools.count()
+        self._total_weight = 0.0
+
+    def set_base_interval(self, base_interval: float) -> None:
+        """Change the sweep budget; intervals adapt as gifts are rescheduled"""
+        self.base_interval = max(float(base_interval or 1), 0.1)
+        self.min_interval = self.base_interval * self.min_factor
+        self.max_interval = self.base_interval * self.max_factor
+
+    # ----------------------------------------------------------- catalog
+    def set_catalog(self, gifts: Iterable[Tuple[int, str]]) -> None:
+        """Replace the set of scheduled gifts, keeping stats of known ones"""
+        now = time.monotonic()
+        wanted = {int(gift_id): title for gift_id, title in gifts}
+
+        for gift_id in list(self._stats):
+            if gift_id not in wanted:
+                self._total_weight -= self._stats.pop(gift_id).weight
+
+        for offset, (gift_id, title) in enumerate(wanted.items()):
+            if gift_id in self._stats:
+                continue
+            stats = GiftScanStats(gift_id, title, self.base_interval)
+            self._stats[gift_id] = stats
+            self._total_weight += stats.weight
+            # Spread the first sweep a little so the catalog isn't hit in one burst
+            self._push(stats, now + offset * self.min_interval / max(len(wanted), 1))
+
+    def __len__(self) -> int:
+        return len(self._stats)
+
+    # -------------------------------------------------------- scheduling
+    def _push(self, stats: GiftScanStats, due: float) -> None:
+        stats.next_due = due
+        stats.in_flight = False
+        heapq.heappush(self._heap, (due, next(self._seq), stats.gift_id))
+
+    def pop_due(self, now: Optional[float] = None) -> List[Tuple[int, str]]:
+        """Return every gift whose deadline has passed and mark it in flight"""
+        now = time.monotonic() if now is None else now
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            deadline, _, gift_id = heapq.heappop(self._heap)
+            stats = self._stats.get(gift_id)
+            # Drop stale heap entries (removed gifts or rescheduled deadlines)
+            if not stats or stats.in_flight or stats.next_due != deadline:
+                continue
+            stats.in_flight = True
+            due.append((gift_id, stats.title))
+        return due
+
+    def time_until_next(self, now: Optional[float] = None) -> float:
+        """Seconds until the next deadline (``max_interval`` if nothing is queued)"""
+        now = time.monotonic() if now is None else now
+        while self._heap:
+            deadline, _, gift_id = self._heap[0]
+            stats = self._stats.get(gift_id)
+            if stats and not stats.in_flight and stats.next_due == deadline:
+                return max(0.0, deadline - now)
+            heapq.heappop(self._heap)
+        return self.max_interval
+
+    def interval_for(self, gift_id: int) -> float:
+        stats = self._stats.get(gift_id)
+        return stats.interval if stats else self.base_interval
+
+    def ensure_scheduled(self, gift_id: int, now: Optional[float] = None) -> None:
+        """Re-queue a gift whose scan ended without an observation (errors, skips)"""
+        stats = self._stats.get(gift_id)
+        if stats and stats.in_flight:
+            now = time.monotonic() if now is None else now
+            self._push(stats, now + stats.interval)
+
+    def observe(self, gift_id: int, floor: Optional[int], qualifying_links: Iterable[str],
+                limit: int, now: Optional[float] = None, own_scan: bool = True) -> None:
+        """
+        Feed the result of a scan back and schedule the next one. Listings
+        from another tenant's scan (``own_scan=False``) update the stats but
+        leave a gift we are scanning right now to that scan.
+        """
+        stats = self._stats.get(gift_id)
+        if not stats:
+            return
+        now = time.monotonic() if now is None else now
+        links = frozenset(qualifying_links)
+        alpha = self.EWMA_ALPHA
+
+        if stats.last_scan is not None:
+            dt = max(now - stats.last_scan, 1e-3)
+            new_listings = len(links - stats.seen_links)
+            stats.arrival_rate += alpha * (new_listings / dt - stats.arrival_rate)
+            if floor and stats.floor:
+                move = abs(floor - stats.floor) / stats.floor / dt
+                stats.floor_velocity += alpha * (move - stats.floor_velocity)
+
+        if floor:
+            stats.floor = floor
+        if stats.floor and limit:
+            ratio = min(limit / stats.floor, 1.0)
+            stats.proximity = ratio ** 4
+        elif limit and stats.last_scan is not None:
+            stats.proximity = 0.0   # nothing listed at all
+        stats.seen_links = links
+        stats.last_scan = now
+        stats.scans += 1
+
+        self._total_weight -= stats.weight
+        stats.weight = self._weight(stats)
+        self._total_weight += stats.weight
+        stats.interval = self._interval(stats)
+        if own_scan or not stats.in_flight:
+            self._push(stats, now + stats.interval)
+
+    def _weight(self, stats: GiftScanStats) -> float:
+        # Expected arrivals / relative floor moves per base sweep, squashed to [0, 1)
+        arrivals = 1 - math.exp(-stats.arrival_rate * self.base_interval)
+        velocity = 1 - math.exp(-stats.floor_velocity * self.base_interval * 20)
+        return (
+            self.BASE_WEIGHT
+            + self.ARRIVAL_WEIGHT * arrivals
+            + self.VELOCITY_WEIGHT * velocity
+            + self.PROXIMITY_WEIGHT * stats.proximity
+        )
+
+    def _interval(self, stats: GiftScanStats) -> float:
+        # budget = len / base_interval scans per second, split by weight share
+        budget = len(self._stats) / self.base_interval
+        rate = budget * stats.weight / max(self._total_weight, 1e-9)
+        return min(max(1.0 / max(rate, 1e-9), self.min_interval), self.max_interval)
+
+    # ------------------------------------------------------------ report
+    def scan_rates(self) -> Dict[str, Dict]:
+        """Per-gift scan allocation, hottest first"""
+        rows = sorted(self._stats.values(), key=lambda s: s.interval)
+        return {
+            s.title: {
+                'gift_id': s.gift_id,
+                'scans_per_minute': round(60.0 / s.interval, 2),
+                'interval': round(s.interval, 2),
+                'heat': round(s.weight, 3),
+                'floor': s.floor,
+                'arrival_rate': round(s.arrival_rate, 4),
+                'floor_velocity': round(s.floor_velocity, 5),
+                'proximity': round(s.proximity, 3),
+                'scans': s.scans,
+            }
+            for s in rows
+        }
+
+
+class ResultDepth:
+    """
+    Per-gift page size for resale searches, learned from how many listings
+    recently sat under the limit, plus one spare to confirm the boundary.
+    """
+
+    MAX_DEPTH = 20
+    CRASH_DEPTH = 200
+    EWMA_ALPHA = 0.3
+
+    def __init__(self):
+        self._qualifying: Dict[int, float] = {}
+
+    def depth_for(self, gift_id: int) -> int:
+        expected = self._qualifying.get(gift_id, 0.0)
+        return min(max(math.ceil(expected) + 1, 1), self.MAX_DEPTH)
+
+    def record(self, gift_id: int, qualifying: int) -> None:
+        previous = self._qualifying.get(gift_id, float(qualifying))
+        self._qualifying[gift_id] = previous + self.EWMA_ALPHA * (qualifying - previous)
+
+
+class ScanThroughput:
+    """Rolling scan rate and full-catalog coverage time"""
+
+    def __init__(self, catalog_size: int, window: float = 60.0):
+        self.catalog_size = catalog_size
+        self.window = window
+        self._scans: deque = deque()
+        self._latency_total = 0.0
+        self._covered: set = set()
+        self._coverage_started = time.monotonic()
+        self.coverage_seconds: Optional[float] = None
+        self.sweeps = 0
+        self.total_scans = 0
+
+    def record_scan(self, latency: float, now: Optional[float] = None) -> None:
+        """One gift scan finished (latency includes waiting for a scanner and its token bucket)"""
+        now = time.monotonic() if now is None else now
+        self._scans.append((now, latency))
+        self._latency_total += latency
+        self.total_scans += 1
+        self._trim(now)
+
+    def record_visit(self, gift_id: int, now: Optional[float] = None) -> Optional[float]:
+        """
+        A gift was handled (scanned, or served by another tenant's scan).
+        Returns the coverage time when this visit completed a catalog sweep.
+        """
+        now = time.monotonic() if now is None else now
+        self._covered.add(gift_id)
+        if len(self._covered) < self.catalog_size:
+            return None
+        self.coverage_seconds = now - self._coverage_started
+        self.sweeps += 1
+        self._covered.clear()
+        self._coverage_started = now
+        return self.coverage_seconds
+
+    def _trim(self, now: float) -> None:
+        while self._scans and self._scans[0][0] < now - self.window:
+            _, latency = self._scans.popleft()
+            self._latency_total -= latency
+
+    def snapshot(self) -> Dict:
+        now = time.monotonic()
+        self._trim(now)
+        count = len(self._scans)
+        return {
+            'scans_per_sec': round(count / self.window, 2),
+            'avg_scan_latency': round(self._latency_total / count, 3) if count else None,
+            'coverage_seconds': round(self.coverage_seconds, 1) if self.coverage_seconds is not None else None,
+            'coverage_progress': f"{len(self._covered)}/{self.catalog_size}",
+            'sweeps': self.sweeps,
+            'total_scans': self.total_scans,
+        }
@@ -0,0 +1,205 @@
+import json
+import os
+import time
+from collections import deque
+from datetime import datetime
+from threading import Lock
+from typing import Dict, List, Optional, Set, Tuple
+
+from utils.persist import state_writer
+
+
+class SentHistory:
+    """
+    Gift identifiers a tenant already bought, with the time each was first
+    seen, kept for ``retention`` seconds. A buy in flight holds its
+    identifier with ``claim`` and writes it with ``confirm`` only once it
+    succeeded, or gives it back with ``release``.
+
+    Every new identifier is one JSON line ``[identifier, first_seen]``
+    appended to ``path``. A deque of the same pairs in arrival order is the
+    TTL index: expiry pops from its head, so it only touches what actually
+    expired. Expired lines stay in the file until dead lines outnumber live
+    ones, then the live set is rewritten and renamed over the log.
+
+    Callers only touch memory: new lines are buffered and the shared
+    ``state_writer`` thread appends them, or compacts, off the event loop.
+    """
+
+    MIN_COMPACT = 1000   # dead lines tolerated before compaction is worth it
+
+    def __init__(self, path: str, retention: float):
+        self.path = path
+        self.retention = retention
+        self._lock = Lock()
+        self._seen: Dict[str, float] = {}
+        self._claimed: Set[str] = set()     # buys in flight, not persisted
+        self._expiry: deque = deque()
+        self._lines = 0
+        self._pending: List[bytes] = []
+        self._compact_due = False
+        self._file = open(path, "ab")
+        self._load()
+
+    # --------------------------------------------------------------- load
+    def _load(self) -> None:
+        entries = []
+        try:
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        identifier, first_seen = json.loads(line)
+                    except ValueError:
+                        continue    # torn by a crash mid-append
+                    entries.append((float(first_seen), identifier))
+                    self._lines += 1
+        except FileNotFoundError:
+            pass
+        # Appends are in time order already; sorting only guards against clock steps
+        for first_seen, identifier in sorted(entries):
+            if identifier not in self._seen:
+                self._seen[identifier] = first_seen
+                self._expiry.append((first_seen, identifier))
+        self._expire(time.time())
+
+    def import_legacy(self, legacy_file: str) -> int:
+        """Fold a legacy ``{identifier: iso timestamp}`` JSON file in; the file is left as it is"""
+        try:
+            with open(legacy_file) as f:
+                legacy = json.load(f)
+        except (OSError, ValueError):
+            return 0
+        if not isinstance(legacy, dict):
+            return 0
+        rows = []
+        for identifier, stamp in legacy.items():
+            try:
+                rows.append((datetime.fromisoformat(stamp).timestamp(), identifier))
+            except (TypeError, ValueError):
+                continue
+        with self._lock:
+            rows = [(ts, i) for ts, i in sorted(rows) if i not in self._seen]
+            for first_seen, identifier in rows:
+                self._append(identifier, first_seen)
+            self._expiry = deque(sorted(self._expiry))
+            self._expire(time.time())
+        self._mark()
+        state_writer.flush(self.path)
+        return len(rows)
+
+    # -------------------------------------------------------------- write
+    def claim(self, identifier: str) -> bool:
+        """Hold ``identifier`` for a buy in flight; False if it is seen or already held"""
+        with self._lock:
+            self._expire(time.time())
+            if identifier in self._seen or identifier in self._claimed:
+                return False
+            self._claimed.add(identifier)
+            return True
+
+    def confirm(self, identifier: str) -> None:
+        """The buy went through: record ``identifier`` as seen"""
+        with self._lock:
+            self._claimed.discard(identifier)
+            if identifier in self._seen:
+                return
+            self._append(identifier, time.time())
+        self._mark()
+
+    def release(self, identifier: str) -> None:
+        """The buy failed: the next offer of ``identifier`` may be tried again"""
+        with self._lock:
+            self._claimed.discard(identifier)
+
+    def set_retention(self, retention: float) -> None:
+        with self._lock:
+            self.retention = retention
+            self._expire(time.time())
+
+    def _append(self, identifier: str, first_seen: float) -> None:
+        self._seen[identifier] = first_seen
+        self._expiry.append((first_seen, identifier))
+        self._pending.append(json.dumps([identifier, round(first_seen, 3)]).encode("utf-8") + b"\n")
+        self._lines += 1
+
+    def _mark(self) -> None:
+        state_writer.mark(self.path, self._drain, self._write)
+
+    def _expire(self, now: float) -> None:
+        """Drop entries older than the retention window (caller holds the lock)"""
+        cutoff = now - self.retention
+        while self._expiry and self._expiry[0][0] < cutoff:
+            first_seen, identifier = self._expiry.popleft()
+            if self._seen.get(identifier) == first_seen:
+                del self._seen[identifier]
+        dead = self._lines - len(self._seen)
+        if dead > max(self.MIN_COMPACT, len(self._seen)) and not self._compact_due:
+            self._compact_due = True
+            self._mark()
+
+    # ------------------------------------------------ writer thread only
+    def _drain(self) -> Tuple[List[bytes], Optional[Dict[str, float]]]:
+        """Lines to append, or the live set to rewrite the log with"""
+        with self._lock:
+            lines, self._pending = self._pending, []
+            live = dict(self._seen) if self._compact_due else None
+            self._compact_due = False
+            return lines, live
+
+    def _write(self, batch: Tuple[List[bytes], Optional[Dict[str, float]]]) -> None:
+        lines, live = batch
+        if live is None:
+            self._file.writelines(lines)
+            self._file.flush()
+            return
+        # The live set already holds every drained line
+        tmp = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            with open(tmp, "wb") as f:
+                for identifier, first_seen in sorted(live.items(), key=lambda item: item[1]):
+                    f.write(json.dumps([identifier, round(first_seen, 3)]).encode("utf-8") + b"\n")
+        except OSError:
+            # Keep the drained lines; compaction is tried again at a later expiry
+            self._file.writelines(lines)
+            self._file.flush()
+            raise
+        self._file.close()
+        os.replace(tmp, self.path)
+        self._file = open(self.path, "ab")
+        with self._lock:
+            self._lines = len(live) + len(self._pending)
+
+    # --------------------------------------------------------------- read
+    def __contains__(self, identifier: str) -> bool:
+        with self._lock:
+            self._expire(time.time())
+            return identifier in self._seen
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._expire(time.time())
+            return len(self._seen)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'live': len(self._seen), 'lines': self._lines, 'pending': len(self._pending)}
+
+    def close(self) -> None:
+        state_writer.flush(self.path)
+        self._file.close()
+
+
+_histories = {}
+_histories_lock = Lock()
+
+
+def open_sent_history(path: str, retention: float) -> SentHistory:
+    """One history per file in the process, so a restarted bot keeps appending to the same log"""
+    path = os.path.abspath(path)
+    with _histories_lock:
+        history = _histories.get(path)
+        if history is None:
+            history = _histories[path] = SentHistory(path, retention)
+        elif history.retention != retention:
+            history.set_retention(retention)    # settings changed since the last start
+        return history
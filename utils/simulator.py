@@ -0,0 +1,307 @@
+import asyncio
+import bisect
+import itertools
+import math
+import random
+import time
+from types import SimpleNamespace
+from typing import Dict, List, Optional
+
+from pyrogram.enums import GiftAttributeType
+from pyrogram.errors import BadRequest, FloodWait
+
+from data.gifts import BACKDROP_CENTER_COLORS, GIFT_MAPPINGS
+
+
+class StargiftResellNotAllowed(BadRequest):
+    """Raised by the fake buyer when the listing is already gone"""
+    ID = "STARGIFT_RESELL_NOT_ALLOWED"
+    MESSAGE = "The gift is no longer for sale"
+
+
+class MarketProfile:
+    """
+    Knobs of a simulated resale market and of the fake Telegram accounts.
+
+    Prices are log-normal around ``median_price``; listings of every gift
+    type arrive as a Poisson process and get bought by "competitors" after
+    an exponentially distributed lifetime. RPC latency is log-normal around
+    ``latency`` and every RPC can fail with an injected error.
+    """
+
+    def __init__(self, arrival_rate: float = 0.05, median_price: int = 400, price_sigma: float = 0.6,
+                 initial_listings: int = 30, listing_lifetime: float = 120.0, ton_share: float = 0.3,
+                 stars_per_ton: int = 200, backdrops: Optional[List[str]] = None,
+                 latency: float = 0.15, latency_sigma: float = 0.4, flood_wait_rate: float = 0.0,
+                 flood_wait_seconds: int = 3, timeout_rate: float = 0.0, timeout: float = 10.0,
+                 stars_balance: int = 10 ** 7, ton_balance: float = 10 ** 4, seed: Optional[int] = None):
+        self.arrival_rate = arrival_rate            # new listings per gift type per second
+        self.median_price = median_price
+        self.price_sigma = price_sigma
+        self.initial_listings = initial_listings
+        self.listing_lifetime = listing_lifetime    # mean seconds until a competitor buys it
+        self.ton_share = ton_share                  # listings that also accept TON
+        self.stars_per_ton = stars_per_ton
+        self.backdrops = backdrops or list(BACKDROP_CENTER_COLORS)
+        self.latency = latency
+        self.latency_sigma = latency_sigma
+        self.flood_wait_rate = flood_wait_rate
+        self.flood_wait_seconds = flood_wait_seconds
+        self.timeout_rate = timeout_rate
+        self.timeout = timeout
+        self.stars_balance = stars_balance
+        self.ton_balance = ton_balance
+        self.seed = seed
+
+
+class _Listing:
+    __slots__ = ('gift_id', 'gift', 'listed_at', 'expires_at')
+
+    def __init__(self, gift_id: int, gift, listed_at: float, expires_at: float):
+        self.gift_id = gift_id
+        self.gift = gift
+        self.listed_at = listed_at
+        self.expires_at = expires_at
+
+
+class FakeMarket:
+    """
+    Shared resale market behind every fake client in the process.
+
+    Listings are generated lazily per gift type from the time elapsed since
+    the last look, so untouched gift types cost nothing.
+    """
+
+    def __init__(self, profile: Optional[MarketProfile] = None, catalog: Optional[Dict] = None):
+        self.profile = profile or MarketProfile()
+        self.random = random.Random(self.profile.seed)
+        self.catalog = {int(gift_id): title for gift_id, title in (catalog or GIFT_MAPPINGS).items()}
+        self._books: Dict[int, List] = {}           # gift_id -> [(price, seq, listing)] sorted
+        self._updated: Dict[int, float] = {}
+        self._by_link: Dict[str, _Listing] = {}
+        self._seq = itertools.count(1)
+        self.listed = 0
+        self.sold_to_competitors = 0
+        self.searches = 0
+        self.purchases: List[Dict] = []
+
+    # ----------------------------------------------------------- listings
+    def _new_listing(self, gift_id: int, now: float) -> _Listing:
+        p = self.profile
+        title = self.catalog.get(gift_id, str(gift_id))
+        number = next(self._seq)
+        slug = ''.join(ch for ch in title if ch.isalnum())
+        price = max(1, int(p.median_price * self.random.lognormvariate(0, p.price_sigma)))
+        ton = None
+        if self.random.random() < p.ton_share:
+            ton = int(price / p.stars_per_ton * 1e9)
+        gift = SimpleNamespace(
+            id=number,
+            name=f"{slug}-{number}",
+            title=title,
+            link=f"https://t.me/nft/{slug}-{number}",
+            last_resale_star_count=price,
+            last_resale_ton_count=ton,
+            attributes=[
+                SimpleNamespace(type=GiftAttributeType.MODEL, name=f"Model {self.random.randint(1, 50)}"),
+                SimpleNamespace(type=GiftAttributeType.BACKDROP, name=self.random.choice(p.backdrops)),
+                SimpleNamespace(type=GiftAttributeType.SYMBOL, name=f"Symbol {self.random.randint(1, 50)}"),
+            ],
+        )
+        self.listed += 1
+        return _Listing(gift_id, gift, now, now + self.random.expovariate(1 / p.listing_lifetime))
+
+    def _add(self, gift_id: int, listing: _Listing) -> None:
+        bisect.insort(self._books[gift_id], (listing.gift.last_resale_star_count, listing.gift.id, listing))
+        self._by_link[listing.gift.link] = listing
+
+    def _advance(self, gift_id: int, now: float) -> List:
+        """Bring one order book up to ``now``"""
+        book = self._books.get(gift_id)
+        if book is None:
+            book = self._books[gift_id] = []
+            for _ in range(self.profile.initial_listings):
+                self._add(gift_id, self._new_listing(gift_id, now))
+            self._updated[gift_id] = now
+            return book
+
+        last = self._updated[gift_id]
+        if self.profile.arrival_rate > 0:
+            at = last + self.random.expovariate(self.profile.arrival_rate)
+            while at <= now:
+                self._add(gift_id, self._new_listing(gift_id, at))
+                at += self.random.expovariate(self.profile.arrival_rate)
+        self._updated[gift_id] = now
+
+        expired = [entry for entry in book if entry[2].expires_at <= now]
+        if expired:
+            for entry in expired:
+                book.remove(entry)
+                self._by_link.pop(entry[2].gift.link, None)
+            self.sold_to_competitors += len(expired)
+        return book
+
+    def restock(self, gift_id: int, listings: List, lifetimes: Optional[Dict[str, float]] = None) -> None:
+        """
+        Replace a gift type's order book with recorded listings (replay).
+        ``lifetimes`` maps a link to the seconds it stays listed; listings
+        without one stay until the next restock of their gift type.
+        """
+        now = time.monotonic()
+        gift_id = int(gift_id)
+        for _, _, listing in self._books.get(gift_id, []):
+            self._by_link.pop(listing.gift.link, None)
+        self._books[gift_id] = []
+        self._updated[gift_id] = now
+        lifetimes = lifetimes or {}
+        for gift in listings:
+            if gift.last_resale_star_count:
+                self._add(gift_id, _Listing(gift_id, gift, now, now + lifetimes.get(gift.link, math.inf)))
+
+    def search(self, gift_id: int, limit: int, offset: int = 0) -> List:
+        """Cheapest ``limit`` live listings of a gift type, skipping the first ``offset``"""
+        self.searches += 1
+        book = self._advance(int(gift_id), time.monotonic())
+        return [listing.gift for _, _, listing in book[offset:offset + limit]]
+
+    def buy(self, link: str, buyer: str) -> _Listing:
+        now = time.monotonic()
+        listing = self._by_link.get(link)
+        if listing is not None:
+            # Competitors may have got there first since the last search
+            self._advance(listing.gift_id, now)
+        listing = self._by_link.pop(link, None)
+        if listing is None:
+            raise StargiftResellNotAllowed()
+        book = self._books[listing.gift_id]
+        entry = (listing.gift.last_resale_star_count, listing.gift.id, listing)
+        idx = bisect.bisect_left(book, entry)
+        if idx < len(book) and book[idx][2] is listing:
+            del book[idx]
+        self.purchases.append({
+            'buyer': buyer,
+            'link': link,
+            'price': listing.gift.last_resale_star_count,
+            'listing_age': now - listing.listed_at,
+        })
+        return listing
+
+    def stats(self) -> Dict:
+        return {
+            'gift_types': len(self._books),
+            'live_listings': len(self._by_link),
+            'listed': self.listed,
+            'sold_to_competitors': self.sold_to_competitors,
+            'sold_to_tenants': len(self.purchases),
+            'searches': self.searches,
+        }
+
+
+class FakeClient:
+    """
+    Stand-in for the Pyrogram ``Client`` with the calls the bot makes,
+    backed by a ``FakeMarket``. Balances are per account.
+    """
+
+    _ids = itertools.count(1_000_000)
+
+    def __init__(self, name: str, market: FakeMarket, *args, **kwargs):
+        self.name = name
+        self.market = market
+        self.profile = market.profile
+        self.is_connected = False
+        self.me = None
+        self.stars_balance = self.profile.stars_balance
+        self.ton_balance = int(self.profile.ton_balance * 1e9)
+        self.calls = 0
+        self._id = next(self._ids)
+
+    async def _rpc(self) -> None:
+        """One round trip: latency plus injected errors"""
+        p = self.profile
+        rnd = self.market.random
+        self.calls += 1
+        roll = rnd.random()
+        if roll < p.timeout_rate:
+            await asyncio.sleep(p.timeout)
+            raise asyncio.TimeoutError()
+        await asyncio.sleep(p.latency * rnd.lognormvariate(0, p.latency_sigma) if p.latency else 0)
+        if roll < p.timeout_rate + p.flood_wait_rate:
+            raise FloodWait(value=p.flood_wait_seconds)
+
+    # --------------------------------------------------------- lifecycle
+    async def start(self):
+        await self.connect()
+        self.me = SimpleNamespace(id=self._id, first_name=f"Sim {self._id}", username=None)
+        return self
+
+    async def stop(self):
+        await self.disconnect()
+
+    async def connect(self):
+        await asyncio.sleep(self.profile.latency)
+        self.is_connected = True
+        return True
+
+    async def disconnect(self):
+        self.is_connected = False
+
+    # --------------------------------------------------------------- api
+    async def get_me(self):
+        await self._rpc()
+        return self.me
+
+    async def resolve_peer(self, peer_id):
+        await self._rpc()
+        return SimpleNamespace(user_id=peer_id)
+
+    async def get_users(self, user_id):
+        await self._rpc()
+        return SimpleNamespace(id=user_id)
+
+    async def get_chat(self, chat_id):
+        await self._rpc()
+        return SimpleNamespace(id=chat_id)
+
+    async def send_message(self, chat_id, text, **kwargs):
+        await self._rpc()
+        return SimpleNamespace(chat=SimpleNamespace(id=chat_id), text=text)
+
+    async def get_stars_balance(self):
+        await self._rpc()
+        return self.stars_balance
+
+    async def get_ton_balance(self):
+        await self._rpc()
+        return self.ton_balance
+
+    async def search_gifts_for_resale(self, gift_id, order=None, limit: int = 0, offset: str = "", **kwargs):
+        # Like Pyrogram: one RPC per page of up to 100, each following the server's
+        # next_offset (a plain position here)
+        remaining = limit or 100
+        position = int(offset or 0)
+        while remaining > 0:
+            await self._rpc()
+            page = self.market.search(gift_id, min(100, remaining), position)
+            for gift in page:
+                yield gift
+            if len(page) < min(100, remaining):
+                return
+            position += len(page)
+            remaining -= len(page)
+
+    async def send_resold_gift(self, link, recipient, use_ton: bool = False, cached_peer=None):
+        await self._rpc()
+        listing = self.market.buy(link, self.name)
+        if use_ton:
+            self.ton_balance -= listing.gift.last_resale_ton_count
+        else:
+            self.stars_balance -= listing.gift.last_resale_star_count
+        return True
+
+
+def client_factory(market: FakeMarket):
+    """Client constructor for ``bot_manager.set_client_factory``"""
+    def create(name, api_id=None, api_hash=None, *args, **kwargs):
+        return FakeClient(name, market)
+    return create
@@ -0,0 +1,486 @@
+import glob
+import json
+import os
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional
+
+from utils.purchase_ledger import PurchaseLedger
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+CREATE TABLE IF NOT EXISTS users (
+    username TEXT PRIMARY KEY,
+    password_hash TEXT NOT NULL,
+    expire_date TEXT NOT NULL,
+    is_admin INTEGER NOT NULL DEFAULT 0,
+    is_owner INTEGER NOT NULL DEFAULT 0,
+    settings TEXT,                  -- JSON
+    active INTEGER NOT NULL DEFAULT 1
+);
+CREATE TABLE IF NOT EXISTS user_configs (
+    username TEXT PRIMARY KEY,
+    version INTEGER NOT NULL,       -- CONFIG_VERSION, bumped on every save
+    data TEXT NOT NULL              -- JSON settings, without CONFIG_VERSION
+);
+CREATE TABLE IF NOT EXISTS bot_states (
+    username TEXT PRIMARY KEY,
+    running INTEGER NOT NULL DEFAULT 0,
+    current_balance_stars INTEGER,
+    current_balance_ton REAL,
+    bot_cycle INTEGER,
+    original_start_time REAL
+);
+CREATE INDEX IF NOT EXISTS bot_states_running ON bot_states (running);
+CREATE TABLE IF NOT EXISTS proxies (
+    id INTEGER PRIMARY KEY,
+    host TEXT NOT NULL,
+    port INTEGER NOT NULL,
+    username TEXT,
+    password TEXT,
+    in_use INTEGER NOT NULL DEFAULT 0,
+    used_by TEXT,
+    last_used TEXT
+);
+CREATE INDEX IF NOT EXISTS proxies_host_port ON proxies (host, port);
+CREATE INDEX IF NOT EXISTS proxies_used_by ON proxies (used_by);
+CREATE TABLE IF NOT EXISTS subscriptions (
+    username TEXT NOT NULL,
+    endpoint TEXT NOT NULL,
+    data TEXT NOT NULL,             -- the browser's PushSubscription JSON
+    PRIMARY KEY (username, endpoint)
+);
+"""
+
+_USER_COLUMNS = ('username', 'password_hash', 'expire_date', 'is_admin', 'is_owner', 'settings', 'active')
+_STATE_COLUMNS = ('running', 'current_balance_stars', 'current_balance_ton', 'bot_cycle', 'original_start_time')
+_PROXY_COLUMNS = ('host', 'port', 'username', 'password', 'in_use', 'used_by', 'last_used')
+
+
+class ConnectionPool:
+    """
+    Up to ``size`` SQLite connections shared by every thread in the
+    process. A connection is used by one thread at a time and goes back to
+    the pool afterwards. A forked child discards the parent's connections.
+    """
+
+    def __init__(self, path: str, size: int = 8):
+        self.path = path
+        self.size = size
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self) -> None:
+        self._pid = os.getpid()
+        self._idle: List[sqlite3.Connection] = []
+        self._slots = threading.BoundedSemaphore(self.size)
+
+    def _connect(self) -> sqlite3.Connection:
+        # Autocommit; multi-statement writes use ``transaction``
+        conn = sqlite3.connect(self.path, timeout=10, isolation_level=None, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def connection(self) -> Iterator[sqlite3.Connection]:
+        with self._lock:
+            if self._pid != os.getpid():
+                self._reset()
+            slots = self._slots
+        slots.acquire()
+        try:
+            with self._lock:
+                conn = self._idle.pop() if self._idle else None
+            if conn is None:
+                conn = self._connect()
+            try:
+                yield conn
+            finally:
+                if conn.in_transaction:
+                    conn.rollback()
+                with self._lock:
+                    if slots is self._slots:
+                        self._idle.append(conn)
+        finally:
+            slots.release()
+
+
+class Storage:
+    """
+    The app's records in one WAL-mode SQLite database: users, their
+    settings, bot state, proxies and push subscriptions, each behind a
+    small repository. Every change is a write of the rows it touches.
+    """
+
+    def __init__(self, path: str, pool_size: int = 8):
+        self.path = path
+        self.pool = ConnectionPool(path, pool_size)
+        with self.pool.connection() as conn:
+            conn.executescript(_SCHEMA)
+        self.users = UserRepository(self)
+        self.configs = ConfigRepository(self)
+        self.bot_states = BotStateRepository(self)
+        self.proxies = ProxyRepository(self)
+        self.subscriptions = SubscriptionRepository(self)
+
+    def execute(self, sql: str, args=()) -> int:
+        """Run one write; returns the number of rows changed"""
+        with self.pool.connection() as conn:
+            return conn.execute(sql, args).rowcount
+
+    def query(self, sql: str, args=()) -> List[sqlite3.Row]:
+        with self.pool.connection() as conn:
+            return conn.execute(sql, args).fetchall()
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """A write transaction; takes the write lock up front so read-modify-writes can't interleave"""
+        with self.pool.connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def delete_tenant(self, username: str) -> None:
+        """Everything stored for ``username`` except the account itself and its purchases"""
+        with self.transaction() as conn:
+            for table in ('user_configs', 'bot_states', 'subscriptions'):
+                conn.execute(f"DELETE FROM {table} WHERE username = ?", (username,))
+            conn.execute("UPDATE proxies SET in_use = 0, used_by = NULL WHERE used_by = ?", (username,))
+        # Purchases live in their own database, purged by the engine (``purge_tenant``)
+
+
+class UserRepository:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        for flag in ('is_admin', 'is_owner', 'active'):
+            record[flag] = bool(record[flag])
+        record['settings'] = json.loads(record['settings']) if record['settings'] else None
+        return record
+
+    def get(self, username: str) -> Optional[Dict]:
+        rows = self.storage.query("SELECT * FROM users WHERE username = ?", (username,))
+        return self._record(rows[0]) if rows else None
+
+    def all(self) -> List[Dict]:
+        return [self._record(row) for row in self.storage.query("SELECT * FROM users ORDER BY username")]
+
+    def add(self, record: Dict) -> bool:
+        """Insert a new account; False if the username is taken"""
+        record = {**record, 'settings': json.dumps(record['settings']) if record.get('settings') else None}
+        return self.storage.execute(
+            f"INSERT OR IGNORE INTO users ({', '.join(_USER_COLUMNS)}) VALUES ({', '.join('?' * len(_USER_COLUMNS))})",
+            tuple(record.get(column) for column in _USER_COLUMNS)
+        ) == 1
+
+    def update(self, username: str, **fields) -> bool:
+        if 'settings' in fields and fields['settings'] is not None:
+            fields['settings'] = json.dumps(fields['settings'])
+        assignments = ', '.join(f"{column} = ?" for column in fields)
+        return self.storage.execute(
+            f"UPDATE users SET {assignments} WHERE username = ?", (*fields.values(), username)
+        ) == 1
+
+    def delete(self, username: str) -> bool:
+        return self.storage.execute("DELETE FROM users WHERE username = ?", (username,)) == 1
+
+
+class ConfigRepository:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    def get(self, username: str) -> Optional[Dict]:
+        """The saved settings with their CONFIG_VERSION, or None if never saved"""
+        rows = self.storage.query("SELECT version, data FROM user_configs WHERE username = ?", (username,))
+        if not rows:
+            return None
+        return {**json.loads(rows[0]['data']), 'CONFIG_VERSION': rows[0]['version']}
+
+    def merge(self, username: str, changes: Dict, defaults: Dict) -> int:
+        """Apply ``changes`` over the saved settings (or ``defaults``) and bump the version"""
+        with self.storage.transaction() as conn:
+            row = conn.execute("SELECT version, data FROM user_configs WHERE username = ?", (username,)).fetchone()
+            current = json.loads(row['data']) if row else dict(defaults)
+            version = (row['version'] if row else 0) + 1
+            updated = {**current, **changes}
+            updated.pop('CONFIG_VERSION', None)
+            conn.execute(
+                "INSERT INTO user_configs (username, version, data) VALUES (?, ?, ?) "
+                "ON CONFLICT (username) DO UPDATE SET version = excluded.version, data = excluded.data",
+                (username, version, json.dumps(updated))
+            )
+        return version
+
+    def delete(self, username: str) -> bool:
+        return self.storage.execute("DELETE FROM user_configs WHERE username = ?", (username,)) == 1
+
+
+class BotStateRepository:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    def get(self, username: str) -> Optional[Dict]:
+        rows = self.storage.query(
+            f"SELECT {', '.join(_STATE_COLUMNS)} FROM bot_states WHERE username = ?", (username,)
+        )
+        if not rows:
+            return None
+        return {**dict(rows[0]), 'running': bool(rows[0]['running'])}
+
+    def save(self, username: str, state: Dict) -> None:
+        self.storage.execute(
+            f"INSERT OR REPLACE INTO bot_states (username, {', '.join(_STATE_COLUMNS)}) "
+            f"VALUES (?{', ?' * len(_STATE_COLUMNS)})",
+            (username, *(state.get(column) for column in _STATE_COLUMNS))
+        )
+
+    def running(self) -> List[str]:
+        """Users whose bot was running when the state was last saved"""
+        return [row['username'] for row in self.storage.query("SELECT username FROM bot_states WHERE running = 1")]
+
+
+class ProxyRepository:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    @staticmethod
+    def _record(row: sqlite3.Row) -> Dict:
+        record = dict(row)
+        del record['id']
+        record['in_use'] = bool(record['in_use'])
+        return record
+
+    def all(self) -> List[Dict]:
+        return [self._record(row) for row in self.storage.query("SELECT * FROM proxies ORDER BY id")]
+
+    def counts(self) -> Dict:
+        row = self.storage.query("SELECT COUNT(*) AS total, COALESCE(SUM(in_use), 0) AS in_use FROM proxies")[0]
+        return {'total': row['total'], 'available': row['total'] - row['in_use'], 'in_use': row['in_use']}
+
+    def add(self, host: str, port: int, username: Optional[str] = None, password: Optional[str] = None) -> None:
+        self.storage.execute(
+            "INSERT INTO proxies (host, port, username, password) VALUES (?, ?, ?, ?)",
+            (host, port, username, password)
+        )
+
+    def remove(self, host: str, port: int) -> int:
+        return self.storage.execute("DELETE FROM proxies WHERE host = ? AND port = ?", (host, port))
+
+    def claim(self, username: str, now: str) -> Optional[Dict]:
+        """The proxy ``username`` already holds, else the first free one, marked as theirs"""
+        with self.storage.transaction() as conn:
+            row = conn.execute(
+                "SELECT * FROM proxies WHERE used_by = ? AND in_use = 1 ORDER BY id LIMIT 1", (username,)
+            ).fetchone() or conn.execute(
+                "SELECT * FROM proxies WHERE in_use = 0 ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE proxies SET in_use = 1, used_by = ?, last_used = ? WHERE id = ?", (username, now, row['id'])
+            )
+        return self._record(row)
+
+    def release(self, host: str, port: int, now: str) -> bool:
+        return self.storage.execute(
+            "UPDATE proxies SET in_use = 0, used_by = NULL, last_used = ? "
+            "WHERE id = (SELECT id FROM proxies WHERE host = ? AND port = ? ORDER BY id LIMIT 1)",
+            (now, host, port)
+        ) == 1
+
+    def release_user(self, username: str, now: str) -> bool:
+        return self.storage.execute(
+            "UPDATE proxies SET in_use = 0, used_by = NULL, last_used = ? WHERE used_by = ?", (now, username)
+        ) > 0
+
+
+class SubscriptionRepository:
+    def __init__(self, storage: Storage):
+        self.storage = storage
+
+    def for_user(self, username: str) -> List[Dict]:
+        rows = self.storage.query("SELECT data FROM subscriptions WHERE username = ?", (username,))
+        return [json.loads(row['data']) for row in rows]
+
+    def all(self) -> List[Dict]:
+        return [json.loads(row['data']) for row in self.storage.query("SELECT data FROM subscriptions")]
+
+    def add(self, username: str, subscription: Dict) -> bool:
+        """False if this browser is already subscribed for ``username``"""
+        return self.storage.execute(
+            "INSERT OR IGNORE INTO subscriptions (username, endpoint, data) VALUES (?, ?, ?)",
+            (username, subscription['endpoint'], json.dumps({**subscription, 'username': username}))
+        ) == 1
+
+    def remove(self, username: str, endpoint: str) -> bool:
+        return self.storage.execute(
+            "DELETE FROM subscriptions WHERE username = ? AND endpoint = ?", (username, endpoint)
+        ) == 1
+
+
+def _read_json(path: str, default):
+    try:
+        with open(path) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return default
+    return data if isinstance(data, type(default)) else default
+
+
+def _rows(records, build) -> List:
+    """``build(record)`` for every legacy record, skipping malformed ones"""
+    rows = []
+    for record in records:
+        try:
+            rows.append(build(record))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            continue
+    return rows
+
+
+def migrate_legacy_files(storage: Storage, data_dir: str) -> Dict[str, int]:
+    """
+    Import the JSON files that used to hold this data, once per database.
+    A ``meta`` row records that the import ran. The files are left in place
+    as a backup and ignored from then on; sent-gift histories are copied
+    into their append-only logs. Malformed records are skipped, and the
+    counts stored in the ``meta`` row are the records imported.
+    """
+    # These end up importing config, which imports this module
+    from utils.log_store import open_log_store
+    from utils.sent_history import open_sent_history
+    from config import HISTORY_RETENTION_DAYS
+
+    counts = {}
+    # The write lock makes concurrent engine processes wait, then see the meta row
+    with storage.transaction() as conn:
+        if conn.execute("SELECT 1 FROM meta WHERE key = 'legacy_files_migrated'").fetchone():
+            return counts
+
+        users = _rows(_read_json(os.path.join(data_dir, 'users.json'), {}).values(), _legacy_user)
+        conn.executemany(
+            f"INSERT OR IGNORE INTO users ({', '.join(_USER_COLUMNS)}) VALUES ({', '.join('?' * len(_USER_COLUMNS))})",
+            users
+        )
+        counts['users'] = len(users)
+
+        counts['user_configs'] = 0
+        for path in glob.glob(os.path.join(data_dir, 'user_configs', '*.json')):
+            settings = _read_json(path, {})
+            if not settings:
+                continue
+            version = settings.pop('CONFIG_VERSION', 0)
+            conn.execute(
+                "INSERT OR IGNORE INTO user_configs (username, version, data) VALUES (?, ?, ?)",
+                (os.path.basename(path)[:-5], version if isinstance(version, int) else 0, json.dumps(settings))
+            )
+            counts['user_configs'] += 1
+
+        ledger = None
+        counts['bot_states'] = 0
+        for path in glob.glob(os.path.join(data_dir, 'bot_states', '*.json')):
+            username = os.path.basename(path)[:-5]
+            state = _read_json(path, {})
+            if not state:
+                continue
+            conn.execute(
+                f"INSERT OR IGNORE INTO bot_states (username, {', '.join(_STATE_COLUMNS)}) "
+                f"VALUES (?{', ?' * len(_STATE_COLUMNS)})",
+                (username, bool(state.get('running')), *(state.get(column) for column in _STATE_COLUMNS[1:]))
+            )
+            counts['bot_states'] += 1
+            # The oldest state files kept every log line and purchase inline
+            logs = open_log_store(path[:-5] + '.logs')
+            if isinstance(state.get('recent_logs'), list) and not len(logs):
+                logs.extend(str(entry) for entry in state['recent_logs'])
+                logs.flush()
+            if isinstance(state.get('purchased_gifts'), list):
+                ledger = ledger or PurchaseLedger(os.path.join(data_dir, 'purchases.db'))
+                if not ledger.count(username):
+                    ledger.import_rows(_rows(state['purchased_gifts'], lambda gift: _legacy_purchase(username, gift)))
+
+        proxies = _rows(_read_json(os.path.join(data_dir, 'proxies.json'), []), _legacy_proxy)
+        conn.executemany(
+            f"INSERT INTO proxies ({', '.join(_PROXY_COLUMNS)}) VALUES ({', '.join('?' * len(_PROXY_COLUMNS))})",
+            proxies
+        )
+        counts['proxies'] = len(proxies)
+
+        subscriptions = _rows(_read_json(os.path.join(data_dir, 'subscriptions.json'), []), _legacy_subscription)
+        conn.executemany(
+            "INSERT OR IGNORE INTO subscriptions (username, endpoint, data) VALUES (?, ?, ?)",
+            subscriptions
+        )
+        counts['subscriptions'] = len(subscriptions)
+
+        counts['sent_gifts'] = 0
+        for path in glob.glob(os.path.join(data_dir, 'sent_gifts', '*.json')):
+            history = open_sent_history(path[:-5] + '.log', HISTORY_RETENTION_DAYS * 86400)
+            counts['sent_gifts'] += history.import_legacy(path)
+
+        conn.execute("INSERT INTO meta (key, value) VALUES ('legacy_files_migrated', ?)", (json.dumps(counts),))
+    return counts
+
+
+def _legacy_user(user: Dict) -> tuple:
+    if not all(isinstance(user[key], str) and user[key] for key in ('username', 'password_hash', 'expire_date')):
+        raise ValueError("incomplete user record")
+    return (user['username'], user['password_hash'], user['expire_date'], bool(user.get('is_admin')),
+            bool(user.get('is_owner')), json.dumps(user['settings']) if user.get('settings') else None,
+            bool(user.get('active', True)))
+
+
+def _legacy_proxy(proxy: Dict) -> tuple:
+    if not (isinstance(proxy['host'], str) and proxy['host']):
+        raise ValueError("proxy without a host")
+    return (proxy['host'], int(proxy['port']), proxy.get('username'), proxy.get('password'),
+            bool(proxy.get('in_use')), proxy.get('used_by'), proxy.get('last_used'))
+
+
+def _legacy_subscription(sub: Dict) -> tuple:
+    if not all(isinstance(sub[key], str) and sub[key] for key in ('username', 'endpoint')):
+        raise ValueError("incomplete subscription")
+    return sub['username'], sub['endpoint'], json.dumps(sub)
+
+
+def _legacy_purchase(username: str, gift: Dict) -> Dict:
+    return {
+        'tenant': username,
+        'ts': datetime.strptime(gift['timestamp'], '%Y-%m-%d %H:%M:%S').timestamp(),
+        'recipient': str(gift.get('user_id')),
+        'gift_link': str(gift['gift_link']),
+        'currency': 'stars' if gift.get('price') else 'ton',
+        'amount': int(gift.get('price') or 0),
+    }
+
+
+_storage = None
+_storage_lock = threading.Lock()
+
+
+def get_storage() -> Storage:
+    """The process-wide database (data/app.db), created and migrated on first use"""
+    global _storage
+    with _storage_lock:
+        if _storage is None:
+            from config import BASE_DIR
+            data_dir = os.path.join(BASE_DIR, 'data')
+            storage = Storage(os.path.join(data_dir, 'app.db'))
+            migrate_legacy_files(storage, data_dir)
+            # Published only once migrated, so a failed migration is retried by the next caller
+            _storage = storage
+        return _storage
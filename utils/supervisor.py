@@ -0,0 +1,367 @@
+import hashlib
+import itertools
+import multiprocessing
+import os
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from threading import Lock, Thread
+from typing import Dict, List, Optional, Tuple
+
+from utils.metrics import merge_expositions
+
+
+class EngineUnavailable(RuntimeError):
+    """The engine worker owning a tenant died or did not answer in time"""
+
+
+def _score(username: str, index: int) -> int:
+    return int.from_bytes(hashlib.md5(f"{username}#{index}".encode()).digest()[:8], 'big')
+
+
+def _worker_main(index: int, conn, processes: int = 1) -> None:
+    """Engine worker process: owns its tenants' bots and answers control commands"""
+    # Processes already spread tenants over cores; one loop each is enough
+    os.environ.setdefault("BOT_LOOP_WORKERS", "1")
+    if processes > 1:
+        # The market feed can't reach tenants on other workers; a feed covering only some
+        # of them would make scan dedup depend on placement, so every tenant scans itself
+        os.environ["MARKET_FEED"] = "0"
+    import bot_manager
+    from utils.metrics import registry
+
+    handlers = {
+        'start': bot_manager.start_bot,
+        'stop': bot_manager.stop_bot,
+        'reload_config': bot_manager.reload_bot_config,
+        'restore_many': bot_manager.restore_many,
+        'running': bot_manager.is_bot_running,
+        'status': bot_manager.bot_status,
+        'logs': bot_manager.bot_logs,
+        'log_page': bot_manager.bot_log_page,
+        'purchases': bot_manager.purchase_history,
+        'purchase_summary': bot_manager.purchase_summary,
+        'engine_stats': bot_manager.engine_stats,
+        'metrics': registry.expose,
+        'login_send_code': bot_manager.login_send_code,
+        'login_verify': bot_manager.login_verify,
+        'login_2fa': bot_manager.login_2fa,
+        'submit_job': bot_manager.submit_job,
+        'job': bot_manager.job_status,
+        'cancel_job': bot_manager.cancel_job,
+        'remove_scanner': bot_manager.remove_scanner,
+        'purge_tenant': bot_manager.purge_tenant,
+        'shutdown': bot_manager.shutdown_bots,
+        'ping': os.getpid,
+    }
+    send_lock = Lock()
+    # Commands like start block for seconds (session validation); run them side by side
+    pool = ThreadPoolExecutor(max_workers=8, thread_name_prefix=f"engine-{index}")
+
+    def handle(req_id, command, args):
+        try:
+            reply = (req_id, True, handlers[command](*args))
+        except Exception as e:
+            reply = (req_id, False, f"{type(e).__name__}: {e}")
+        with send_lock:
+            conn.send(reply)
+
+    while True:
+        try:
+            req_id, command, args = conn.recv()
+        except (EOFError, OSError):
+            break   # supervisor went away; its replacement restores our tenants
+        pool.submit(handle, req_id, command, args)
+
+
+class _Worker:
+    def __init__(self, index: int, process, conn):
+        self.index = index
+        self.process = process
+        self.conn = conn
+        self.pending: Dict[int, Future] = {}
+        self.lock = Lock()
+        self.started_at = time.time()
+
+    @property
+    def alive(self) -> bool:
+        return self.process.is_alive()
+
+    def fail_pending(self) -> None:
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        for future in pending.values():
+            if not future.done():
+                future.set_exception(EngineUnavailable(f"engine worker {self.index} died"))
+
+
+class EngineSupervisor:
+    """
+    Runs the bots in ``processes`` engine worker processes, so tenants stop
+    sharing one GIL.
+
+    Tenants go to workers by rendezvous hashing, so a worker's death only
+    moves its own tenants. A monitor respawns dead workers and restores
+    their tenants on the surviving ones. The web tier talks to the workers
+    over pipes through the same start/stop/status API as ``LocalEngine``.
+    With more than one worker the market feed is off, so tenants don't
+    share scans.
+    """
+
+    REQUEST_TIMEOUT = 30
+    START_TIMEOUT = 180
+    MONITOR_INTERVAL = 1.0
+
+    def __init__(self, processes: int):
+        self._ctx = multiprocessing.get_context("spawn")
+        self._ids = itertools.count(1)
+        self._lock = Lock()
+        self._placement: Dict[str, int] = {}    # tenants started through us -> worker index
+        self.processes = processes
+        self.respawns = 0
+        self.migrations = 0
+        self._workers: List[_Worker] = [self._spawn(i) for i in range(processes)]
+        Thread(target=self._monitor, name="engine-monitor", daemon=True).start()
+
+    # ----------------------------------------------------------- workers
+    def _spawn(self, index: int) -> _Worker:
+        parent, child = self._ctx.Pipe()
+        process = self._ctx.Process(target=_worker_main, args=(index, child, self.processes),
+                                    name=f"engine-{index}", daemon=True)
+        process.start()
+        child.close()
+        worker = _Worker(index, process, parent)
+        Thread(target=self._read_replies, args=(worker,), name=f"engine-{index}-replies", daemon=True).start()
+        return worker
+
+    def _read_replies(self, worker: _Worker) -> None:
+        while True:
+            try:
+                req_id, ok, result = worker.conn.recv()
+            except (EOFError, OSError):
+                worker.fail_pending()
+                return
+            with worker.lock:
+                future = worker.pending.pop(req_id, None)
+            if future and not future.done():
+                if ok:
+                    future.set_result(result)
+                else:
+                    future.set_exception(RuntimeError(result))
+
+    def _monitor(self) -> None:
+        while True:
+            time.sleep(self.MONITOR_INTERVAL)
+            for worker in list(self._workers):
+                if not worker.alive:
+                    self._replace(worker)
+
+    def _replace(self, dead: _Worker) -> None:
+        dead.fail_pending()
+        with self._lock:
+            orphans = [u for u, index in self._placement.items() if index == dead.index]
+            for username in orphans:
+                del self._placement[username]
+            self._workers[dead.index] = self._spawn(dead.index)
+            self.respawns += 1
+        if orphans:
+            Thread(target=self._migrate, args=(orphans, dead.index), name="engine-migrate", daemon=True).start()
+
+    def _migrate(self, usernames: List[str], dead_index: int) -> None:
+        from bot_manager import usernames_to_restore
+
+        # Placement is recorded when a start job is submitted; only bots that got running move
+        running = set(usernames_to_restore())
+        # Move orphans to the survivors (a tenant that crashes its worker won't take the fresh one down)
+        batches: Dict[int, List[str]] = {}
+        for username in usernames:
+            if username not in running:
+                continue
+            batches.setdefault(self._owner(username, exclude=dead_index).index, []).append(username)
+        for index, batch in batches.items():
+            try:
+                results = self._call(self._workers[index], 'restore_many', batch,
+                                     timeout=self.START_TIMEOUT + len(batch) * 5)
+            except Exception:
+                continue
+            with self._lock:
+                for username, restored in results.items():
+                    if restored:
+                        self._placement[username] = index
+                        self.migrations += 1
+
+    def _owner(self, username: str, exclude: Optional[int] = None) -> _Worker:
+        with self._lock:
+            placed = self._placement.get(username)
+            if placed is not None and placed != exclude:
+                return self._workers[placed]
+            candidates = [w for w in self._workers if w.index != exclude and w.alive] or self._workers
+            return max(candidates, key=lambda w: _score(username, w.index))
+
+    def _call(self, worker: _Worker, command: str, *args, timeout: Optional[float] = None):
+        future: Future = Future()
+        req_id = next(self._ids)
+        with worker.lock:
+            worker.pending[req_id] = future
+            try:
+                worker.conn.send((req_id, command, args))
+            except (OSError, ValueError) as e:
+                worker.pending.pop(req_id, None)
+                raise EngineUnavailable(f"engine worker {worker.index} unreachable: {e}")
+        try:
+            return future.result(timeout or self.REQUEST_TIMEOUT)
+        except FutureTimeout:
+            with worker.lock:
+                worker.pending.pop(req_id, None)
+            raise EngineUnavailable(f"engine worker {worker.index} did not answer {command}")
+
+    # ----------------------------------------------------------- control
+    def start(self, username: str, is_restore: bool = False) -> Tuple[bool, str]:
+        worker = self._owner(username)
+        started, message = self._call(worker, 'start', username, is_restore, timeout=self.START_TIMEOUT)
+        if started:
+            with self._lock:
+                self._placement[username] = worker.index
+        return started, message
+
+    def stop(self, username: str) -> bool:
+        worker = self._owner(username)
+        stopped = self._call(worker, 'stop', username)
+        with self._lock:
+            self._placement.pop(username, None)
+        return stopped
+
+    def reload_config(self, username: str) -> str:
+        # May restart the bot when account settings changed
+        return self._call(self._owner(username), 'reload_config', username, timeout=self.START_TIMEOUT)
+
+    def is_running(self, username: str) -> bool:
+        return self._call(self._owner(username), 'running', username)
+
+    def status(self, username: str) -> Dict:
+        return self._call(self._owner(username), 'status', username)
+
+    def logs(self, username: str) -> List[str]:
+        return self._call(self._owner(username), 'logs', username)
+
+    def log_page(self, username: str, page: int, per_page: int) -> Dict:
+        return self._call(self._owner(username), 'log_page', username, page, per_page)
+
+    def purchases(self, username: str, limit: int = 50, before: Optional[float] = None,
+                  before_id: Optional[int] = None) -> Dict:
+        return self._call(self._owner(username), 'purchases', username, limit, before, before_id)
+
+    def purchase_summary(self, username: str, days: int = 30) -> Dict:
+        return self._call(self._owner(username), 'purchase_summary', username, days)
+
+    def engine_stats(self, username: str) -> Dict:
+        stats = self._call(self._owner(username), 'engine_stats', username)
+        stats['supervisor'] = self.stats()
+        return stats
+
+    # A pending login's client lives on the tenant's worker, so every step goes there
+    def login_send_code(self, username: str, phone: str, login_type: str) -> Dict:
+        return self._call(self._owner(username), 'login_send_code', username, phone, login_type,
+                          timeout=self.START_TIMEOUT)
+
+    def login_verify(self, username: str, phone: str, code: str, login_type: str) -> Dict:
+        return self._call(self._owner(username), 'login_verify', username, phone, code, login_type,
+                          timeout=self.START_TIMEOUT)
+
+    def login_2fa(self, username: str, phone: str, password: str, login_type: str) -> Dict:
+        return self._call(self._owner(username), 'login_2fa', username, phone, password, login_type,
+                          timeout=self.START_TIMEOUT)
+
+    # Jobs run on the tenant's worker, so lookups and cancels follow the tenant there
+    def submit_job(self, username: str, kind: str, *args) -> Dict:
+        worker = self._owner(username)
+        job = self._call(worker, 'submit_job', username, kind, *args)
+        if kind == 'start':
+            # The bot will run on this worker, so a respawn must migrate it like one started directly
+            with self._lock:
+                self._placement[username] = worker.index
+        return job
+
+    def job(self, username: str, job_id: str) -> Optional[Dict]:
+        return self._call(self._owner(username), 'job', username, job_id)
+
+    def cancel_job(self, username: str, job_id: str) -> bool:
+        return self._call(self._owner(username), 'cancel_job', username, job_id)
+
+    def remove_scanner(self, username: str, phone: str) -> bool:
+        return self._call(self._owner(username), 'remove_scanner', username, phone)
+
+    def purge_tenant(self, username: str) -> int:
+        # The owner holds the bot and any purchases it still has queued
+        worker = self._owner(username)
+        purged = self._call(worker, 'purge_tenant', username)
+        with self._lock:
+            self._placement.pop(username, None)
+        return purged
+
+    def restore(self) -> None:
+        """Restore previously running bots on their workers (in the background)"""
+        from bot_manager import usernames_to_restore
+
+        batches: Dict[int, List[str]] = {}
+        for username in usernames_to_restore():
+            batches.setdefault(self._owner(username).index, []).append(username)
+
+        def run(worker: _Worker, usernames: List[str]):
+            # Each worker restores its batch with bounded concurrency; the workers run side by side
+            try:
+                results = self._call(worker, 'restore_many', usernames,
+                                     timeout=self.START_TIMEOUT + len(usernames) * 5)
+            except Exception:
+                return
+            with self._lock:
+                for username, restored in results.items():
+                    if restored:
+                        self._placement[username] = worker.index
+
+        for index, usernames in batches.items():
+            Thread(target=run, args=(self._workers[index], usernames),
+                   name=f"engine-{index}-restore", daemon=True).start()
+
+    def shutdown(self) -> None:
+        """Stop every worker's bots before exiting, all workers at once"""
+        def stop(worker: _Worker):
+            try:
+                self._call(worker, 'shutdown', timeout=self.REQUEST_TIMEOUT)
+            except Exception:
+                pass
+
+        threads = [Thread(target=stop, args=(worker,), name=f"engine-{worker.index}-shutdown")
+                   for worker in list(self._workers)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+    def metrics(self) -> str:
+        texts = []
+        for worker in list(self._workers):
+            try:
+                texts.append(self._call(worker, 'metrics'))
+            except Exception:
+                pass
+        return merge_expositions(texts)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            workers = list(self._workers)
+            placement = dict(self._placement)
+        return {
+            'processes': len(workers),
+            'respawns': self.respawns,
+            'migrations': self.migrations,
+            'workers': {
+                f"engine-{w.index}": {
+                    'pid': w.process.pid,
+                    'alive': w.alive,
+                    'tenants': sum(1 for index in placement.values() if index == w.index),
+                    'uptime': round(time.time() - w.started_at),
+                }
+                for w in workers
+            },
+        }
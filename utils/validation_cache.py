@@ -0,0 +1,98 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from threading import Lock
+from typing import Dict, Iterable, Optional
+
+
+def session_fingerprint(session_files: Iterable[str], settings: Iterable) -> Optional[str]:
+    """
+    Hash of what a successful validation depends on: each session's auth key
+    and account, plus the settings it was checked with (API credentials,
+    phones, recipient). A re-login or a settings change gives a new
+    fingerprint. None if a session can't be read.
+    """
+    digest = hashlib.sha256()
+    for path in session_files:
+        try:
+            # Read-only: the running bot may have the session open
+            with closing(sqlite3.connect(f"file:{path}?mode=ro", uri=True, timeout=1)) as conn:
+                row = conn.execute("SELECT auth_key, user_id FROM sessions").fetchone()
+        except sqlite3.Error:
+            return None
+        if not row or not row[0]:
+            return None
+        digest.update(hashlib.sha256(row[0]).digest())
+        digest.update(str(row[1]).encode())
+    for value in settings:
+        digest.update(b"\0" + str(value).encode())
+    return digest.hexdigest()
+
+
+class ValidationCache:
+    """
+    Remembers tenants whose pre-flight validation passed, keyed by their
+    session fingerprint, so restarts and restores skip the Telegram
+    handshake and test message. Entries expire after ``ttl`` seconds and
+    survive restarts in a small JSON file. Only successes are cached.
+    """
+
+    def __init__(self, path: str, ttl: float):
+        self.path = path
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._lock = Lock()
+        self._entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        try:
+            with open(self.path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def get(self, username: str, fingerprint: Optional[str]) -> bool:
+        with self._lock:
+            entry = self._entries.get(username)
+            fresh = (
+                fingerprint is not None and entry is not None
+                and entry['fingerprint'] == fingerprint
+                and time.time() - entry['validated_at'] < self.ttl
+            )
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return fresh
+
+    def put(self, username: str, fingerprint: Optional[str]) -> None:
+        if fingerprint is None:
+            return
+        self._update(username, {'fingerprint': fingerprint, 'validated_at': time.time()})
+
+    def invalidate(self, username: str) -> None:
+        self._update(username, None)
+
+    def _update(self, username: str, entry: Optional[Dict]) -> None:
+        with self._lock:
+            # Engine worker processes share the file; pick up their entries first
+            self._entries = self._load()
+            if entry is None:
+                self._entries.pop(username, None)
+            else:
+                self._entries[username] = entry
+            tmp = f"{self.path}.{os.getpid()}.tmp"
+            try:
+                with open(tmp, 'w') as f:
+                    json.dump(self._entries, f)
+                os.replace(tmp, self.path)
+            except OSError:
+                pass    # still cached in memory
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {'entries': len(self._entries), 'hits': self.hits, 'misses': self.misses, 'ttl': self.ttl}